@@ -21,6 +21,13 @@ app.config.update(
 )
 app.permanent_session_lifetime = timedelta(minutes=30)
 
+# Registered first so request timing covers the other before/after-request hooks.
+from court_booking.metrics import init_metrics
+from court_booking.querylog import init_querylog
+if init_metrics(app):
+    limiter.exempt(app.view_functions["metrics"])
+init_querylog(app)
+
 csrf = CSRFProtect(app)
 @app.context_processor
 def inject_csrf_token():
@@ -29,6 +36,9 @@ def inject_csrf_token():
 
 limiter.init_app(app)
 
+from court_booking.config import init_db
+init_db(app)
+
 from routes.auth_routes import auth_bp
 from routes.booking_routes import booking_bp
 from routes.calendar_routes import calendar_bp
@@ -38,6 +48,11 @@ app.register_blueprint(booking_bp)
 app.register_blueprint(calendar_bp)
 app.register_blueprint(admin_bp)
 
+if os.getenv("CALENDAR_CACHE_WARM") == "1":
+    import threading
+    from routes.calendar_routes import warm_calendar_cache
+    threading.Thread(target=warm_calendar_cache, args=(app,), daemon=True).start()
+
 @app.after_request
 def add_security_headers(response):
     response.headers.setdefault("X-Frame-Options", "DENY")
@@ -76,6 +91,10 @@ def not_found(e):  return ("Not Found", 404)
 @app.errorhandler(405)
 def method_not_allowed(e):  return ("Method Not Allowed", 405)
 
+from court_booking.passwords import HasherBusy
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):  return ("Server busy, please try again shortly.", 503, {"Retry-After": str(e.retry_after)})
+
 if os.getenv("FLASK_DEBUG") != "1":
     @app.errorhandler(500)
     def server_error(e):  return ("Server error", 500)
@@ -84,13 +103,13 @@ if os.getenv("FLASK_DEBUG") == "1":
     @app.route("/_dbtest")
     def _dbtest():
         try:
-            from court_booking.config import get_db_connection
+            from court_booking.config import get_db_connection, pool_stats
             conn = get_db_connection()
             cur = conn.cursor(dictionary=True)
             cur.execute("SELECT 1 AS ok")
             row = cur.fetchone()
             cur.close(); conn.close()
-            return {"db": "OK", "row": row}, 200
+            return {"db": "OK", "row": row, "pool": pool_stats()}, 200
         except Exception as exc:
             return {"db": "ERROR", "error": str(exc)}, 500
 
@@ -0,0 +1,341 @@
+"""
+Synthetic courts, users and bookings in the schema from migrations/.
+
+    python bench/datagen.py --bookings 10000000 --users 20000 --courts 40          # straight into MySQL
+    python bench/datagen.py --bookings 10000000 --format sql --out data/           # multi-row INSERT files
+    python bench/datagen.py --bookings 10000000 --format tsv --out data/           # TSV + load.sql (LOAD DATA)
+    python bench/datagen.py ... --resume                                           # continue an interrupted run
+
+Bookings are generated court by court and day by day from --start. Each
+court-day is swept in 30-minute steps: evenings and weekends are busier,
+summer slightly more so, durations are 60/90/120 minutes, and late starts may
+run past midnight. Bookings on one court and day never overlap. Every day has
+its own RNG derived from (seed, day), and booking ids encode (day, court,
+slot), so the output depends only on the arguments and a run can be resumed
+from any day without replaying the earlier ones.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from court_booking import migrate
+
+# Every user's password is "password123", stored as a cheap Werkzeug PBKDF2 hash (upgraded to
+# Argon2 on first login). Built by hand so the output stays deterministic.
+PASSWORD_HASH = "pbkdf2:sha256:1000$benchsalt$" + hashlib.pbkdf2_hmac(
+    "sha256", b"password123", b"benchsalt", 1000).hex()
+
+FIRST = ["Aiden", "Bilal", "Chen", "Dana", "Elif", "Farah", "Gabe", "Hana", "Ivan", "Jia", "Kofi", "Lena",
+         "Mateo", "Nia", "Omar", "Priya", "Quinn", "Rui", "Sara", "Tariq", "Uma", "Vik", "Wen", "Yusuf", "Zoe"]
+LAST = ["Ahmed", "Brown", "Costa", "Diaz", "Evans", "Fazi", "Garcia", "Haddad", "Ito", "Jones", "Khan",
+        "Lopez", "Mensah", "Novak", "Okafor", "Patel", "Rossi", "Silva", "Tan", "Ueda", "Wang", "Yilmaz"]
+LOCATIONS = ["North", "South", "East", "West", "Central", "Harbour", "Hillside", "Riverside"]
+
+STEP = 30                      # minutes
+DAY_START, DAY_END = 6 * 60, 24 * 60
+SLOTS_PER_DAY = (DAY_END - DAY_START) // STEP
+DURATIONS = [60] * 7 + [90] * 2 + [120]
+TIMES = [f"{m // 60 % 24:02d}:{m % 60:02d}:00" for m in range(0, 26 * 60 + 1, STEP)]
+
+BATCH = 10000
+CHUNK_DAYS = 30
+
+
+def _court_name(i: int) -> str:
+    return f"Court {chr(64 + i)}" if i <= 26 else f"Court {i}"
+
+
+def _demand(weekend: bool, summer: bool):
+    """Start probability for each 30-minute step of a court-day."""
+    probs = []
+    for k in range(SLOTS_PER_DAY):
+        hour = (DAY_START + k * STEP) // 60
+        if weekend:
+            p = 0.55 if 9 <= hour < 22 else 0.15
+        elif 17 <= hour < 22:
+            p = 0.70
+        elif 12 <= hour < 14:
+            p = 0.25
+        else:
+            p = 0.08
+        if hour >= 22:
+            p = 0.20  # late slots, which may run past midnight
+        probs.append(min(0.95, p * (1.15 if summer else 1.0)))
+    return probs
+
+
+_DEMAND = {(w, s): _demand(w, s) for w in (False, True) for s in (False, True)}
+
+
+def day_bookings(seed: int, day_index: int, d: date, courts: int, users: int):
+    """Bookings for one day as (id, court_id, user_id, start, end) tuples, in a fixed order."""
+    rng = random.Random(seed * 1_000_003 + day_index)
+    probs = _DEMAND[(d.weekday() >= 5, d.month in (6, 7, 8))]
+    rand, choice, randint = rng.random, rng.choice, rng.randint
+    out = []
+    base = day_index * courts * SLOTS_PER_DAY
+    for court in range(1, courts + 1):
+        cbase = base + (court - 1) * SLOTS_PER_DAY
+        k = 0
+        while k < SLOTS_PER_DAY:
+            if rand() < probs[k]:
+                dur = choice(DURATIONS) // STEP
+                end = k + dur
+                if end > SLOTS_PER_DAY and DAY_START + end * STEP > DAY_END + 2 * 60:
+                    break
+                start_m = DAY_START // STEP + k
+                out.append((cbase + k + 1, court, randint(1, users), TIMES[start_m], TIMES[start_m + dur]))
+                k = end
+            else:
+                k += 1
+    return out
+
+
+def courts_rows(courts: int, seed: int):
+    rng = random.Random(seed)
+    return [(i, _court_name(i), "Unavailable" if rng.random() < 0.05 else "Available")
+            for i in range(1, courts + 1)]
+
+
+def users_rows(users: int, seed: int, admins: int = 2):
+    rng = random.Random(seed + 1)
+    rows = []
+    for i in range(1, users + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        username = f"{first.lower()}.{last.lower()}{i}"
+        dob = date(1960, 1, 1) + timedelta(days=rng.randint(0, 48 * 365))
+        rows.append((i, f"{first} {last}", username, f"{username}@example.com", PASSWORD_HASH, dob,
+                     rng.choice(LOCATIONS), "admin" if i <= admins else "user",
+                     0 if i > admins and rng.random() < 0.03 else 1))
+    return rows
+
+
+def _sql_value(v):
+    if isinstance(v, int):
+        return str(v)
+    return "'" + str(v).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def insert_sql(table, columns, rows):
+    values = ",".join("(" + ",".join(_sql_value(v) for v in row) + ")" for row in rows)
+    return f"INSERT INTO {table} ({','.join(columns)}) VALUES {values}"
+
+
+USER_COLUMNS = ["id", "name", "username", "email", "password", "date_of_birth", "location", "role", "active"]
+COURT_COLUMNS = ["id", "court_name", "status"]
+BOOKING_COLUMNS = ["id", "court_id", "user_id", "booking_date", "start_time", "end_time"]
+
+
+def iter_days(args, first_day=0):
+    """Endless (day_index, date, rows) from `first_day`; callers stop once they have enough rows."""
+    day = first_day
+    while True:
+        d = args.start + timedelta(days=day)
+        rows = day_bookings(args.seed, day, d, args.courts, args.users)
+        yield day, d, [(bid, c, u, d, s, e) for bid, c, u, s, e in rows]
+        day += 1
+
+
+# --- MySQL --------------------------------------------------------------------------------------
+
+def ensure_schema(conn):
+    """Bring the database to the current schema (migrations/)."""
+    migrate.upgrade(conn)
+
+
+def truncate(conn):
+    cur = conn.cursor()
+    cur.execute("SET FOREIGN_KEY_CHECKS=0")
+    for table in ("bookings", "courts", "users"):
+        cur.execute(f"TRUNCATE TABLE {table}")
+    cur.execute("SET FOREIGN_KEY_CHECKS=1")
+    conn.commit()
+    cur.close()
+
+
+def _scalar(cur, sql, params=()):
+    cur.execute(sql, params)
+    return cur.fetchone()[0]
+
+
+def load_mysql(conn, args, progress=None):
+    """Write straight into the connected database. Returns (rows, first_date, last_date)."""
+    ensure_schema(conn)
+    cur = conn.cursor()
+    cur.execute("SET SESSION foreign_key_checks=0, unique_checks=0")
+
+    first_day, written = 0, 0
+    if args.resume and _scalar(cur, "SELECT COUNT(*) FROM courts") == args.courts \
+            and _scalar(cur, "SELECT COUNT(*) FROM users") == args.users:
+        max_id = _scalar(cur, "SELECT COALESCE(MAX(id), 0) FROM bookings")
+        if max_id:
+            # Redo the last (possibly partial) day: ids encode the day index.
+            first_day = (max_id - 1) // (args.courts * SLOTS_PER_DAY)
+            cur.execute("DELETE FROM bookings WHERE id > %s", (first_day * args.courts * SLOTS_PER_DAY,))
+            conn.commit()
+            written = _scalar(cur, "SELECT COUNT(*) FROM bookings")
+    else:
+        cur.close()
+        truncate(conn)
+        cur = conn.cursor()
+        cur.execute("SET SESSION foreign_key_checks=0, unique_checks=0")
+        for i in range(0, args.courts, BATCH):
+            cur.execute(insert_sql("courts", COURT_COLUMNS, courts_rows(args.courts, args.seed)[i:i + BATCH]))
+        users = users_rows(args.users, args.seed, args.admins)
+        for i in range(0, len(users), BATCH):
+            cur.execute(insert_sql("users", USER_COLUMNS, users[i:i + BATCH]))
+        conn.commit()
+
+    last_date = None
+    pending = []
+    for day, d, rows in iter_days(args, first_day):
+        rows = rows[:args.bookings - written]
+        pending.extend(rows)
+        written += len(rows)
+        last_date = d
+        done = written >= args.bookings
+        if len(pending) >= BATCH or done:
+            for i in range(0, len(pending), BATCH):
+                cur.execute(insert_sql("bookings", BOOKING_COLUMNS, pending[i:i + BATCH]))
+            conn.commit()
+            pending = []
+            if progress:
+                progress(written)
+        if done:
+            break
+    cur.close()
+    return written, args.start, last_date
+
+
+def seed(conn, bookings: int, courts: int = 24, users: int = 2000, seed: int = 42, start=None):
+    """Replace all data with a generated dataset; returns (first_date, last_date). Used by the benchmarks."""
+    if start is None:
+        # About 7.5 bookings per court-day on average; put three quarters of the data in the past.
+        start = date.today() - timedelta(days=int(bookings / (courts * 7.5) * 0.75))
+    args = argparse.Namespace(bookings=bookings, courts=courts, users=users, seed=seed, start=start,
+                              admins=2, resume=False)
+    _, first, last = load_mysql(conn, args)
+    return first, last
+
+
+# --- Files --------------------------------------------------------------------------------------
+
+def _tsv(v):
+    return "\\N" if v is None else str(v)
+
+
+def _write_atomic(path, write):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_files(args, progress=None):
+    """Write chunked .sql or .tsv files under --out; a manifest records finished chunks for --resume."""
+    os.makedirs(args.out, exist_ok=True)
+    ext = args.format
+    manifest_path = os.path.join(args.out, "manifest.json")
+    manifest = {"args": _manifest_args(args), "chunks": []}
+    if args.resume and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["args"] != _manifest_args(args):
+            sys.exit("manifest.json was written with different arguments; refusing to resume")
+
+    def dump(name, table, columns, rows):
+        path = os.path.join(args.out, f"{name}.{ext}")
+        if ext == "sql":
+            _write_atomic(path, lambda f: [f.write(insert_sql(table, columns, rows[i:i + BATCH]) + ";\n")
+                                           for i in range(0, len(rows), BATCH)])
+        else:
+            _write_atomic(path, lambda f: f.writelines("\t".join(_tsv(v) for v in row) + "\n" for row in rows))
+        return os.path.basename(path)
+
+    if not manifest["chunks"]:
+        dump("00_courts", "courts", COURT_COLUMNS, courts_rows(args.courts, args.seed))
+        dump("01_users", "users", USER_COLUMNS, users_rows(args.users, args.seed, args.admins))
+
+    written = sum(c["rows"] for c in manifest["chunks"])
+    first_day = len(manifest["chunks"]) * CHUNK_DAYS
+    days = iter_days(args, first_day)
+    chunk_no = len(manifest["chunks"])
+    while written < args.bookings:
+        rows = []
+        for _ in range(CHUNK_DAYS):
+            _, _, day_rows = next(days)
+            rows.extend(day_rows[:args.bookings - written - len(rows)])
+            if written + len(rows) >= args.bookings:
+                break
+        chunk_no += 1
+        name = dump(f"bookings_{chunk_no:05d}", "bookings", BOOKING_COLUMNS, rows)
+        written += len(rows)
+        manifest["chunks"].append({"file": name, "rows": len(rows)})
+        _write_atomic(manifest_path, lambda f: json.dump(manifest, f, indent=1))
+        if progress:
+            progress(written)
+
+    if ext == "tsv":
+        files = ["00_courts.tsv", "01_users.tsv"] + [c["file"] for c in manifest["chunks"]]
+        tables = ["courts", "users"] + ["bookings"] * len(manifest["chunks"])
+        columns = [COURT_COLUMNS, USER_COLUMNS] + [BOOKING_COLUMNS] * len(manifest["chunks"])
+        _write_atomic(os.path.join(args.out, "load.sql"), lambda f: f.write(
+            "SET foreign_key_checks=0, unique_checks=0;\n" + "".join(
+                f"LOAD DATA LOCAL INFILE '{fn}' INTO TABLE {t} ({','.join(cols)});\n"
+                for fn, t, cols in zip(files, tables, columns)) + "SET foreign_key_checks=1, unique_checks=1;\n"))
+    return written
+
+
+def _manifest_args(args):
+    return {"bookings": args.bookings, "courts": args.courts, "users": args.users, "seed": args.seed,
+            "start": args.start.isoformat(), "admins": args.admins, "format": args.format}
+
+
+# --- CLI ----------------------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bench/datagen.py")
+    parser.add_argument("--bookings", type=int, required=True)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--courts", type=int, default=24)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2020, 1, 1))
+    parser.add_argument("--format", choices=["mysql", "sql", "tsv"], default="mysql")
+    parser.add_argument("--out", help="output directory for --format sql/tsv")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    args = parser.parse_args(argv)
+    if args.format != "mysql" and not args.out:
+        parser.error("--out is required for --format sql/tsv")
+
+    t0 = time.perf_counter()
+
+    def progress(n):
+        print(f"\r{n:>12,} bookings  {n / (time.perf_counter() - t0):>10,.0f}/s", end="", flush=True)
+
+    if args.format == "mysql":
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from court_booking.config import _connect
+        conn = _connect()
+        try:
+            n, first, last = load_mysql(conn, args, progress)
+        finally:
+            conn.close()
+        print(f"\n{n:,} bookings from {first} to {last} in {time.perf_counter() - t0:.1f}s")
+        print("Rebuild the summary with: python -m court_booking.summary backfill")
+    else:
+        n = write_files(args, progress)
+        print(f"\n{n:,} bookings written to {args.out} in {time.perf_counter() - t0:.1f}s")
+        if args.format == "tsv":
+            print(f"Load with: cd {args.out} && mysql --local-infile=1 <db> < load.sql")
+
+
+if __name__ == "__main__":
+    main()
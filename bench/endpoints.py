@@ -0,0 +1,226 @@
+"""
+Endpoint benchmarks against a seeded local MySQL database.
+
+    python bench/endpoints.py --sizes 10000,1000000 --requests 200 --concurrency 4 \
+        --out bench/results/$(git rev-parse --short HEAD).json
+    python bench/endpoints.py --compare bench/results/old.json bench/results/new.json
+
+Requests go through the Flask test client (no network), logged in as the
+seeded admin. Each size is seeded into the database named by --db-name
+(default `court_booking_bench`; it is emptied first) unless --no-seed is
+given. "Queries per request" is the delta of MySQL's global `Questions`
+counter, so run it against a server nothing else is using.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def endpoints(mid: date):
+    month_from = mid.replace(day=1)
+    month_to = (month_from + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    d = mid.isoformat()
+    return {
+        "calendar_month": f"/tournament_calendar?view=month&d={d}",
+        "calendar_week": f"/tournament_calendar?view=week&d={d}",
+        "calendar_day": f"/tournament_calendar?view=day&d={d}",
+        "calendar_year": f"/tournament_calendar?view=year&d={d}",
+        "book_form": "/book",
+        "manage_bookings": "/manage_bookings",
+        "admin_dashboard": "/admin/dashboard",
+        "admin_manage_bookings": "/admin/manage_bookings",
+        "admin_manage_bookings_filtered": f"/admin/manage_bookings?court_id=1&from={month_from}&to={month_to}",
+        "admin_export_month": f"/admin/export_bookings.csv?from={month_from}&to={month_to}",
+    }
+
+
+def _server_connection(db_name=None):
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.environ.get("DB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ.get("DB_USER", "root"),
+        password=os.environ.get("DB_PASSWORD", ""),
+        database=db_name,
+    )
+
+
+def _questions(conn) -> int:
+    cur = conn.cursor()
+    cur.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+    value = int(cur.fetchone()[1])
+    cur.close()
+    return value
+
+
+def _prepare(db_name, size, seed):
+    from bench import datagen
+    from court_booking import summary
+
+    conn = _server_connection()
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+    cur.close(); conn.close()
+
+    conn = _server_connection(db_name)
+    datagen.ensure_schema(conn)
+    t0 = time.perf_counter()
+    lo, hi = datagen.seed(conn, size, seed=seed)
+    summary.backfill(conn, lo, hi)
+    conn.close()
+    print(f"  seeded {size} bookings ({lo}..{hi}) in {time.perf_counter() - t0:.1f}s", flush=True)
+
+
+def _client(app):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s.update(user_id=1, username="user1", name="User 1", role="admin", authn_time=int(time.time()))
+    return client
+
+
+def _measure(app, url, requests, concurrency, warmup):
+    clients = [_client(app) for _ in range(concurrency)]
+    for _ in range(warmup):
+        clients[0].get(url).close()
+
+    def worker(i):
+        c = clients[i]
+        out, errors = [], 0
+        for _ in range(requests // concurrency):
+            t0 = time.perf_counter()
+            r = c.get(url)
+            r.get_data()  # drain streamed bodies
+            out.append(time.perf_counter() - t0)
+            errors += r.status_code >= 400
+            r.close()
+        return out, errors
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        parts = list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - t0
+    samples = sorted(s for p, _ in parts for s in p)
+    return samples, sum(e for _, e in parts), wall
+
+
+def _pct(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+def run(args):
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("FLASK_DEBUG", "1")
+    from app import app
+    from extensions import limiter
+    app.config["WTF_CSRF_ENABLED"] = False
+    limiter.enabled = False
+
+    results = []
+    stat_conn = _server_connection()
+    for size in args.sizes:
+        print(f"size {size}", flush=True)
+        if not args.no_seed:
+            _prepare(args.db_name, size, args.seed)
+        mid = date.today()
+        for name, url in endpoints(mid).items():
+            if args.only and name not in args.only:
+                continue
+            q0 = _questions(stat_conn)
+            samples, errors, wall = _measure(app, url, args.requests, args.concurrency, args.warmup)
+            # Subtract the SHOW STATUS statement itself.
+            queries = (_questions(stat_conn) - q0 - 1) / max(1, len(samples) + args.warmup)
+            row = {
+                "size": size,
+                "endpoint": name,
+                "url": url,
+                "requests": len(samples),
+                "concurrency": args.concurrency,
+                "errors": errors,
+                "rps": round(len(samples) / wall, 1),
+                "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+                "p50_ms": round(_pct(samples, 0.50), 2),
+                "p90_ms": round(_pct(samples, 0.90), 2),
+                "p99_ms": round(_pct(samples, 0.99), 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "queries_per_request": round(queries, 2),
+            }
+            results.append(row)
+            print(f"  {name:<32} p50 {row['p50_ms']:>9.2f}ms  p99 {row['p99_ms']:>9.2f}ms  "
+                  f"{row['rps']:>8.1f}/s  {row['queries_per_request']:>6.2f} q/req"
+                  + (f"  {errors} errors" if errors else ""), flush=True)
+    stat_conn.close()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, new_path, threshold):
+    """Print p50/p99 changes per (size, endpoint); returns 1 if any got slower than `threshold`."""
+    with open(old_path) as f:
+        old = {(r["size"], r["endpoint"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["size"], r["endpoint"]): r for r in json.load(f)["results"]}
+    regressed = False
+    for key in sorted(set(old) & set(new)):
+        a, b = old[key], new[key]
+        flags = []
+        for metric in ("p50_ms", "p99_ms", "queries_per_request"):
+            if a[metric] and b[metric] > a[metric] * (1 + threshold):
+                flags.append(metric)
+        regressed |= bool(flags)
+        print(f"{key[0]:>10} {key[1]:<32} p50 {a['p50_ms']:>9.2f} -> {b['p50_ms']:>9.2f}ms  "
+              f"q/req {a['queries_per_request']:>6.2f} -> {b['queries_per_request']:>6.2f}"
+              + (f"  REGRESSED ({', '.join(flags)})" if flags else ""))
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bench/endpoints.py")
+    parser.add_argument("--sizes", default="10000", type=lambda s: [int(x) for x in s.split(",")],
+                        help="comma-separated booking counts, e.g. 10000,1000000,10000000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", type=lambda s: s.split(","), help="comma-separated endpoint names")
+    parser.add_argument("--db-name", default="court_booking_bench")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="benchmark the data already in --db-name")
+    parser.add_argument("--out", help="write JSON results here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.2, help="regression threshold for --compare")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    results = run(args)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+                "results": results,
+            }, f, indent=2)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Query-plan check: EXPLAIN every statement the app issues and fail on full table scans.
+
+    python bench/explain_check.py [--bookings 200000] [--db-name court_booking_explain] [--no-seed]
+
+Seeds a database (schema from migrations/), drives the pages, APIs and write
+paths through the Flask test client while recording every statement sent
+on a pooled connection, then runs EXPLAIN on each distinct one with the
+parameters it was first seen with. Exits 1 if any plan reads a table with
+`type=ALL` that is not listed in ALLOWED_FULL_SCANS.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (table, SQL fragment or None, reason): full scans that are expected.
+ALLOWED_FULL_SCANS = [
+    ("courts", None, "a few dozen rows, always listed whole"),
+    ("users", "LIKE", "substring search over name/username/email cannot use a B-tree index"),
+]
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def _drive(app, client, mid: date):
+    from bench.endpoints import endpoints
+
+    urls = list(endpoints(mid).values()) + [
+        "/admin/manage_bookings?q=ana",
+        "/admin/manage_users",
+        "/admin/manage_users?q=ana&role=user&active=1",
+        "/admin/upcoming",
+        "/admin/courts",
+        "/admin/edit_court/1",
+        "/admin/edit_user/2",
+        "/admin/book",
+        f"/api/calendar/events?from={mid - timedelta(days=7)}&to={mid + timedelta(days=7)}",
+        f"/api/calendar/events?from={mid}&to={mid + timedelta(days=30)}&court=2",
+        f"/api/availability?from={mid}&to={mid + timedelta(days=30)}&min=90",
+        f"/tournament_calendar/grid?view=week&d={mid}",
+    ]
+    for url in urls:
+        r = client.get(url)
+        r.get_data()
+        if r.status_code >= 400:
+            print(f"  GET {url} -> {r.status_code}")
+        r.close()
+
+    # Write paths on a day far ahead, so they do not collide with seeded bookings.
+    day = (mid + timedelta(days=700)).isoformat()
+    form = {"court_id": "1", "date": day, "start_time": "10:00", "end_time": "11:00"}
+    client.post("/book", data=form)
+    client.post("/book", data=form)  # conflict path (next-free-slot hint)
+    from court_booking.config import pooled_connection
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM bookings WHERE court_id=1 AND booking_date=%s AND user_id=1", (day,))
+        row = cur.fetchone()
+        cur.execute("SELECT username FROM users WHERE id=5")
+        username = cur.fetchone()[0]
+        cur.close()
+    if row:
+        client.get(f"/edit_booking/{row[0]}")
+        client.post(f"/edit_booking/{row[0]}", data=dict(form, start_time="12:00", end_time="13:30"))
+        client.get(f"/admin/edit_booking/{row[0]}")
+        client.post(f"/cancel_booking/{row[0]}")
+    with app.test_client() as anon:
+        anon.post("/login", data={"username": username, "password": "password123"})  # datagen's password
+
+
+def _allowed(table, sql):
+    for t, fragment, _ in ALLOWED_FULL_SCANS:
+        if t == table and (fragment is None or fragment in sql):
+            return True
+    return False
+
+
+def explain(conn, statements):
+    """(sql, plan rows, full-scan tables) per explainable statement."""
+    out = []
+    cur = conn.cursor(dictionary=True)
+    for sql, params in statements.items():
+        if sql.split(" ", 1)[0].upper() not in _EXPLAINABLE:
+            continue
+        try:
+            cur.execute("EXPLAIN " + sql, params or ())
+            plan = cur.fetchall()
+        except Exception as e:
+            print(f"  could not EXPLAIN ({e}): {sql[:120]}")
+            continue
+        scans = [p["table"] for p in plan
+                 if p.get("type") == "ALL" and p.get("select_type") not in ("INSERT", "REPLACE")
+                 and p.get("table") and not p["table"].startswith("<")]
+        out.append((sql, plan, scans))
+    cur.close()
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bench/explain_check.py")
+    parser.add_argument("--bookings", type=int, default=200000)
+    parser.add_argument("--db-name", default="court_booking_explain")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="check against the data already in --db-name")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("FLASK_DEBUG", "1")
+    from bench.endpoints import _client, _prepare, _server_connection
+
+    if not args.no_seed:
+        _prepare(args.db_name, args.bookings, args.seed)
+    conn = _server_connection(args.db_name)
+    cur = conn.cursor()
+    for table in ("users", "courts", "bookings", "booking_daily_summary"):
+        cur.execute(f"ANALYZE TABLE {table}")
+        cur.fetchall()
+    cur.close()
+
+    from app import app
+    from court_booking import tracing
+    from court_booking.config import get_pool
+    from extensions import limiter
+    app.config["WTF_CSRF_ENABLED"] = False
+    limiter.enabled = False
+
+    statements = {}
+
+    @tracing.on_query
+    def record(sql, params, seconds):
+        statements.setdefault(" ".join(sql.split()), params)
+
+    get_pool().dispose()  # reconnect, so every connection is traced
+
+    t0 = time.perf_counter()
+    _drive(app, _client(app), date.today())
+    print(f"recorded {len(statements)} distinct statements in {time.perf_counter() - t0:.1f}s")
+
+    failed = 0
+    for sql, plan, scans in explain(conn, statements):
+        bad = [t for t in scans if not _allowed(t, sql)]
+        failed += bool(bad)
+        if bad or args.verbose:
+            print(("FULL SCAN " + ", ".join(bad) if bad else "ok") + ":  " + re.sub(r"\s+", " ", sql)[:200])
+            for p in plan:
+                print(f"    {p.get('table') or '-':<24} type={p.get('type') or '-':<7} key={p.get('key') or '-':<28} "
+                      f"rows={p.get('rows') or '-':<8} {p.get('Extra') or ''}")
+    conn.close()
+    print(f"{failed} statement(s) with unexpected full table scans" if failed else "no unexpected full table scans")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
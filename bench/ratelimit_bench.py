@@ -0,0 +1,81 @@
+"""
+Per-check cost of the rate-limit storages.
+
+    python bench/ratelimit_bench.py [--checks 20000] [--workers 4] [--keys 100]
+
+Runs `hit()` through the limits strategies Flask-Limiter uses, single-process
+against memory:// and sqlite://, then with several processes sharing the
+SQLite file (memory:// cannot be shared, so it has no multi-process row).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+import court_booking.ratelimit  # noqa: F401  (registers sqlite://)
+
+STRATEGIES = {
+    "fixed-window": FixedWindowRateLimiter,
+    "sliding-window-counter": SlidingWindowCounterRateLimiter,
+}
+
+
+def _run(uri, strategy, checks, keys, offset=0):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse("1000000/hour")
+    samples = []
+    for i in range(checks):
+        key = f"bench-{(i + offset) % keys}"
+        t0 = time.perf_counter()
+        limiter.hit(item, key)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _worker(args):
+    uri, strategy, checks, keys, idx = args
+    t0 = time.perf_counter()
+    samples = _run(uri, strategy, checks, keys, offset=idx * 7)
+    return samples, time.perf_counter() - t0
+
+
+def _report(label, samples, wall):
+    samples.sort()
+    n = len(samples)
+    pct = lambda p: samples[min(n - 1, int(n * p))] * 1e6
+    print(f"{label:<46} {n / wall:>10.0f}/s  p50 {pct(0.50):>7.1f}us  p99 {pct(0.99):>7.1f}us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_uri = f"sqlite:///{tmp}/ratelimit.db"
+        for strategy in STRATEGIES:
+            for uri in ("memory://", sqlite_uri):
+                t0 = time.perf_counter()
+                samples = _run(uri, strategy, args.checks, args.keys)
+                _report(f"{strategy} {uri.split(':')[0]} x1", samples, time.perf_counter() - t0)
+
+            with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+                jobs = [(sqlite_uri, strategy, args.checks, args.keys, i) for i in range(args.workers)]
+                results = pool.map(_worker, jobs)
+            # Throughput over the slowest worker's run, excluding process start-up.
+            wall = max(elapsed for _, elapsed in results)
+            _report(f"{strategy} sqlite x{args.workers} processes", [s for r, _ in results for s in r], wall)
+
+
+if __name__ == "__main__":
+    main()
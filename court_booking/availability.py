@@ -0,0 +1,142 @@
+"""
+Free-slot search across courts on per-day slot bitmaps.
+
+Each court-day is an int with one bit per SLOT_MINUTES slot (bit 0 is
+00:00-00:30), set where a booking touches the slot; a booking that ends
+mid-slot makes the whole slot busy, like the calendar grid, and an overnight
+booking (end <= start) also marks the next day up to its end. The bitmaps for a
+date range come from one covering-index range query and are cached, so a
+search is a few shifts and ANDs per court-day:
+
+    free = allowed & ~busy
+    fit  = free & free>>1 & ... & free>>(k-1)   # bit s: slots s..s+k-1 all free
+
+Each run of set bits in `fit` is one maximal free window of at least k slots.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+from court_booking import repository
+from court_booking.bookings import on_change
+from court_booking.config import get_db_connection
+from court_booking.intervals import DAY_MINUTES, to_minutes
+from court_booking.live import feed
+from court_booking.view_cache import ViewCache
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = DAY_MINUTES // SLOT_MINUTES
+AVAILABILITY_MAX_DAYS = int(os.environ.get("AVAILABILITY_MAX_DAYS", "92"))
+OPEN_MINUTES, CLOSE_MINUTES = 6 * 60, 22 * 60  # default search hours, as on the calendar
+
+cache = ViewCache.from_env("AVAILABILITY_CACHE")
+
+
+@on_change
+def _invalidate(change):
+    if change.op in ("court", "reset") or change.booking_date is None:
+        cache.clear()
+        return
+    cache.invalidate_date(change.booking_date)
+    if change.old_date is not None and change.old_date != change.booking_date:
+        cache.invalidate_date(change.old_date)
+
+
+@feed.listen
+def _invalidate_remote(evt):
+    if not evt["dates"]:
+        cache.clear()
+        return
+    for d in evt["dates"]:
+        cache.invalidate_date(date.fromisoformat(d))
+
+
+def slot_mask(start_min: int, end_min: int) -> int:
+    """Bits of the slots [start_min, end_min) touches; end <= start (overnight) runs to midnight."""
+    first = start_min // SLOT_MINUTES
+    last = -(-end_min // SLOT_MINUTES) if end_min > start_min else SLOTS_PER_DAY
+    return ((1 << last) - 1) & ~((1 << first) - 1)
+
+
+def hours_mask(open_min: int, close_min: int) -> int:
+    """Bits of the slots lying wholly inside [open_min, close_min)."""
+    first = -(-open_min // SLOT_MINUTES)
+    last = close_min // SLOT_MINUTES
+    return ((1 << last) - 1) & ~((1 << first) - 1) if last > first else 0
+
+
+def runs(mask: int):
+    """(first_slot, length) of each run of set bits, lowest first."""
+    out = []
+    while mask:
+        low = mask & -mask
+        carry = mask + low  # the run's bits carry into the bit just above it
+        first = low.bit_length() - 1
+        out.append((first, (carry & ~mask).bit_length() - 1 - first))
+        mask &= carry
+    return out
+
+
+def free_windows(busy: int, min_slots: int, allowed: int):
+    """(first_slot, length) of the maximal free runs of at least `min_slots` inside `allowed`."""
+    free = allowed & ~busy
+    fit = free
+    for i in range(1, min_slots):
+        fit &= free >> i
+    return [(first, n + min_slots - 1) for first, n in runs(fit)]
+
+
+def _mark(busy, key, mask):
+    busy[key] = busy.get(key, 0) | mask
+
+
+def _load(start_d: date, end_d: date):
+    conn = get_db_connection()
+    try:
+        courts = [c for c in repository.list_courts(conn) if c.status != "Unavailable"]
+        busy = {}
+        # From the day before: its overnight bookings spill into start_d.
+        for court_id, day, start, end in repository.slot_rows(conn, start_d - timedelta(days=1), end_d):
+            s, e = to_minutes(start), to_minutes(end)
+            if day >= start_d:
+                _mark(busy, (court_id, day), slot_mask(s, e))
+            if e <= s and e > 0:
+                _mark(busy, (court_id, day + timedelta(days=1)), slot_mask(0, e))
+    finally:
+        conn.close()
+    return courts, busy
+
+
+def busy_maps(start_d: date, end_d: date):
+    """(bookable courts, {(court_id, date): busy mask}) for the range, cached until a write touches it."""
+    key = ("busy", start_d, end_d)
+    payload = cache.get(key)
+    if payload is None:
+        payload = _load(start_d, end_d)
+        cache.put(key, start_d - timedelta(days=1), end_d, payload)
+    return payload
+
+
+def search(start_d: date, end_d: date, min_minutes: int, court_ids=None,
+           open_min: int = OPEN_MINUTES, close_min: int = CLOSE_MINUTES, now: datetime = None):
+    """
+    (courts, windows) where windows are (court_id, date, start_min, end_min) of
+    every free stretch of at least `min_minutes` between open and close, by date
+    then court name. Slots already begun today and past days are never free.
+    """
+    now = now or datetime.now()
+    courts, busy = busy_maps(start_d, end_d)
+    if court_ids is not None:
+        courts = [c for c in courts if c.id in court_ids]
+    k = max(1, -(-min_minutes // SLOT_MINUTES))
+    hours = hours_mask(open_min, close_min)
+    windows = []
+    day = max(start_d, now.date())
+    while day <= end_d:
+        allowed = hours
+        if day == now.date():
+            allowed &= ~((1 << -(-(now.hour * 60 + now.minute) // SLOT_MINUTES)) - 1)
+        for c in courts:
+            for first, n in free_windows(busy.get((c.id, day), 0), k, allowed):
+                windows.append((c.id, day, first * SLOT_MINUTES, (first + n) * SLOT_MINUTES))
+        day += timedelta(days=1)
+    return courts, windows
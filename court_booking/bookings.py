@@ -0,0 +1,343 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+
+from court_booking import summary
+from court_booking.intervals import conflict_index, sql_conflict, to_date
+
+log = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = int(os.environ.get("BOOKING_LOCK_TIMEOUT", "5"))
+RECURRING_MAX_OCCURRENCES = int(os.environ.get("RECURRING_MAX_OCCURRENCES", "200"))
+
+# op is "insert", "update", "delete", "court" (a court and its bookings went away)
+# or "reset" (anything may have changed). old_* hold the pre-update placement.
+BookingChange = namedtuple(
+    "BookingChange",
+    "op booking_id court_id booking_date start_time end_time old_court_id old_date",
+    defaults=(None,) * 7,
+)
+
+_listeners = []
+
+
+def on_change(fn):
+    """Register `fn(change)` to be called after every committed booking write."""
+    _listeners.append(fn)
+    return fn
+
+
+def notify(op, booking_id=None, court_id=None, booking_date=None, start_time=None, end_time=None,
+           old_court_id=None, old_date=None):
+    try:
+        booking_date = to_date(booking_date) if booking_date is not None else None
+        old_date = to_date(old_date) if old_date is not None else None
+    except ValueError:
+        op = "reset"
+    change = BookingChange(op, booking_id, court_id, booking_date, start_time, end_time, old_court_id, old_date)
+    for fn in _listeners:
+        try:
+            fn(change)
+        except Exception:
+            log.exception("booking change listener %r failed", fn)
+
+
+@on_change
+def _sync_conflict_index(change):
+    if change.op in ("insert", "update"):
+        conflict_index.add(change.court_id, change.booking_date, change.booking_id,
+                           change.start_time, change.end_time)
+    elif change.op == "delete":
+        conflict_index.remove(change.booking_id)
+    elif change.op == "court":
+        conflict_index.forget_court(change.court_id)
+    else:
+        conflict_index.clear()
+
+
+class BookingConflict(Exception):
+    """The requested slot overlaps an existing booking on that court and day."""
+
+    def __init__(self, booking_id=None):
+        super().__init__(f"slot overlaps booking {booking_id}")
+        self.booking_id = booking_id
+
+
+class SlotBusy(Exception):
+    """The court-day lock could not be taken within BOOKING_LOCK_TIMEOUT."""
+
+
+class RecurringConflict(Exception):
+    """Some occurrences overlap existing bookings; `conflicts` holds (court_id, date, booking_id) of each."""
+
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} occurrence(s) overlap existing bookings")
+        self.conflicts = conflicts
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    "commits": 0,
+    "conflicts": 0,
+    "lock_acquired": 0,
+    "lock_contended": 0,
+    "lock_timeouts": 0,
+    "lock_wait_seconds_total": 0.0,
+    "lock_wait_seconds_max": 0.0,
+}
+
+
+def _bump(**kw):
+    with _stats_lock:
+        for k, v in kw.items():
+            if k == "lock_wait_seconds_max":
+                _stats[k] = max(_stats[k], v)
+            else:
+                _stats[k] += v
+
+
+def booking_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def lock_name(court_id, booking_date) -> str:
+    return f"court_booking.slot.{court_id}.{booking_date}"
+
+
+@contextmanager
+def court_day_lock(conn, court_id, booking_date, timeout=None):
+    """
+    Hold the MySQL named lock for one court on one day.
+
+    Only writers of the same (court, day) wait on each other; the bookings table
+    itself is never locked. An uncontended lock costs a single round trip.
+    """
+    name = lock_name(court_id, booking_date)
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+    cur.execute("SELECT GET_LOCK(%s, 0)", (name,))
+    got = cur.fetchone()[0]
+    contended = got != 1
+    if contended:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+        got = cur.fetchone()[0]
+    waited = time.perf_counter() - t0
+    if got != 1:
+        cur.close()
+        _bump(lock_contended=1, lock_timeouts=1, lock_wait_seconds_total=waited, lock_wait_seconds_max=waited)
+        raise SlotBusy(name)
+    _bump(lock_acquired=1, lock_contended=int(contended),
+          lock_wait_seconds_total=waited, lock_wait_seconds_max=waited)
+    try:
+        yield
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+        cur.fetchone()
+        cur.close()
+
+
+def commit_booking(conn, court_id, booking_date, start, end, user_id=None, booking_id=None, owner_id=None):
+    """
+    Check for overlaps and write a booking in one transaction under the court-day lock.
+
+    Inserts a new booking for `user_id`, or moves `booking_id` (restricted to
+    `owner_id` when given). Returns the booking id, or None when no row was
+    updated. Raises BookingConflict or SlotBusy.
+    """
+    if conflict_index.enabled and conflict_index.check(conn, court_id, booking_date, start, end,
+                                                       exclude_id=booking_id):
+        # The index may still hold a booking another worker has since moved or
+        # cancelled, so a hit is only refused once SQL confirms it.
+        clash = sql_conflict(conn, court_id, booking_date, start, end, booking_id)
+        if clash:
+            _bump(conflicts=1)
+            raise BookingConflict(clash)
+        conflict_index.forget_day(court_id, booking_date)
+
+    with court_day_lock(conn, court_id, booking_date):
+        # End any snapshot opened by earlier reads in this request so the check
+        # below sees every booking committed before we got the lock.
+        conn.rollback()
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        try:
+            clash = sql_conflict(conn, court_id, booking_date, start, end, booking_id)
+            if clash:
+                _bump(conflicts=1)
+                raise BookingConflict(clash)
+
+            cur = conn.cursor()
+            old = None
+            if booking_id is None:
+                cur.execute("""
+                    INSERT INTO bookings (court_id, user_id, booking_date, start_time, end_time)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (court_id, user_id, booking_date, start, end))
+                booking_id = cur.lastrowid
+            else:
+                sql = """
+                    UPDATE bookings
+                    SET court_id=%s, booking_date=%s, start_time=%s, end_time=%s
+                    WHERE id=%s
+                """
+                params = [court_id, booking_date, start, end, booking_id]
+                if owner_id is not None:
+                    sql += " AND user_id=%s"
+                    params.append(owner_id)
+                cur.execute("SELECT court_id, booking_date FROM bookings WHERE id=%s", (booking_id,))
+                old = cur.fetchone()
+                cur.execute(sql, params)
+                if not cur.rowcount:
+                    booking_id = None
+            cur.close()
+            if booking_id is not None:
+                summary.refresh_many(conn, [(court_id, booking_date)] + ([tuple(old)] if old else []))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    _bump(commits=1)
+    if booking_id is not None:
+        notify("update" if old else "insert", booking_id, court_id, booking_date, start, end,
+               old_court_id=old[0] if old else None, old_date=old[1] if old else None)
+    return booking_id
+
+
+def delete_booking(conn, booking_id, user_id=None) -> bool:
+    """Delete one booking (only the user's own when `user_id` is given) and notify listeners."""
+    cur = conn.cursor()
+    sql, params = "SELECT court_id, booking_date FROM bookings WHERE id=%s", [booking_id]
+    if user_id is not None:
+        sql += " AND user_id=%s"
+        params.append(user_id)
+    cur.execute(sql, params)
+    row = cur.fetchone()
+    if not row:
+        cur.close()
+        return False
+    cur.execute("DELETE FROM bookings WHERE id=%s", (booking_id,))
+    deleted = cur.rowcount
+    if deleted:
+        summary.refresh(conn, row[0], row[1])
+    conn.commit()
+    cur.close()
+    if deleted:
+        notify("delete", booking_id, row[0], row[1])
+    return bool(deleted)
+
+
+# --- Recurring bookings -------------------------------------------------------------------------
+
+Recurrence = namedtuple("Recurrence", "court_ids dates start end")
+
+
+def recurrence_from_form(form) -> Recurrence:
+    """
+    Parse a recurring-booking form: court_ids (several), date, until, every
+    ("weekly" or "biweekly"), start_time and end_time. The slot must end after
+    it starts on the same day (overnight series are not supported). Raises
+    ValueError with a message fit for the user.
+    """
+    try:
+        court_ids = sorted({int(c) for c in form.getlist("court_ids")})
+        first = datetime.strptime(form.get("date", ""), "%Y-%m-%d").date()
+        until = datetime.strptime(form.get("until", ""), "%Y-%m-%d").date()
+        start = datetime.strptime(form.get("start_time", "").strip(), "%H:%M").strftime("%H:%M:%S")
+        end = datetime.strptime(form.get("end_time", "").strip(), "%H:%M").strftime("%H:%M:%S")
+    except ValueError:
+        raise ValueError("Please pick at least one court, valid dates and hh:mm times.") from None
+    step = {"weekly": 7, "biweekly": 14}.get(form.get("every"))
+    if not court_ids or step is None:
+        raise ValueError("Please pick at least one court and how often to repeat.")
+    if end <= start:
+        raise ValueError("The end time must be after the start time (series cannot run past midnight).")
+    if until < first:
+        raise ValueError("The end date must not be before the first date.")
+    dates = [first + timedelta(days=i) for i in range(0, (until - first).days + 1, step)]
+    if len(dates) * len(court_ids) > RECURRING_MAX_OCCURRENCES:
+        raise ValueError(f"That is more than {RECURRING_MAX_OCCURRENCES} bookings; pick a shorter season "
+                         "or fewer courts.")
+    return Recurrence(court_ids, dates, start, end)
+
+
+def _placeholders(n: int) -> str:
+    return ", ".join(["%s"] * n)
+
+
+def _overlapping(conn, court_ids, dates, start, end) -> dict:
+    """(court_id, date) -> id of a booking overlapping [start, end), for every court x date, in one query."""
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT court_id, booking_date, id FROM bookings
+        WHERE court_id IN ({_placeholders(len(court_ids))})
+          AND booking_date IN ({_placeholders(len(dates))})
+          AND NOT (end_time <= %s OR start_time >= %s)
+    """, (*court_ids, *dates, start, end))
+    found = {}
+    for court_id, booking_date, booking_id in cur.fetchall():
+        found.setdefault((court_id, to_date(booking_date)), booking_id)
+    cur.close()
+    return found
+
+
+def commit_recurring(conn, rec: Recurrence, user_id, skip_conflicts=False):
+    """
+    Book every court x date of `rec` in one transaction.
+
+    All court-day locks are taken first, in sorted order so two batches never
+    deadlock; then one query finds every overlap, one executemany inserts the
+    free occurrences and the transaction commits once. With `skip_conflicts`
+    the free occurrences are booked and the rest reported; otherwise any
+    overlap raises RecurringConflict and nothing is written. Returns
+    (created, conflicts): (booking_id, court_id, date) and
+    (court_id, date, clashing booking_id) lists. Raises SlotBusy.
+    """
+    pairs = [(c, d) for d in rec.dates for c in rec.court_ids]
+    with ExitStack() as locks:
+        for court_id, booking_date in sorted(pairs):
+            locks.enter_context(court_day_lock(conn, court_id, booking_date))
+        conn.rollback()
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        try:
+            taken = _overlapping(conn, rec.court_ids, rec.dates, rec.start, rec.end)
+            conflicts = [(c, d, taken[(c, d)]) for c, d in pairs if (c, d) in taken]
+            if conflicts and not skip_conflicts:
+                _bump(conflicts=len(conflicts))
+                raise RecurringConflict(conflicts)
+            free = [(c, d) for c, d in pairs if (c, d) not in taken]
+            created = []
+            if free:
+                cur = conn.cursor()
+                cur.executemany("""
+                    INSERT INTO bookings (court_id, user_id, booking_date, start_time, end_time)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, [(c, user_id, d, rec.start, rec.end) for c, d in free])
+                # Nothing overlapped the slot on a free court-day before the insert and the
+                # locks are still held, so there the only booking at exactly this slot for
+                # this user is the new row (other court x date combinations are ignored).
+                court_ids, dates = sorted({c for c, _ in free}), sorted({d for _, d in free})
+                cur.execute(f"""
+                    SELECT court_id, booking_date, id FROM bookings
+                    WHERE court_id IN ({_placeholders(len(court_ids))})
+                      AND booking_date IN ({_placeholders(len(dates))})
+                      AND start_time=%s AND end_time=%s AND user_id=%s
+                """, (*court_ids, *dates, rec.start, rec.end, user_id))
+                ids = {(c, to_date(d)): booking_id for c, d, booking_id in cur.fetchall()}
+                cur.close()
+                created = [(ids[(c, d)], c, d) for c, d in free]
+                summary.refresh_many(conn, free)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    _bump(commits=1, conflicts=len(conflicts))
+    for booking_id, court_id, booking_date in created:
+        notify("insert", booking_id, court_id, booking_date, rec.start, rec.end)
+    return created, conflicts
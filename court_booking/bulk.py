@@ -0,0 +1,199 @@
+"""
+Bulk admin operations on bookings and users.
+
+Each operation runs as one transaction: the selected ids are processed in
+chunks of BULK_CHUNK_SIZE, one set-based statement per chunk, and committed
+once, so a failure leaves nothing half done. Caches are reset once per
+operation rather than once per row.
+"""
+import os
+from contextlib import ExitStack
+
+from court_booking import repository, summary
+from court_booking.bookings import court_day_lock, notify
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_IDS = int(os.environ.get("BULK_MAX_IDS", "5000"))
+
+
+class BulkRefused(Exception):
+    """The operation was not applied; the message says why."""
+
+
+class BulkConflict(BulkRefused):
+    """A move would overlap bookings; `conflicts` holds (moved booking id, overlapped booking id) pairs."""
+
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} moved booking(s) would overlap others")
+        self.conflicts = conflicts
+
+
+def parse_ids(values):
+    """Sorted distinct positive ids from form values; raises BulkRefused when there are none or too many."""
+    try:
+        ids = sorted({int(v) for v in values if str(v).strip()})
+    except ValueError:
+        raise BulkRefused("Invalid selection.") from None
+    if not ids or ids[0] < 1:
+        raise BulkRefused("Nothing selected.")
+    if len(ids) > BULK_MAX_IDS:
+        raise BulkRefused(f"At most {BULK_MAX_IDS} items can be changed at once.")
+    return ids
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), BULK_CHUNK_SIZE):
+        yield ids[i:i + BULK_CHUNK_SIZE]
+
+
+def _in(ids) -> str:
+    return "(" + ", ".join(["%s"] * len(ids)) + ")"
+
+
+def _begin(conn):
+    conn.rollback()
+    conn.start_transaction(isolation_level="READ COMMITTED")
+
+
+def _placements(cur, ids):
+    """id -> (court_id, booking_date) of the bookings among `ids`."""
+    found = {}
+    for chunk in _chunks(ids):
+        cur.execute(f"SELECT id, court_id, booking_date FROM bookings WHERE id IN {_in(chunk)}", chunk)
+        found.update((row[0], (row[1], row[2])) for row in cur.fetchall())
+    return found
+
+
+# --- Bookings -----------------------------------------------------------------------------------
+
+def delete_bookings(conn, ids) -> int:
+    """Delete the given bookings; returns how many existed."""
+    cur = conn.cursor()
+    _begin(conn)
+    try:
+        placed = _placements(cur, ids)
+        for chunk in _chunks(sorted(placed)):
+            cur.execute(f"DELETE FROM bookings WHERE id IN {_in(chunk)}", chunk)
+        summary.refresh_many(conn, placed.values())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if placed:
+        notify("reset")
+    return len(placed)
+
+
+def move_bookings(conn, ids, court_id=None, booking_date=None) -> int:
+    """
+    Move the given bookings to another court and/or date, keeping their times.
+
+    The target court-days are locked (in sorted order) for the duration, and
+    after the update one query per chunk looks for any moved booking that now
+    overlaps another one, including another moved one; if there is any, the
+    whole move is rolled back and BulkConflict raised. A target court that is
+    missing or Unavailable raises BulkRefused. Raises SlotBusy.
+    """
+    if court_id is None and booking_date is None:
+        raise BulkRefused("Choose a court or a date to move to.")
+    if court_id is not None:
+        court = repository.court_by_id(conn, court_id)
+        if court is None:
+            raise BulkRefused("That court no longer exists.")
+        if court.status == "Unavailable":
+            raise BulkRefused(f"{court.court_name} is unavailable; choose another court.")
+    cur = conn.cursor()
+    try:
+        placed = _placements(cur, ids)
+        conn.rollback()
+        targets = sorted({(court_id or c, booking_date or d) for c, d in placed.values()})
+        with ExitStack() as locks:
+            for target in targets:
+                locks.enter_context(court_day_lock(conn, *target))
+            _begin(conn)
+            try:
+                placed = _placements(cur, ids)  # again, now that the targets are locked
+                moved = sorted(placed)
+                for chunk in _chunks(moved):
+                    cur.execute(f"""
+                        UPDATE bookings SET court_id=COALESCE(%s, court_id), booking_date=COALESCE(%s, booking_date)
+                        WHERE id IN {_in(chunk)}
+                    """, [court_id, booking_date, *chunk])
+                conflicts = []
+                for chunk in _chunks(moved):
+                    cur.execute(f"""
+                        SELECT m.id, o.id FROM bookings m
+                        JOIN bookings o ON o.court_id = m.court_id AND o.booking_date = m.booking_date
+                         AND o.id <> m.id AND NOT (o.end_time <= m.start_time OR o.start_time >= m.end_time)
+                        WHERE m.id IN {_in(chunk)}
+                    """, chunk)
+                    conflicts.extend(cur.fetchall())
+                if conflicts:
+                    raise BulkConflict(sorted(conflicts))
+                summary.refresh_many(conn, list(placed.values()) + targets)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        cur.close()
+    if placed:
+        notify("reset")
+    return len(placed)
+
+
+# --- Users --------------------------------------------------------------------------------------
+
+def _guard_last_admin(cur, ids):
+    """Refuse when the set covers every active admin (the whole-set form of ensure_not_last_active_admin)."""
+    # Locks the active admin rows until commit, so two bulk edits cannot each leave "the other" admin.
+    cur.execute("SELECT id FROM users WHERE role='admin' AND active=1 FOR UPDATE")
+    admins = {row[0] for row in cur.fetchall()}
+    if admins and admins <= set(ids):
+        raise BulkRefused("Operation blocked: would remove the last active admin.")
+
+
+def set_users_active(conn, ids, active: bool) -> int:
+    """Activate or deactivate the given users; returns the number of rows changed."""
+    cur = conn.cursor()
+    _begin(conn)
+    try:
+        if not active:
+            _guard_last_admin(cur, ids)
+        changed = 0
+        for chunk in _chunks(ids):
+            cur.execute(f"UPDATE users SET active=%s WHERE id IN {_in(chunk)}", [int(active), *chunk])
+            changed += cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return changed
+
+
+def delete_users(conn, ids) -> int:
+    """Delete the given users and (by cascade) their bookings; returns how many were deleted."""
+    cur = conn.cursor()
+    _begin(conn)
+    try:
+        _guard_last_admin(cur, ids)
+        keys, deleted = set(), 0
+        for chunk in _chunks(ids):
+            cur.execute(f"SELECT DISTINCT court_id, booking_date FROM bookings WHERE user_id IN {_in(chunk)}", chunk)
+            keys.update(tuple(k) for k in cur.fetchall())
+            cur.execute(f"DELETE FROM users WHERE id IN {_in(chunk)}", chunk)
+            deleted += cur.rowcount
+        summary.refresh_many(conn, keys)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if keys:
+        notify("reset")
+    return deleted
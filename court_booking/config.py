@@ -1,14 +1,98 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(), override=False)
 
 import mysql.connector
+from flask import g, has_app_context
 
-def get_db_connection():
-    return mysql.connector.connect(
+from court_booking import tracing
+from court_booking.pool import ConnectionPool, PooledConnection
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _connect():
+    return tracing.wrap(mysql.connector.connect(
         host=os.environ.get("DB_HOST", "127.0.0.1"),
         port=int(os.environ.get("DB_PORT", "3306")),
         user=os.environ.get("DB_USER", "root"),
         password=os.environ.get("DB_PASSWORD", ""),
         database=os.environ.get("DB_NAME", "court_booking"),
-    )
\ No newline at end of file
+    ))
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide connection pool, created lazily (and re-created after a fork)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(
+                    _connect,
+                    size=int(os.environ.get("DB_POOL_SIZE", "5")),
+                    max_overflow=int(os.environ.get("DB_POOL_MAX_OVERFLOW", "10")),
+                    recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                    pre_ping=os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def _acquire(pool):
+    t0 = time.perf_counter()
+    raw = pool.acquire()
+    tracing.acquired(time.perf_counter() - t0)
+    return raw
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+
+class _RequestConnection(PooledConnection):
+    """Connection shared by everything in one app context; released on teardown, not on close()."""
+
+    def close(self, discard=False):
+        pass
+
+    def release(self, discard=False):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, discard=discard)
+
+
+def get_db_connection():
+    """
+    Inside a request: the request's single pooled connection (held on `g`).
+    Outside one: a pooled connection that returns to the pool on close().
+    """
+    if has_app_context():
+        conn = g.get("_db_conn")
+        if conn is None:
+            pool = get_pool()
+            conn = g._db_conn = _RequestConnection(pool, _acquire(pool))
+        return conn
+    pool = get_pool()
+    return PooledConnection(pool, _acquire(pool))
+
+
+def pooled_connection() -> PooledConnection:
+    """A dedicated pooled connection, independent of the request's; use as a context manager."""
+    pool = get_pool()
+    return PooledConnection(pool, _acquire(pool))
+
+
+def _release_request_connection(exc=None):
+    conn = g.pop("_db_conn", None)
+    if conn is not None:
+        conn.release()
+
+
+def init_db(app):
+    app.teardown_appcontext(_release_request_connection)
@@ -0,0 +1,94 @@
+"""
+Run independent read queries in parallel, each on its own pooled connection.
+
+    total, page = fanout.run({"total": count_fn, "page": fanout.rows(sql, params)}).values()
+
+Tasks are zero-argument callables run on a shared pool of FANOUT_WORKERS
+threads; outside a request, `get_db_connection()` gives each one a dedicated
+pooled connection, so a page's queries overlap and its latency approaches the
+slowest one instead of their sum. Per-request metrics and query-log state are
+handed on to the workers. With FANOUT_WORKERS=0, or when called from a worker,
+tasks run one after another in the calling thread.
+
+Each task holds a connection of its own while it runs, on top of the one the
+request may already hold: the admin bookings listing takes up to 1 + 3 and a
+dashboard refresh up to 1 + 5, so DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW must
+leave room for that times the concurrent requests. Callers that can live with
+less catch FanoutTimeout and use `finish()` or a stale result.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from court_booking import tracing
+from court_booking.config import get_db_connection
+
+FANOUT_WORKERS = int(os.environ.get("FANOUT_WORKERS", "8"))
+FANOUT_TIMEOUT = float(os.environ.get("FANOUT_TIMEOUT", "10"))
+
+_PREFIX = "fanout"
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+class FanoutTimeout(Exception):
+    """Some tasks did not finish within the timeout; `pending` names them, `done` holds the others' results."""
+
+    def __init__(self, pending, done=None):
+        super().__init__(f"timed out waiting for {', '.join(pending)}")
+        self.pending = pending
+        self.done = done or {}
+
+
+def _executor():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ThreadPoolExecutor(FANOUT_WORKERS, thread_name_prefix=_PREFIX)
+                _pool_pid = pid
+    return _pool
+
+
+def rows(sql, params=(), dictionary=False):
+    """A task that runs one query and returns all its rows."""
+    def task():
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            cur.execute(sql, params)
+            return cur.fetchall()
+        finally:
+            cur.close(); conn.close()
+    return task
+
+
+def run(tasks: dict, timeout: float = FANOUT_TIMEOUT) -> dict:
+    """
+    {name: result} of every task, in the order given. The first task exception
+    is re-raised; tasks still running after `timeout` raise FanoutTimeout (they
+    finish in the background and return their connections then).
+    """
+    if FANOUT_WORKERS <= 0 or len(tasks) < 2 or threading.current_thread().name.startswith(_PREFIX):
+        return {name: fn() for name, fn in tasks.items()}
+    pool = _executor()
+    futures = {name: pool.submit(tracing.bind(fn)) for name, fn in tasks.items()}
+    _, pending = wait(futures.values(), timeout=timeout)
+    if pending:
+        for f in pending:
+            f.cancel()
+        raise FanoutTimeout([name for name, f in futures.items() if f in pending],
+                            {name: f.result() for name, f in futures.items() if f not in pending})
+    return {name: f.result() for name, f in futures.items()}
+
+
+def finish(tasks: dict, timeout: FanoutTimeout, skip=()) -> dict:
+    """
+    Results of a run that raised `timeout`: finished tasks as they were, the
+    pending ones re-run one after another in the calling thread, except those
+    named in `skip` (left out of the result).
+    """
+    return {name: timeout.done[name] if name in timeout.done else fn()
+            for name, fn in tasks.items() if name in timeout.done or name not in skip}
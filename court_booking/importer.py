@@ -0,0 +1,371 @@
+"""
+Streaming CSV import of bookings, in the columns of /admin/export_bookings.csv
+(ID, Username, Email, Court, Date, Start, End; ID is ignored).
+
+An upload is stored to a temporary file (plain or gzip-compressed, sent whole
+or as ordered parts that each fit under MAX_CONTENT_LENGTH) and imported by a
+background job that reads it as a stream: users and courts are resolved
+through in-memory maps, rows are checked and written in batches of
+IMPORT_BATCH_ROWS, so memory use does not grow with the file. Each batch
+locks its court-days, loads the existing bookings of those court-days with one
+query, skips rows that overlap them or an earlier row of the batch, inserts
+the rest with one executemany and commits; rows of later batches see earlier
+batches in the database. Jobs and their progress are files in IMPORT_DIR,
+which every worker process must share.
+"""
+import csv
+import fcntl
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime
+
+from court_booking import summary
+from court_booking.bookings import SlotBusy, court_day_lock, notify
+from court_booking.config import pooled_connection
+from court_booking.intervals import to_minutes
+
+log = logging.getLogger(__name__)
+
+IMPORT_DIR = os.environ.get("IMPORT_DIR", os.path.join(tempfile.gettempdir(), "court_booking_imports"))
+IMPORT_BATCH_ROWS = int(os.environ.get("IMPORT_BATCH_ROWS", "1000"))
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+IMPORT_MAX_ERRORS = 200
+IMPORT_KEEP_JOBS = 20
+IMPORT_ABANDON_SECONDS = 24 * 3600  # uploads never started are dropped after this
+
+COLUMNS = ["ID", "Username", "Email", "Court", "Date", "Start", "End"]
+
+_JOB_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class ImportRefused(Exception):
+    """The upload or job request was rejected; the message says why."""
+
+
+class ImportJob:
+    """
+    One import, kept as `<id>.json` next to `<id>.upload` in IMPORT_DIR so that
+    every worker process sharing the directory sees the same job: parts, start
+    and progress requests may each land on a different process.
+    """
+
+    FIELDS = ("id", "owner", "filename", "state", "message", "size", "position", "rows", "imported",
+              "conflicts", "invalid", "errors", "created", "updated", "started", "finished")
+
+    def __init__(self, owner, filename, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:16]
+        self.owner = owner
+        self.filename = filename
+        self.state = "uploading"  # -> queued -> running -> done | failed
+        self.message = ""
+        self.size = 0
+        self.position = 0
+        self.rows = self.imported = self.conflicts = self.invalid = 0
+        self.errors = []
+        self.created = self.updated = time.time()
+        self.started = self.finished = None
+
+    def _file(self, ext):
+        return os.path.join(IMPORT_DIR, f"{self.id}.{ext}")
+
+    @property
+    def path(self):
+        return self._file("upload")
+
+    @classmethod
+    def load(cls, job_id):
+        """The job saved under `job_id`, or None."""
+        if not _JOB_ID.match(job_id or ""):
+            return None
+        try:
+            with open(os.path.join(IMPORT_DIR, f"{job_id}.json"), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls(data["owner"], data["filename"], job_id)
+        for name in cls.FIELDS:
+            if name in data:
+                setattr(job, name, data[name])
+        return job
+
+    def save(self):
+        """Write the job's state (atomically, so readers never see half a file)."""
+        self.updated = time.time()
+        tmp = self._file(f"json.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({name: getattr(self, name) for name in self.FIELDS}, f)
+        os.replace(tmp, self._file("json"))
+
+    @contextmanager
+    def locked(self):
+        """Hold the job's file lock and reload its state; serializes changes across threads and processes."""
+        with open(self._file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                fresh = ImportJob.load(self.id)
+                if fresh is None:
+                    raise ImportRefused("This import no longer exists.")
+                self.__dict__.update(fresh.__dict__)
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, offset: int, stream) -> int:
+        """Append one upload part read from `stream`; parts must arrive in order (a resent part is ignored)."""
+        with self.locked():
+            if self.state != "uploading":
+                raise ImportRefused("This import is no longer accepting data.")
+            if offset < self.size:
+                return self.size
+            if offset != self.size:
+                raise ImportRefused(f"Expected the part at offset {self.size}.")
+            with open(self.path, "ab") as f:
+                for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                    self.size += len(chunk)
+                    if self.size > IMPORT_MAX_BYTES:
+                        break
+                    f.write(chunk)
+            if self.size > IMPORT_MAX_BYTES:
+                self.state, self.message = "failed", "The upload is too large."
+                self.save()
+                os.remove(self.path)
+                raise ImportRefused(f"Imports are limited to {IMPORT_MAX_BYTES // (1024 * 1024)} MB.")
+            self.save()
+            return self.size
+
+    def error(self, row_no, message):
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append((row_no, message))
+
+    def progress(self) -> dict:
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "state": self.state,
+            "message": self.message,
+            "size": self.size,
+            "position": self.position,
+            "percent": round(100.0 * self.position / self.size, 1) if self.size else 0.0,
+            "rows": self.rows,
+            "imported": self.imported,
+            "conflicts": self.conflicts,
+            "invalid": self.invalid,
+            "errors": self.errors[:IMPORT_MAX_ERRORS],
+            "elapsed": round(elapsed, 1),
+        }
+
+    def remove(self):
+        for ext in ("upload", "json", "lock"):
+            try:
+                os.remove(self._file(ext))
+            except OSError:
+                pass
+
+
+_running = threading.Semaphore(1)  # one import at a time per process; later ones queue
+
+
+def _all():
+    try:
+        names = os.listdir(IMPORT_DIR)
+    except OSError:
+        return []
+    jobs = (ImportJob.load(n[:-5]) for n in names if n.endswith(".json"))
+    return [j for j in jobs if j is not None]
+
+
+def create(owner, filename) -> ImportJob:
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    jobs = _all()
+    now = time.time()
+    stale = sorted((j for j in jobs if j.state in ("done", "failed")), key=lambda j: j.created)
+    stale = stale[:max(0, len(stale) - IMPORT_KEEP_JOBS + 1)]
+    stale += [j for j in jobs if j.state == "uploading" and now - j.updated > IMPORT_ABANDON_SECONDS]
+    for old in stale:
+        old.remove()
+    job = ImportJob(owner, os.path.basename(filename or "upload.csv"))
+    open(job.path, "wb").close()
+    job.save()
+    return job
+
+
+def get(job_id, owner=None):
+    """The job, or None when there is none (or it belongs to someone other than `owner`)."""
+    job = ImportJob.load(job_id)
+    if job is None or (owner is not None and job.owner != owner):
+        return None
+    return job
+
+
+def recent(owner=None):
+    return sorted((j for j in _all() if owner is None or j.owner == owner), key=lambda j: -j.created)
+
+
+def start(job: ImportJob):
+    with job.locked():
+        if job.state != "uploading":
+            raise ImportRefused("This import has already started.")
+        if not job.size:
+            raise ImportRefused("The upload is empty.")
+        job.state = "queued"
+        job.save()
+    threading.Thread(target=_run, args=(job,), name=f"import-{job.id}", daemon=True).start()
+
+
+def _run(job: ImportJob):
+    with _running:
+        job.state, job.started = "running", time.time()
+        job.save()
+        try:
+            with open(job.path, "rb") as raw:
+                binary = gzip.GzipFile(fileobj=raw) if raw.peek(2)[:2] == b"\x1f\x8b" else raw
+                text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+                with pooled_connection() as conn:
+                    _import(conn, job, csv.reader(text), raw)
+            job.state = "done"
+        except (ImportRefused, UnicodeDecodeError, OSError, csv.Error) as e:
+            job.state, job.message = "failed", str(e)
+        except SlotBusy:
+            job.state, job.message = "failed", ("Some court-days stayed busy; import the file again to add "
+                                                "the remaining rows (imported ones are skipped as overlaps).")
+        except Exception as e:
+            log.exception("import %s failed", job.id)
+            job.state, job.message = "failed", f"Unexpected error: {e}"
+        finally:
+            job.finished = time.time()
+            job.save()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+    log.info("import %s (%s): %s, %d rows, %d imported, %d conflicts, %d invalid in %.1fs", job.id, job.filename,
+             job.state, job.rows, job.imported, job.conflicts, job.invalid, job.finished - job.started)
+
+
+def _lookups(conn):
+    """({username: id}, {email: id}, {court name: id}), keys lowercased."""
+    users, emails, courts = {}, {}, {}
+    cur = conn.cursor(buffered=False)
+    cur.execute("SELECT id, username, email FROM users")
+    for user_id, username, email in cur:
+        if username:
+            users[username.lower()] = user_id
+        if email:
+            emails[email.lower()] = user_id
+    cur.close()
+    cur = conn.cursor()
+    cur.execute("SELECT id, court_name FROM courts")
+    courts = {name.lower(): court_id for court_id, name in cur.fetchall()}
+    cur.close()
+    return users, emails, courts
+
+
+def _time(val: str) -> str:
+    val = val.strip()
+    return datetime.strptime(val, "%H:%M:%S" if val.count(":") == 2 else "%H:%M").strftime("%H:%M:%S")
+
+
+def _import(conn, job: ImportJob, reader, raw):
+    header = [h.strip().lower() for h in next(reader, [])]
+    col = {name: header.index(name.lower()) for name in COLUMNS if name.lower() in header}
+    missing = [n for n in ("Court", "Date", "Start", "End") if n not in col]
+    if missing or ("Username" not in col and "Email" not in col):
+        raise ImportRefused("Expected the columns " + ", ".join(COLUMNS) + " (as exported).")
+    users, emails, courts = _lookups(conn)
+
+    def field(row, name):
+        i = col.get(name)
+        return row[i].strip() if i is not None and i < len(row) else ""
+
+    batch = []
+    for row_no, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        job.rows += 1
+        user_id = users.get(field(row, "Username").lower()) or emails.get(field(row, "Email").lower())
+        court_id = courts.get(field(row, "Court").lower())
+        try:
+            day = date.fromisoformat(field(row, "Date"))
+            start, end = _time(field(row, "Start")), _time(field(row, "End"))
+        except ValueError:
+            day = start = end = None
+        problem = ("unknown user" if user_id is None else "unknown court" if court_id is None
+                   else "invalid date or time" if day is None or start == end else None)
+        if problem:
+            job.invalid += 1
+            job.error(row_no, problem)
+            continue
+        batch.append((row_no, court_id, user_id, day, start, end))
+        if len(batch) >= IMPORT_BATCH_ROWS:
+            _write_batch(conn, job, batch)
+            batch = []
+            job.position = raw.tell()
+            job.save()
+    if batch:
+        _write_batch(conn, job, batch)
+    job.position = job.size
+
+
+def _existing(cur, pairs):
+    """(court_id, date) -> [(start_min, end_min, booking_id)] for the given court-days, in one query."""
+    court_ids = sorted({c for c, _ in pairs})
+    days = sorted({d for _, d in pairs})
+    cur.execute(f"""
+        SELECT court_id, booking_date, start_time, end_time, id FROM bookings
+        WHERE court_id IN ({", ".join(["%s"] * len(court_ids))})
+          AND booking_date IN ({", ".join(["%s"] * len(days))})
+    """, (*court_ids, *days))
+    taken = {}
+    for court_id, day, start, end, booking_id in cur.fetchall():
+        if (court_id, day) in pairs:
+            taken.setdefault((court_id, day), []).append((to_minutes(start), to_minutes(end), booking_id))
+    return taken
+
+
+def _write_batch(conn, job: ImportJob, batch):
+    pairs = {(c, d) for _, c, _, d, _, _ in batch}
+    cur = conn.cursor()
+    try:
+        with ExitStack() as locks:
+            for court_id, day in sorted(pairs):
+                locks.enter_context(court_day_lock(conn, court_id, day))
+            conn.rollback()
+            conn.start_transaction(isolation_level="READ COMMITTED")
+            try:
+                taken = _existing(cur, pairs)
+                rows = []
+                for row_no, court_id, user_id, day, start, end in batch:
+                    s, e = to_minutes(start), to_minutes(end)
+                    # Same predicate as the SQL conflict check: NOT (end <= s OR start >= e).
+                    clash = next((b for bs, be, b in taken.get((court_id, day), ()) if not (be <= s or bs >= e)), None)
+                    if clash is not None:
+                        job.conflicts += 1
+                        job.error(row_no, f"overlaps booking #{clash}" if clash > 0 else f"overlaps row {-clash}")
+                        continue
+                    taken.setdefault((court_id, day), []).append((s, e, -row_no))
+                    rows.append((court_id, user_id, day, start, end))
+                if rows:
+                    cur.executemany("""
+                        INSERT INTO bookings (court_id, user_id, booking_date, start_time, end_time)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, rows)
+                    summary.refresh_many(conn, {(c, d) for c, _, d, _, _ in rows})
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        cur.close()
+    if rows:
+        job.imported += len(rows)
+        notify("reset")
@@ -0,0 +1,277 @@
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from court_booking import repository
+
+log = logging.getLogger(__name__)
+
+DAY_MINUTES = 24 * 60
+
+
+def to_minutes(val) -> int:
+    """MySQL TIME (timedelta), datetime.time or 'HH:MM[:SS]' -> minutes after midnight."""
+    if val is None:
+        return 0
+    if isinstance(val, timedelta):
+        return int(val.total_seconds() // 60) % DAY_MINUTES
+    if hasattr(val, "hour") and hasattr(val, "minute"):
+        return val.hour * 60 + val.minute
+    hh, mm, *_ = str(val).split(":")
+    return int(hh) * 60 + int(mm)
+
+
+def to_date(val):
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, date):
+        return val
+    return datetime.strptime(str(val).strip(), "%Y-%m-%d").date()
+
+
+def fmt_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def sql_conflict(conn, court_id, booking_date, start, end, exclude_id=None):
+    """Id of a booking overlapping [start, end) on that court and day, straight from MySQL."""
+    return repository.find_conflict(conn, court_id, booking_date, start, end, exclude_id)
+
+
+class DayIntervals:
+    """
+    Bookings of one court on one day, sorted by start minute.
+
+    `max_end[i]` is the largest end among the first i+1 intervals, so "is there
+    an interval with start < e and end > s" (the SQL conflict predicate) is one
+    bisect plus one lookup. `max_busy` is the same over ends clamped to midnight
+    for overnight slots and drives the free-gap search.
+    """
+
+    __slots__ = ("starts", "ends", "ids", "max_end", "max_busy", "loaded_at")
+
+    def __init__(self, rows=()):
+        self.starts, self.ends, self.ids = [], [], []
+        for booking_id, s, e in sorted(rows, key=lambda r: (r[1], r[0])):
+            self.starts.append(s); self.ends.append(e); self.ids.append(booking_id)
+        self.max_end, self.max_busy = [], []
+        self._rebuild(0)
+        self.loaded_at = time.monotonic()
+
+    def _rebuild(self, i: int):
+        del self.max_end[i:], self.max_busy[i:]
+        m = self.max_end[i - 1] if i else -1
+        mb = self.max_busy[i - 1] if i else -1
+        for j in range(i, len(self.starts)):
+            s, e = self.starts[j], self.ends[j]
+            m = max(m, e)
+            mb = max(mb, e if e > s else DAY_MINUTES)
+            self.max_end.append(m)
+            self.max_busy.append(mb)
+
+    def add(self, booking_id: int, s: int, e: int):
+        i = bisect_right(self.starts, s)
+        self.starts.insert(i, s); self.ends.insert(i, e); self.ids.insert(i, booking_id)
+        self._rebuild(i)
+
+    def remove(self, booking_id: int) -> bool:
+        try:
+            i = self.ids.index(booking_id)
+        except ValueError:
+            return False
+        del self.starts[i], self.ends[i], self.ids[i]
+        self._rebuild(i)
+        return True
+
+    def conflict(self, s: int, e: int, exclude_id=None):
+        """Id of a booking with start < e and end > s (ignoring `exclude_id`), else None."""
+        j = bisect_left(self.starts, e) - 1
+        while j >= 0 and self.max_end[j] > s:
+            if self.ends[j] > s and self.ids[j] != exclude_id:
+                return self.ids[j]
+            j -= 1
+        return None
+
+    def next_free(self, duration: int, not_before: int = 0, exclude_id=None):
+        """Earliest (start, end) window of `duration` minutes at or after `not_before`, else None."""
+        t = not_before
+        i = bisect_right(self.starts, t)
+        if exclude_id is None:
+            if i:
+                t = max(t, self.max_busy[i - 1])
+        else:
+            for j in range(i):
+                if self.ids[j] != exclude_id:
+                    t = max(t, self.ends[j] if self.ends[j] > self.starts[j] else DAY_MINUTES)
+        for j in range(i, len(self.starts)):
+            if self.ids[j] == exclude_id:
+                continue
+            if self.starts[j] - t >= duration:
+                break
+            t = max(t, self.ends[j] if self.ends[j] > self.starts[j] else DAY_MINUTES)
+        if t + duration > DAY_MINUTES:
+            return None
+        return t, t + duration
+
+
+class ConflictIndex:
+    """
+    Per-process, lazily loaded interval index keyed by (court_id, booking_date).
+
+    Overlap checks and free-gap lookups are answered from memory; the write paths
+    keep it in sync and entries are reloaded from MySQL after `ttl` seconds so
+    writes made by other workers are picked up. With `verify_rate` > 0 a sample
+    of lookups is re-checked against SQL and any drift is logged and repaired.
+    """
+
+    def __init__(self, enabled=False, ttl=60.0, max_days=20000, verify_rate=0.0):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_days = max_days
+        self.verify_rate = verify_rate
+        self._days = OrderedDict()
+        self._where = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.verified = 0
+        self.drift = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get("CONFLICT_INDEX", "0") == "1",
+            ttl=float(os.environ.get("CONFLICT_INDEX_TTL", "60")),
+            max_days=int(os.environ.get("CONFLICT_INDEX_MAX_DAYS", "20000")),
+            verify_rate=float(os.environ.get("CONFLICT_INDEX_VERIFY", "0")),
+        )
+
+    @staticmethod
+    def _key(court_id, booking_date):
+        return int(court_id), to_date(booking_date)
+
+    def _forget(self, key):
+        day = self._days.pop(key, None)
+        if day is not None:
+            for booking_id in day.ids:
+                self._where.pop(booking_id, None)
+
+    def _get(self, conn, key) -> DayIntervals:
+        with self._lock:
+            day = self._days.get(key)
+            if day is not None and time.monotonic() - day.loaded_at <= self.ttl:
+                self._days.move_to_end(key)
+                self.hits += 1
+                return day
+
+        rows = [(r.id, to_minutes(r.start_time), to_minutes(r.end_time))
+                for r in repository.day_bookings(conn, *key)]
+        day = DayIntervals(rows)
+
+        with self._lock:
+            self._forget(key)
+            self._days[key] = day
+            for booking_id in day.ids:
+                self._where[booking_id] = key
+            while len(self._days) > self.max_days:
+                self._forget(next(iter(self._days)))
+            self.loads += 1
+        return day
+
+    def find_conflict(self, conn, court_id, booking_date, start, end, exclude_id=None):
+        """Id of a booking overlapping [start, end) on that court and day, or None."""
+        key = self._key(court_id, booking_date)
+        s, e = to_minutes(start), to_minutes(end)
+        found = self._get(conn, key).conflict(s, e, exclude_id)
+
+        if self.verify_rate > 0 and random.random() < self.verify_rate:
+            truth = sql_conflict(conn, key[0], key[1], fmt_minutes(s), fmt_minutes(e), exclude_id)
+            with self._lock:
+                self.verified += 1
+                if (truth is None) != (found is None):
+                    self.drift += 1
+                    self._forget(key)
+                    log.warning("conflict index drift on court %s %s %s-%s: index=%s sql=%s",
+                                key[0], key[1], fmt_minutes(s), fmt_minutes(e), found, truth)
+            return truth
+        return found
+
+    def check(self, conn, court_id, booking_date, start, end, exclude_id=None):
+        """Conflict check used by the booking write paths: the index when enabled, SQL otherwise."""
+        if self.enabled:
+            try:
+                return self.find_conflict(conn, court_id, booking_date, start, end, exclude_id)
+            except ValueError:
+                pass
+        return sql_conflict(conn, court_id, booking_date, start, end, exclude_id)
+
+    def suggest(self, conn, court_id, booking_date, start, end, exclude_id=None):
+        """Next free window of the same length on that day (index only), for conflict messages."""
+        if not self.enabled:
+            return None
+        try:
+            duration = (to_minutes(end) - to_minutes(start)) % DAY_MINUTES or DAY_MINUTES
+            return self.next_free(conn, court_id, booking_date, duration, start, exclude_id)
+        except ValueError:
+            return None
+
+    def next_free(self, conn, court_id, booking_date, duration, not_before=0, exclude_id=None):
+        """Earliest free ('HH:MM', 'HH:MM') window of `duration` minutes on that day, or None."""
+        key = self._key(court_id, booking_date)
+        gap = self._get(conn, key).next_free(int(duration), to_minutes(not_before), exclude_id)
+        return (fmt_minutes(gap[0]), fmt_minutes(gap[1])) if gap else None
+
+    def add(self, court_id, booking_date, booking_id, start, end):
+        """Record a committed booking; days that are not loaded are picked up on next load."""
+        key = self._key(court_id, booking_date)
+        with self._lock:
+            self._remove_locked(booking_id)
+            day = self._days.get(key)
+            if day is not None:
+                day.add(int(booking_id), to_minutes(start), to_minutes(end))
+                self._where[int(booking_id)] = key
+
+    def _remove_locked(self, booking_id):
+        key = self._where.pop(int(booking_id), None)
+        if key is not None and key in self._days:
+            self._days[key].remove(int(booking_id))
+
+    def remove(self, booking_id):
+        with self._lock:
+            self._remove_locked(booking_id)
+
+    def forget_day(self, court_id, booking_date):
+        """Drop one court-day (e.g. found stale); it is reloaded on next use."""
+        key = self._key(court_id, booking_date)
+        with self._lock:
+            self._forget(key)
+
+    def forget_court(self, court_id):
+        with self._lock:
+            for key in [k for k in self._days if k[0] == int(court_id)]:
+                self._forget(key)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._where.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "days_loaded": len(self._days),
+                "bookings_indexed": len(self._where),
+                "hits": self.hits,
+                "loads": self.loads,
+                "verified": self.verified,
+                "drift": self.drift,
+            }
+
+
+conflict_index = ConflictIndex.from_env()
@@ -0,0 +1,76 @@
+import heapq
+from datetime import timedelta
+
+from court_booking.intervals import to_minutes
+
+
+def _minutes_column(values):
+    # MySQL TIME arrives as timedelta; .seconds is already reduced modulo one day.
+    return [v.seconds // 60 if type(v) is timedelta else to_minutes(v) for v in values]
+
+
+def assign_lanes(days, row_starts, row_ends):
+    """
+    Side-by-side lanes for overlapping events (greedy interval-graph colouring).
+
+    Events are swept per day in start order; each takes the lowest lane freed by
+    an event that already ended. Every event of a cluster of transitively
+    overlapping events reports the cluster's lane count, so they share its width.
+    Returns (lane, lanes) lists aligned with the inputs. O(n log n).
+    """
+    n = len(row_starts)
+    lane = [0] * n
+    lanes = [1] * n
+    order = sorted(range(n), key=lambda i: (days[i], row_starts[i], row_ends[i]))
+
+    active, free, cluster = [], [], []
+    cluster_day, cluster_end, width = None, -1, 0
+
+    def close_cluster():
+        for j in cluster:
+            lanes[j] = width
+
+    for i in order:
+        d, s, e = days[i], row_starts[i], row_ends[i]
+        if d != cluster_day or s >= cluster_end:
+            close_cluster()
+            active, free, cluster = [], [], []
+            cluster_day, cluster_end, width = d, e, 0
+        while active and active[0][0] <= s:
+            heapq.heappush(free, heapq.heappop(active)[1])
+        lane[i] = heapq.heappop(free) if free else len(active)
+        heapq.heappush(active, (e, lane[i]))
+        cluster.append(i)
+        cluster_end = max(cluster_end, e)
+        width = max(width, lane[i] + 1)
+    close_cluster()
+    return lane, lanes
+
+
+def layout_events(rows, first_day=None, hours_start=6, hours_end=22, slot_minutes=30):
+    """
+    Grid placement for a batch of booking rows (start_time, end_time and
+    booking_date attributes), computed column by column.
+
+    Returns parallel lists: day index (relative to `first_day`, 0 when None),
+    clamped row start/end on the slot grid, lane and lane count.
+    """
+    rows_count = (hours_end - hours_start) * 60 // slot_minutes
+    grid0 = hours_start * 60
+
+    smin = _minutes_column([r.start_time for r in rows])
+    emin = _minutes_column([r.end_time for r in rows])
+    if first_day is None:
+        days = [0] * len(rows)
+    else:
+        days = [(r.booking_date - first_day).days for r in rows]
+
+    # Overnight or zero-length slots get one slot; starts before the grid are clamped to it.
+    emin = [e if e > s else s + slot_minutes for s, e in zip(smin, emin)]
+    smin = [s if s > grid0 else grid0 for s in smin]
+    row_start = [min((s - grid0) // slot_minutes, rows_count - 1) for s in smin]
+    row_end = [min(max((max(e, s + slot_minutes) - grid0) // slot_minutes, rs + 1), rows_count)
+               for s, e, rs in zip(smin, emin, row_start)]
+
+    lane, lanes = assign_lanes(days, row_start, row_end)
+    return days, row_start, row_end, lane, lanes
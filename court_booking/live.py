@@ -0,0 +1,263 @@
+"""
+Change feed for live calendar updates.
+
+Every committed booking write is published to the subscribers in this process
+and appended to `booking_changes`. While a process has subscribers it polls
+that table for rows written by other processes, so an open calendar learns
+about every write without reloading. With no subscribers nothing is polled.
+
+    python -m court_booking.live init
+    python -m court_booking.live prune [--hours N]
+"""
+import argparse
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from mysql.connector import errorcode
+from mysql.connector.errors import ProgrammingError
+
+from court_booking import migrate
+from court_booking.bookings import on_change
+from court_booking.config import get_db_connection, pooled_connection
+
+log = logging.getLogger(__name__)
+
+_RETRY_AFTER = 60.0
+_missing_since = None
+
+
+def _table_missing(exc) -> bool:
+    global _missing_since
+    if isinstance(exc, ProgrammingError) and exc.errno == errorcode.ER_NO_SUCH_TABLE:
+        if _missing_since is None:
+            log.warning("booking_changes is missing; live updates stay within one process "
+                        "(run `python -m court_booking.live init`)")
+        _missing_since = time.monotonic()
+        return True
+    return False
+
+
+def available() -> bool:
+    return _missing_since is None or time.monotonic() - _missing_since > _RETRY_AFTER
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}"
+
+
+def event(op, booking_date=None, old_date=None) -> dict:
+    """Wire form of a change: the dates it touches, or none for "anything may have changed"."""
+    dates = sorted({d.isoformat() for d in (booking_date, old_date) if d is not None})
+    if op in ("court", "reset"):
+        dates = []
+    return {"op": op, "dates": dates}
+
+
+class ChangeFeed:
+    """Fan-out of change events to per-connection queues, plus a table poller for other processes."""
+
+    def __init__(self, enabled=True, poll_interval=1.0, max_subscribers=500, queue_size=64,
+                 retention_hours=24):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.retention_hours = retention_hours
+        self._subscribers = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._poller = None
+        self._poller_pid = None
+        self._last_id = None
+        self.published = 0
+        self.remote = 0
+        self.dropped = 0
+        self.poll_errors = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get("LIVE_UPDATES", "1") == "1",
+            poll_interval=float(os.environ.get("LIVE_POLL_INTERVAL", "1")),
+            max_subscribers=int(os.environ.get("LIVE_MAX_SUBSCRIBERS", "500")),
+            retention_hours=int(os.environ.get("LIVE_RETENTION_HOURS", "24")),
+        )
+
+    def listen(self, fn):
+        """Call `fn(event)` for changes made by other processes (e.g. to drop local caches)."""
+        self._callbacks.append(fn)
+        return fn
+
+    def subscribe(self):
+        """A new subscriber queue, or None when the process is at its subscriber limit."""
+        q = queue.Queue(self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(q)
+        self._ensure_poller()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, evt, remote=False):
+        if remote:
+            self.remote += 1
+            for fn in self._callbacks:
+                try:
+                    fn(evt)
+                except Exception:
+                    log.exception("change feed callback %r failed", fn)
+        self.published += 1
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(evt)
+            except queue.Full:
+                # A stalled client: collapse its backlog into one "reload everything".
+                self.dropped += 1
+                try:
+                    while True:
+                        q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait({"op": "reset", "dates": []})
+
+    def _ensure_poller(self):
+        pid = os.getpid()
+        with self._lock:
+            t = self._poller
+            if t is not None and t.is_alive() and self._poller_pid == pid:
+                return
+            self._poller = threading.Thread(target=self._poll_loop, name="booking-changes", daemon=True)
+            self._poller_pid = pid
+            self._poller.start()
+
+    def _poll_loop(self):
+        origin = _origin()
+        last_prune = 0.0
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    self._last_id = None  # resubscribing clients reload anyway; don't replay the gap
+                    return
+            if available():
+                try:
+                    self._poll_once(origin)
+                    if time.monotonic() - last_prune > 3600:
+                        prune(self.retention_hours)
+                        last_prune = time.monotonic()
+                except ProgrammingError as exc:
+                    if not _table_missing(exc):
+                        self.poll_errors += 1
+                        log.exception("booking_changes poll failed")
+                except Exception:
+                    self.poll_errors += 1
+                    log.exception("booking_changes poll failed")
+            time.sleep(self.poll_interval)
+
+    def _poll_once(self, origin):
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            try:
+                if self._last_id is None:
+                    cur.execute("SELECT COALESCE(MAX(id), 0) FROM booking_changes")
+                    self._last_id = cur.fetchone()[0]
+                    return
+                cur.execute("""
+                    SELECT id, origin, op, booking_date, old_date FROM booking_changes
+                    WHERE id > %s ORDER BY id LIMIT 500
+                """, (self._last_id,))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+                conn.rollback()  # don't keep a REPEATABLE READ snapshot between polls
+        for row_id, row_origin, op, booking_date, old_date in rows:
+            self._last_id = row_id
+            if row_origin != origin:
+                self.publish(event(op, booking_date, old_date), remote=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = len(self._subscribers)
+            polling = self._poller is not None
+        return {
+            "enabled": self.enabled,
+            "subscribers": subscribers,
+            "polling": polling,
+            "published": self.published,
+            "remote": self.remote,
+            "dropped": self.dropped,
+            "poll_errors": self.poll_errors,
+        }
+
+
+feed = ChangeFeed.from_env()
+
+
+@on_change
+def _record_change(change):
+    if not feed.enabled:
+        return
+    feed.publish(event(change.op, change.booking_date, change.old_date))
+    if not available():
+        return
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO booking_changes (origin, op, booking_date, old_date)
+            VALUES (%s, %s, %s, %s)
+        """, (_origin(), change.op, change.booking_date, change.old_date))
+        conn.commit()
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+    finally:
+        cur.close(); conn.close()
+
+
+def prune(hours: int) -> int:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM booking_changes WHERE changed_at < NOW(3) - INTERVAL %s HOUR", (hours,))
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+    return deleted
+
+
+def init(conn):
+    """Create the table by applying pending schema migrations."""
+    migrate.upgrade(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m court_booking.live")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init", help="create the booking_changes table (applies pending migrations)")
+    pr = sub.add_parser("prune", help="delete old change rows")
+    pr.add_argument("--hours", type=int, default=feed.retention_hours)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "init":
+        conn = get_db_connection()
+        try:
+            init(conn)
+        finally:
+            conn.close()
+        print("booking_changes is ready.")
+    else:
+        print(f"Deleted {prune(args.hours)} change rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Per-request performance metrics, served at `/metrics` in Prometheus text format.
+
+For every endpoint: request latency, response size, and per request the
+number of DB queries, time spent in them and time spent waiting for a pooled
+connection. Streamed responses are measured until their last chunk is sent.
+Recording is a few counter updates per request; the text is only built when
+`/metrics` is scraped. With METRICS_ENABLED=0 (the default) nothing is
+installed and DB connections are not wrapped. `/metrics` requires
+METRICS_TOKEN, or METRICS_ALLOW_LOOPBACK=1 to serve loopback clients without
+one; with neither, metrics stay off.
+
+Figures are per process: with several workers, scrape each one (or accept
+that a scrape sees one worker).
+"""
+import hmac
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import partial
+
+from flask import Response, request
+
+from court_booking import tracing
+
+log = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# Without a token, allow loopback clients only when asked to: behind a local proxy every client is loopback.
+METRICS_ALLOW_LOOPBACK = os.environ.get("METRICS_ALLOW_LOOPBACK", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ACQUIRE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+_PREFIX = "court_booking_"
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, esc)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = _PREFIX + name, help, tuple(labels)
+        self._series = {}
+
+    def inc(self, labels=(), value=1.0):
+        self._series[labels] = self._series.get(labels, 0.0) + value
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} counter")
+        series = self._series or ({} if self.label_names else {(): 0.0})
+        for labels, value in sorted(series.items()):
+            out.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.label_names = _PREFIX + name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        s[bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def render(self, out):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        names = self.label_names + ("le",)
+        for labels, s in sorted(self._series.items()):
+            total = 0
+            for bound, n in zip(self.buckets + ("+Inf",), s):
+                total += n
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                out.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {total}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, labels)} {s[-1]:g}")
+            out.append(f"{self.name}_count{_labels(self.label_names, labels)} {total}")
+
+
+class _RequestStats:
+    __slots__ = ("start", "queries", "db_seconds", "acquire_seconds", "bytes")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    """All request metrics of this process; updates and rendering share one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("http_requests_total", "Requests handled.", ("endpoint", "method", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Request latency, until the last byte is sent.",
+                                 LATENCY_BUCKETS, ("endpoint",))
+        self.size = Histogram("http_response_size_bytes", "Response body size.", SIZE_BUCKETS, ("endpoint",))
+        self.queries = Histogram("db_queries_per_request", "DB statements executed per request.",
+                                 QUERY_BUCKETS, ("endpoint",))
+        self.db_time = Histogram("db_seconds_per_request", "Time spent executing DB statements per request.",
+                                 LATENCY_BUCKETS, ("endpoint",))
+        self.acquire = Histogram("db_acquire_seconds_per_request", "Time spent waiting for a pooled connection "
+                                 "per request.", ACQUIRE_BUCKETS, ("endpoint",))
+        self.background = Counter("db_background_queries_total", "DB statements executed outside requests.")
+        self.background_time = Counter("db_background_seconds_total", "Time spent in DB statements outside requests.")
+
+    def record(self, st: _RequestStats, endpoint, method, status):
+        elapsed = time.perf_counter() - st.start
+        key = (endpoint,)
+        with self._lock:
+            self.requests.inc((endpoint, method, str(status)))
+            self.latency.observe(key, elapsed)
+            self.size.observe(key, st.bytes)
+            self.queries.observe(key, st.queries)
+            self.db_time.observe(key, st.db_seconds)
+            self.acquire.observe(key, st.acquire_seconds)
+
+    def record_background(self, seconds):
+        with self._lock:
+            self.background.inc()
+            self.background_time.inc(value=seconds)
+
+    def render(self) -> str:
+        out = []
+        with self._lock:
+            for metric in (self.requests, self.latency, self.size, self.queries, self.db_time, self.acquire,
+                           self.background, self.background_time):
+                metric.render(out)
+        _render_pool(out)
+        return "\n".join(out) + "\n"
+
+
+def _render_pool(out):
+    from court_booking.config import pool_stats
+    stats = pool_stats()
+    for key, kind, help in (
+        ("open", "gauge", "Open pooled connections."),
+        ("idle", "gauge", "Idle pooled connections."),
+        ("in_use", "gauge", "Checked-out pooled connections."),
+        ("checkouts", "counter", "Pool checkouts."),
+        ("timeouts", "counter", "Checkouts that gave up waiting."),
+        ("checkout_wait_seconds_total", "counter", "Total time spent waiting for a connection."),
+    ):
+        name = f"{_PREFIX}db_pool_{key}" + ("_total" if kind == "counter" and not key.endswith("_total") else "")
+        out.append(f"# HELP {name} {help}")
+        out.append(f"# TYPE {name} {kind}")
+        out.append(f"{name} {stats[key]:g}")
+
+
+registry = Registry()
+_local = threading.local()
+
+
+def _on_query(sql, params, seconds):
+    st = getattr(_local, "stats", None)
+    if st is None:
+        registry.record_background(seconds)
+    else:
+        st.queries += 1
+        st.db_seconds += seconds
+
+
+def _on_acquire(seconds):
+    st = getattr(_local, "stats", None)
+    if st is not None:
+        st.acquire_seconds += seconds
+
+
+def _counting(iterable, st):
+    try:
+        for chunk in iterable:
+            st.bytes += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(iterable, "close", None)
+        if close is not None:
+            close()
+
+
+def _finish(st, endpoint, method, status):
+    if getattr(_local, "stats", None) is st:
+        _local.stats = None
+    registry.record(st, endpoint, method, status)
+
+
+def _before_request():
+    _local.stats = None if request.endpoint == "metrics" else _RequestStats()
+
+
+def _after_request(response):
+    st = getattr(_local, "stats", None)
+    if st is None:
+        return response
+    if response.is_streamed:
+        response.response = _counting(response.response, st)
+    else:
+        st.bytes = response.content_length or 0
+    response.call_on_close(partial(_finish, st, request.endpoint or "unmatched", request.method,
+                                   response.status_code))
+    return response
+
+
+def _authorized() -> bool:
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "")
+        return hmac.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode())
+    return METRICS_ALLOW_LOOPBACK and request.remote_addr in ("127.0.0.1", "::1")
+
+
+def metrics():
+    if not _authorized():
+        return ("Forbidden", 403)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app) -> bool:
+    """
+    Install the request hooks and the /metrics route if METRICS_ENABLED; returns
+    whether it did. Nothing is installed unless METRICS_TOKEN is set or loopback
+    access is explicitly allowed.
+    """
+    if not METRICS_ENABLED:
+        return False
+    if not METRICS_TOKEN and not METRICS_ALLOW_LOOPBACK:
+        log.warning("METRICS_ENABLED=1 but neither METRICS_TOKEN nor METRICS_ALLOW_LOOPBACK=1 is set; "
+                    "metrics are disabled")
+        return False
+    tracing.on_query(_on_query)
+    tracing.on_acquire(_on_acquire)
+    tracing.carry(lambda: getattr(_local, "stats", None), partial(setattr, _local, "stats"))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics)
+    return True
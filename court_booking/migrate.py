@@ -0,0 +1,167 @@
+"""
+Versioned schema migrations from `migrations/NNNN_name.sql`.
+
+    python -m court_booking.migrate up        # apply pending migrations
+    python -m court_booking.migrate status    # list applied / pending ones
+
+Applied versions are recorded in `schema_migrations`; a named lock keeps two
+processes from migrating at once. MySQL commits DDL implicitly, so a
+migration that fails halfway is not rolled back: statements are written to be
+re-runnable, and errors meaning the change is already in place (duplicate
+index, column or table; dropping an index that is gone) are skipped on a
+re-run.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+
+from mysql.connector import errorcode
+from mysql.connector.errors import DatabaseError
+
+from court_booking.config import get_db_connection
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.environ.get(
+    "MIGRATIONS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"))
+MIGRATE_LOCK_TIMEOUT = int(os.environ.get("MIGRATE_LOCK_TIMEOUT", "60"))
+
+_LOCK_NAME = "court_booking:migrate"
+_ALREADY_DONE = {errorcode.ER_DUP_KEYNAME, errorcode.ER_DUP_FIELDNAME, errorcode.ER_TABLE_EXISTS_ERROR,
+                 errorcode.ER_CANT_DROP_FIELD_OR_KEY}
+
+DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version    INT NOT NULL PRIMARY KEY,
+    name       VARCHAR(200) NOT NULL,
+    checksum   CHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+Migration = namedtuple("Migration", "version name path checksum")
+
+
+class MigrationError(Exception):
+    """A migration statement failed; earlier statements of that migration stay applied."""
+
+
+def discover(path: str = MIGRATIONS_DIR):
+    """Migration files under `path`, ordered by version."""
+    found = []
+    for fn in sorted(os.listdir(path)):
+        m = re.match(r"^(\d+)_(\w+)\.sql$", fn)
+        if not m:
+            continue
+        full = os.path.join(path, fn)
+        with open(full, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        found.append(Migration(int(m.group(1)), m.group(2), full, checksum))
+    versions = [m.version for m in found]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"duplicate migration versions in {path}")
+    return found
+
+
+def statements(sql: str):
+    """Split a migration file into statements (on `;` at end of line; `--` comment lines dropped)."""
+    lines = [ln for ln in sql.splitlines() if not ln.strip().startswith("--")]
+    parts = re.split(r";\s*$", "\n".join(lines), flags=re.M)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def applied(conn) -> dict:
+    """version -> checksum of the migrations already applied."""
+    cur = conn.cursor()
+    cur.execute(DDL)
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    done = dict(cur.fetchall())
+    cur.close()
+    return done
+
+
+def _apply(conn, migration: Migration):
+    cur = conn.cursor()
+    try:
+        with open(migration.path, encoding="utf-8") as f:
+            for stmt in statements(f.read()):
+                try:
+                    cur.execute(stmt)
+                except DatabaseError as e:
+                    if e.errno not in _ALREADY_DONE:
+                        raise MigrationError(f"{os.path.basename(migration.path)}: {e.msg}\n{stmt}") from e
+                    log.info("migration %04d: skipped, already in place (%s)", migration.version, e.msg)
+        cur.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum))
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def upgrade(conn, target=None, path: str = MIGRATIONS_DIR):
+    """Apply pending migrations (up to `target`, inclusive); returns the ones applied."""
+    cur = conn.cursor()
+    cur.execute("SELECT GET_LOCK(%s, %s)", (_LOCK_NAME, MIGRATE_LOCK_TIMEOUT))
+    if cur.fetchone()[0] != 1:
+        cur.close()
+        raise MigrationError(f"another process holds the migration lock (waited {MIGRATE_LOCK_TIMEOUT}s)")
+    try:
+        done = applied(conn)
+        ran = []
+        for m in discover(path):
+            if target is not None and m.version > target:
+                break
+            if m.version in done:
+                if done[m.version] != m.checksum:
+                    log.warning("migration %04d_%s changed after it was applied", m.version, m.name)
+                continue
+            t0 = time.perf_counter()
+            _apply(conn, m)
+            log.info("applied migration %04d_%s in %.1fs", m.version, m.name, time.perf_counter() - t0)
+            ran.append(m)
+        return ran
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+        cur.fetchall()
+        cur.close()
+
+
+def status(conn, path: str = MIGRATIONS_DIR):
+    """(migration, state) pairs; state is "applied", "changed" or "pending"."""
+    done = applied(conn)
+    out = []
+    for m in discover(path):
+        if m.version not in done:
+            out.append((m, "pending"))
+        else:
+            out.append((m, "applied" if done[m.version] == m.checksum else "changed"))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m court_booking.migrate")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    up = sub.add_parser("up", help="apply pending migrations")
+    up.add_argument("--to", dest="target", type=int, help="stop after this version")
+    sub.add_parser("status", help="list applied and pending migrations")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = get_db_connection()
+    try:
+        if args.cmd == "up":
+            ran = upgrade(conn, args.target)
+            print(f"Applied {len(ran)} migration(s)." if ran else "Schema is up to date.")
+        else:
+            for m, state in status(conn):
+                print(f"{m.version:04d}  {m.name:<32} {state}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
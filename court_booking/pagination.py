@@ -0,0 +1,100 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+COUNT_TTL = float(os.environ.get("ADMIN_COUNT_TTL", "60"))
+
+
+def _plain(v):
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, timedelta):
+        secs = int(v.total_seconds())
+        return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+    return v
+
+
+def encode_cursor(direction: str, page: int, key) -> str:
+    """Opaque token for the page after ('n') or before ('p') the row with sort `key`."""
+    raw = json.dumps([direction, page] + [_plain(v) for v in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _is_int(v) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def decode_cursor(token, arity: int):
+    """
+    (direction, page, key) from a token, or None if it is missing or malformed.
+    Key values must be strings or integers: the key columns are NOT NULL, and
+    anything else would reach the query as a parameter the connector rejects.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, page, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ("n", "p") or not _is_int(page) or len(key) != arity:
+        return None
+    if not all(isinstance(v, str) or _is_int(v) for v in key):
+        return None
+    return direction, max(1, page), key
+
+
+def seek_clause(columns, key, descending: bool, after: bool):
+    """
+    (sql, params) selecting rows strictly after (or before) `key` in the listing order,
+    expanded to nested ORs so MySQL can range-scan the leading index column.
+    """
+    op = "<" if descending == after else ">"
+
+    def build(i):
+        col = columns[i]
+        if i == len(columns) - 1:
+            return f"{col} {op} %s", [key[i]]
+        inner, params = build(i + 1)
+        return f"({col} {op} %s OR ({col} = %s AND {inner}))", [key[i], key[i]] + params
+
+    return build(0)
+
+
+def page_rows(rows, per_page: int, direction: str):
+    """Trim the extra look-ahead row and restore display order; returns (rows, has_more)."""
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == "p":
+        rows.reverse()
+    return rows, has_more
+
+
+class CountCache:
+    """Short-lived cache of COUNT(*) results keyed by the listing filters."""
+
+    def __init__(self, ttl: float = COUNT_TTL, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, fn):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit and now - hit[1] <= self.ttl:
+                return hit[0]
+        value = fn()
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data.clear()
+            self._data[key] = (value, now)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,163 @@
+"""
+Password hashing on a bounded worker pool.
+
+Argon2 is deliberately slow and memory-hungry, so hashing and verification run
+on at most PASSWORD_WORKERS threads with at most PASSWORD_QUEUE_DEPTH calls
+waiting behind them. A call beyond that raises HasherBusy (served as 503 with
+Retry-After) instead of letting a login burst take every worker and all the
+CPU. Argon2 parameters come from the environment; hashes made with other
+parameters report `needs_rehash` so callers can upgrade them after a login.
+
+    python -m court_booking.passwords calibrate [--target-ms 250] [--max-memory-mib 256]
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.hash import argon2
+from werkzeug.security import check_password_hash
+
+TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "3"))
+MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "65536"))  # KiB
+PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "4"))
+
+WORKERS = int(os.environ.get("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+QUEUE_DEPTH = int(os.environ.get("PASSWORD_QUEUE_DEPTH", str(WORKERS * 8)))
+RETRY_AFTER = int(os.environ.get("PASSWORD_RETRY_AFTER", "5"))
+
+hasher = argon2.using(time_cost=TIME_COST, memory_cost=MEMORY_COST, parallelism=PARALLELISM)
+
+
+class HasherBusy(Exception):
+    """Too many password operations are running or queued; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__("password hashing is at capacity")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor that refuses work once `workers + queue_depth` calls are in flight."""
+
+    def __init__(self, workers=WORKERS, queue_depth=QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_max = 0.0
+
+    def _executor(self):
+        pid = os.getpid()
+        if self._pool is None or self._pool_pid != pid:
+            with self._lock:
+                if self._pool is None or self._pool_pid != pid:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="passwords")
+                    self._pool_pid = pid
+        return self._pool
+
+    def _call(self, submitted, fn, args):
+        self.wait_seconds_max = max(self.wait_seconds_max, time.perf_counter() - submitted)
+        return fn(*args)
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` on the pool and wait for its result; raises HasherBusy when full."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        try:
+            return self._executor().submit(self._call, time.perf_counter(), fn, args).result()
+        finally:
+            self._slots.release()
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+        }
+
+
+executor = BoundedExecutor()
+
+
+def hash_password(plain: str) -> str:
+    return executor.run(hasher.hash, plain)
+
+
+def _verify(plain: str, stored_hash: str):
+    if stored_hash.startswith("pbkdf2:"):
+        return check_password_hash(stored_hash, plain), True
+    try:
+        ok = hasher.verify(plain, stored_hash)
+    except Exception:
+        return False, False
+    return ok, ok and hasher.needs_update(stored_hash)
+
+
+def verify_password(plain: str, stored_hash: str):
+    """
+    (ok, needs_rehash) for a Werkzeug PBKDF2 or Argon2 hash. `needs_rehash` is
+    set for PBKDF2 hashes and Argon2 hashes made with other parameters.
+    """
+    if not stored_hash:
+        return False, False
+    return executor.run(_verify, plain, stored_hash)
+
+
+def _time_hash(memory_cost, time_cost, parallelism, rounds=3) -> float:
+    h = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        h.hash("calibration-password")
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def calibrate(target_ms: float, max_memory_mib: int, parallelism: int):
+    """
+    Largest memory cost (powers of two, from 8 MiB up to the limit) that hashes
+    within the target at time_cost=1, then the largest time cost that still fits.
+    Returns (memory_cost_kib, time_cost, measured_ms).
+    """
+    target = target_ms / 1000.0
+    memory = 8 * 1024
+    while memory * 2 <= max_memory_mib * 1024 and _time_hash(memory * 2, 1, parallelism) <= target:
+        memory *= 2
+    time_cost = 1
+    elapsed = _time_hash(memory, time_cost, parallelism)
+    while True:
+        nxt = _time_hash(memory, time_cost + 1, parallelism)
+        if nxt > target:
+            break
+        time_cost, elapsed = time_cost + 1, nxt
+    return memory, time_cost, elapsed * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m court_booking.passwords")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    cal = sub.add_parser("calibrate", help="pick Argon2 parameters for a target hash latency on this host")
+    cal.add_argument("--target-ms", type=float, default=250)
+    cal.add_argument("--max-memory-mib", type=int, default=256)
+    cal.add_argument("--parallelism", type=int, default=PARALLELISM)
+    args = parser.parse_args(argv)
+
+    memory, time_cost, ms = calibrate(args.target_ms, args.max_memory_mib, args.parallelism)
+    print(f"# {ms:.0f} ms per hash on this host (target {args.target_ms:.0f} ms)")
+    print(f"ARGON2_MEMORY_COST={memory}")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
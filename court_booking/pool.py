@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Keeps up to `size` idle connections, allows `max_overflow` extra ones under
+    burst load, replaces connections older than `recycle` seconds and (optionally)
+    pings a connection before handing it out.
+    """
+
+    def __init__(self, creator, size=5, max_overflow=10, recycle=1800, timeout=10.0, pre_ping=True):
+        self._creator = creator
+        self.size = max(1, int(size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.recycle = int(recycle)
+        self.timeout = float(timeout)
+        self.pre_ping = bool(pre_ping)
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._peak_in_use = 0
+
+    def _connect(self):
+        raw = self._creator()
+        raw._cb_created = time.monotonic()
+        with self._cond:
+            self._created += 1
+        return raw
+
+    def _usable(self, raw) -> bool:
+        if self.recycle > 0 and time.monotonic() - getattr(raw, "_cb_created", 0) > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                if not raw.is_connected():
+                    raise ConnectionError("stale connection")
+            except Exception:
+                with self._cond:
+                    self._invalidated += 1
+                return False
+        return True
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a raw connection, waiting up to `timeout` seconds for one to free up."""
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        raw = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no DB connection available within {self.timeout:.1f}s "
+                        f"(size={self.size}, overflow={self.max_overflow})"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+        try:
+            if raw is not None and not self._usable(raw):
+                self._close_quietly(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.perf_counter() - t0
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return raw
+
+    def release(self, raw, discard=False):
+        """Return a connection to the pool. Open transactions are rolled back first."""
+        if not discard:
+            try:
+                if raw.in_transaction:
+                    raw.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.size:
+                self._open -= 1
+                keep = False
+            else:
+                self._idle.append(raw)
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(raw)
+
+    def dispose(self):
+        """Close all idle connections. Checked-out connections are closed when released."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for raw in idle:
+            self._close_quietly(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "overflow": max(0, self._open - self.size),
+                "checkouts": self._checkouts,
+                "checkout_wait_seconds_total": round(self._wait_total, 6),
+                "checkout_wait_seconds_max": round(self._wait_max, 6),
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+            }
+
+
+class PooledConnection:
+    """Connection proxy whose close() hands the connection back to its pool."""
+
+    def __init__(self, pool: ConnectionPool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"connection already returned to pool ({name})")
+        return getattr(raw, name)
+
+    @property
+    def raw(self):
+        """The underlying connection (for per-connection state such as prepared statements)."""
+        if self._raw is None:
+            raise AttributeError("connection already returned to pool")
+        return self._raw
+
+    def close(self, discard=False):
+        """Return the connection; `discard` drops it instead (e.g. a half-read unbuffered result)."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, discard=discard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+"""
+Slow-query log and per-request query diagnostics, written as JSON lines.
+
+    QUERY_LOG_PATH=logs/queries-{pid}.jsonl SLOW_QUERY_MS=100 QUERY_BUDGETS=admin_bp.dashboard=3
+
+Three kinds of record (the `kind` field):
+
+  slow         a statement that took at least SLOW_QUERY_MS
+  repeated     a request ran the same statement QUERY_REPEAT_THRESHOLD or more times (N+1 loops)
+  over_budget  a request ran more statements than its endpoint's budget
+
+    python -m court_booking.querylog logs/queries-*.jsonl*     # most frequent findings
+
+Records carry the endpoint, the normalized SQL, the shape of its parameters
+(types and lengths, never values) and the app stack frames that issued it.
+The file rotates by size; `{pid}` in the path gives each worker its own file,
+since rotation is not coordinated between processes.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import traceback
+from datetime import datetime
+from functools import partial
+from logging.handlers import RotatingFileHandler
+
+from flask import request
+
+from court_booking import tracing
+
+QUERY_LOG_PATH = os.environ.get("QUERY_LOG_PATH", "")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", "3"))
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "15"))
+QUERY_BUDGETS = os.environ.get("QUERY_BUDGETS", "")
+QUERY_LOG_MAX_BYTES = int(os.environ.get("QUERY_LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+QUERY_LOG_BACKUPS = int(os.environ.get("QUERY_LOG_BACKUPS", "5"))
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames from these files are plumbing, not the code that asked for the query.
+_SKIP = {os.path.join(_ROOT, "court_booking", f) for f in ("tracing.py", "querylog.py", "repository.py")}
+
+log = logging.getLogger(__name__)
+_out = logging.getLogger("court_booking.querylog.records")
+_out.propagate = False
+_out.setLevel(logging.INFO)
+_handler_pid = None
+_local = threading.local()
+
+
+def parse_budgets(spec: str) -> dict:
+    """"endpoint=n,endpoint=n" -> {endpoint: n}."""
+    budgets = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, n = part.partition("=")
+        budgets[name.strip()] = int(n)
+    return budgets
+
+
+_budgets = parse_budgets(QUERY_BUDGETS)
+
+
+def normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _shape(v):
+    if v is None:
+        return "null"
+    if isinstance(v, (str, bytes, bytearray)):
+        return f"{type(v).__name__}({len(v)})"
+    if isinstance(v, (list, tuple)):
+        return [_shape(x) for x in v[:20]] + ([f"...{len(v)}"] if len(v) > 20 else [])
+    if isinstance(v, dict):
+        return {k: _shape(x) for k, x in v.items()}
+    return type(v).__name__
+
+
+def origin(limit: int = 4):
+    """Innermost app frames ("file:line function") that led to the current statement."""
+    frames = []
+    for fs in reversed(traceback.extract_stack()[:-1]):
+        if not fs.filename.startswith(_ROOT) or fs.filename in _SKIP or "site-packages" in fs.filename:
+            continue
+        frames.append(f"{os.path.relpath(fs.filename, _ROOT)}:{fs.lineno} {fs.name}")
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+def _open_log():
+    """(Re)open the log file for this process; after a fork, `{pid}` names the worker's own file."""
+    global _handler_pid
+    for h in list(_out.handlers):
+        _out.removeHandler(h)
+        h.close()
+    path = QUERY_LOG_PATH.format(pid=os.getpid())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=QUERY_LOG_MAX_BYTES, backupCount=QUERY_LOG_BACKUPS,
+                                  encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _out.addHandler(handler)
+    _handler_pid = os.getpid()
+    return path
+
+
+def _write(record: dict):
+    if _handler_pid != os.getpid():
+        _open_log()
+    record["ts"] = datetime.now().isoformat(timespec="milliseconds")
+    _out.info(json.dumps(record, default=str))
+
+
+class _RequestQueries:
+    __slots__ = ("endpoint", "method", "total", "counts", "origins")
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.total = 0
+        self.counts = {}
+        self.origins = {}
+
+
+def _on_query(sql, params, seconds):
+    rq = getattr(_local, "queries", None)
+    if rq is not None:
+        rq.total += 1
+        n = rq.counts[sql] = rq.counts.get(sql, 0) + 1
+        if n == QUERY_REPEAT_THRESHOLD:
+            rq.origins[sql] = origin()  # the repeating call site, captured once
+    ms = seconds * 1000
+    if ms >= SLOW_QUERY_MS:
+        _write({
+            "kind": "slow",
+            "ms": round(ms, 2),
+            "endpoint": rq.endpoint if rq else None,
+            "method": rq.method if rq else None,
+            "sql": normalize(sql),
+            "params": _shape(params),
+            "origin": origin(),
+        })
+
+
+def _finish(rq: _RequestQueries):
+    if getattr(_local, "queries", None) is rq:
+        _local.queries = None
+    for sql, n in rq.counts.items():
+        if n >= QUERY_REPEAT_THRESHOLD:
+            _write({"kind": "repeated", "endpoint": rq.endpoint, "method": rq.method, "count": n,
+                    "sql": normalize(sql), "origin": rq.origins.get(sql, [])})
+    budget = _budgets.get(rq.endpoint, QUERY_BUDGET)
+    if rq.total > budget:
+        top = sorted(rq.counts.items(), key=lambda kv: -kv[1])[:5]
+        _write({"kind": "over_budget", "endpoint": rq.endpoint, "method": rq.method, "queries": rq.total,
+                "budget": budget, "top": [{"count": n, "sql": normalize(sql)} for sql, n in top]})
+
+
+def _before_request():
+    _local.queries = _RequestQueries(request.endpoint or "unmatched", request.method)
+
+
+def _after_request(response):
+    rq = getattr(_local, "queries", None)
+    if rq is not None:
+        # Streamed bodies may still query; report once the response is closed.
+        response.call_on_close(partial(_finish, rq))
+    return response
+
+
+def init_querylog(app) -> bool:
+    """Start logging to QUERY_LOG_PATH, if set; returns whether it did."""
+    if not QUERY_LOG_PATH:
+        return False
+    path = _open_log()
+    tracing.on_query(_on_query)
+    tracing.carry(lambda: getattr(_local, "queries", None), partial(setattr, _local, "queries"))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    log.info("query log: %s (slow >= %sms, repeat >= %s, budget %s)",
+             path, SLOW_QUERY_MS, QUERY_REPEAT_THRESHOLD, QUERY_BUDGET)
+    return True
+
+
+def summarize(paths, top: int = 20):
+    """Print the most frequent (kind, endpoint, statement) findings across query-log files."""
+    agg = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                sql = r.get("sql") or "; ".join(t["sql"] for t in r.get("top", [])[:1])
+                key = (r["kind"], r.get("endpoint"), sql)
+                n, worst = agg.get(key, (0, 0.0))
+                agg[key] = (n + 1, max(worst, r.get("ms") or r.get("count") or r.get("queries") or 0))
+    for (kind, endpoint, sql), (n, worst) in sorted(agg.items(), key=lambda kv: -kv[1][0])[:top]:
+        print(f"{n:>6}x  {kind:<11} {str(endpoint):<36} worst={worst:<8g} {sql[:120]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m court_booking.querylog")
+    parser.add_argument("files", nargs="+", help="query-log files (rotated ones included)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+    summarize(args.files, args.top)
+
+
+if __name__ == "__main__":
+    main()
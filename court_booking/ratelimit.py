@@ -0,0 +1,149 @@
+"""
+SQLite (WAL) storage for Flask-Limiter, shared by every worker on one host.
+
+    RATELIMIT_STORAGE_URI=sqlite:////var/lib/court-ease/ratelimit.db
+
+Each counter update is a single UPSERT ... RETURNING in autocommit mode, so a
+check costs one short write transaction on a local file. Counters are not
+fsynced (a crash may lose a few seconds of hits) and expired rows are swept
+periodically. Supports the fixed-window and sliding-window-counter strategies.
+"""
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+from urllib.parse import urlparse
+
+from limits.storage.base import SlidingWindowCounterSupport, Storage, TimestampedSlidingWindow
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key    TEXT PRIMARY KEY,
+    count  INTEGER NOT NULL,
+    expiry REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+_INCR = """
+INSERT INTO counters (key, count, expiry) VALUES (?1, ?2, ?3 + ?4)
+ON CONFLICT(key) DO UPDATE SET
+    count  = CASE WHEN expiry <= ?3 THEN ?2 ELSE count + ?2 END,
+    expiry = CASE WHEN expiry <= ?3 THEN ?3 + ?4 ELSE expiry END
+RETURNING count, expiry
+"""
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate-limit counters in a WAL-mode SQLite file; one connection per thread and process."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, sweep_interval: float = 60.0, **options):
+        parsed = urlparse(uri)
+        self.path = (parsed.netloc + parsed.path) or "ratelimit.db"
+        self.sweep_interval = float(sweep_interval)
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._conn().execute(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, pid
+        return conn
+
+    def _maybe_sweep(self, conn, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            conn.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._conn()
+        count = conn.execute(_INCR, (key, amount, now, expiry)).fetchone()[0]
+        self._maybe_sweep(conn, now)
+        return count
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        row = self._conn().execute(
+            "UPDATE counters SET count = MAX(count - ?, 0) WHERE key = ? AND expiry > ? RETURNING count",
+            (amount, key, time.time()),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, key: str) -> int:
+        row = self._conn().execute(
+            "SELECT count FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT expiry FROM counters WHERE key = ? AND expiry > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def clear(self, key: str) -> None:
+        self._conn().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def reset(self) -> int:
+        return self._conn().execute("DELETE FROM counters").rowcount
+
+    def check(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _window_info(self, conn, key, expiry, now):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        counts = dict(conn.execute(
+            "SELECT key, count FROM counters WHERE key IN (?, ?) AND expiry > ?",
+            (previous_key, current_key, now),
+        ).fetchall())
+        previous_count = counts.get(previous_key, 0)
+        current_count = counts.get(current_key, 0)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return current_key, previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so check-and-increment is atomic across workers.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current_key, previous_count, previous_ttl, current_count, _ = self._window_info(conn, key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(_INCR, (current_key, amount, now, 2 * expiry)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_sweep(conn, now)
+        return True
+
+    def get_sliding_window(self, key: str, expiry: int):
+        _, previous_count, previous_ttl, current_count, current_ttl = self._window_info(
+            self._conn(), key, expiry, time.time())
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._conn().execute("DELETE FROM counters WHERE key IN (?, ?)", (previous_key, current_key))
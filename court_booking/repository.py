@@ -0,0 +1,207 @@
+"""
+Shared queries, optionally run as server-side prepared statements.
+
+Rows come back as namedtuples (attribute and, in templates, item access both
+work); call `._asdict()` where a mutable dict is needed. With
+DB_PREPARED_STATEMENTS=1 each statement is prepared once per pooled
+connection and its cursor kept on that connection, which skips re-parsing
+the SQL. mysql-connector 9 resets a prepared statement before every execute,
+though, so each call then costs two round trips instead of one; it is off by
+default until bench/endpoints.py shows a win against a given server.
+"""
+import os
+from collections import namedtuple
+
+PREPARED = os.environ.get("DB_PREPARED_STATEMENTS", "0") == "1"
+
+
+class Statement:
+    """SQL text plus the namedtuple type its rows are returned as (derived from the result if not given)."""
+
+    def __init__(self, sql, row=None):
+        self.sql = sql
+        self.row = row
+
+    def row_type(self, description):
+        if self.row is None:
+            self.row = namedtuple("Row", [d[0] for d in description], rename=True)
+        return self.row
+
+
+def _cursor(conn, stmt: Statement):
+    raw = getattr(conn, "raw", conn)
+    cache = getattr(raw, "_cb_statements", None)
+    if cache is None:
+        cache = raw._cb_statements = {}
+    cur = cache.get(stmt)
+    if cur is None:
+        cur = cache[stmt] = raw.cursor(prepared=True)
+    return cur, cache
+
+
+def _run(conn, stmt: Statement, params, fetch):
+    if not PREPARED:
+        cur = conn.cursor()
+        try:
+            cur.execute(stmt.sql, params)
+            return fetch(cur)
+        finally:
+            cur.close()
+    cur, cache = _cursor(conn, stmt)
+    try:
+        # The prepared cursor re-uses its statement only for the identical str object.
+        cur.execute(stmt.sql, params)
+        return fetch(cur)
+    except Exception:
+        cache.pop(stmt, None)
+        try:
+            cur.close()
+        except Exception:
+            pass
+        raise
+
+
+def fetch_all(conn, stmt: Statement, params=()):
+    def fetch(cur):
+        rows = cur.fetchall()
+        make = stmt.row_type(cur.description)._make
+        return [make(r) for r in rows]
+    return _run(conn, stmt, params, fetch)
+
+
+def fetch_one(conn, stmt: Statement, params=()):
+    rows = fetch_all(conn, stmt, params)
+    return rows[0] if rows else None
+
+
+def fetch_value(conn, stmt: Statement, params=()):
+    """First column of the first row, or None."""
+    row = _run(conn, stmt, params, lambda cur: (cur.fetchall() or [None])[0])
+    return row[0] if row else None
+
+
+def execute(conn, stmt: Statement, params=()) -> int:
+    """Run a write; returns the affected row count (caller commits)."""
+    return _run(conn, stmt, params, lambda cur: cur.rowcount)
+
+
+# --- Courts -------------------------------------------------------------------------------------
+
+Court = namedtuple("Court", "id court_name status")
+
+_COURTS = Statement("SELECT id, court_name, status FROM courts ORDER BY court_name ASC", Court)
+_COURT = Statement("SELECT id, court_name, status FROM courts WHERE id=%s", Court)
+
+
+def list_courts(conn):
+    return fetch_all(conn, _COURTS)
+
+
+def court_by_id(conn, court_id):
+    return fetch_one(conn, _COURT, (court_id,))
+
+
+# --- Bookings -----------------------------------------------------------------------------------
+
+UserBooking = namedtuple("UserBooking", "id court_name booking_date start_time end_time")
+CalendarBooking = namedtuple("CalendarBooking", "id court_id booking_date start_time end_time court_name")
+
+_USER_BOOKINGS = Statement("""
+    SELECT b.id, c.court_name, b.booking_date, b.start_time, b.end_time
+    FROM bookings b
+    JOIN courts c ON b.court_id = c.id
+    WHERE b.user_id=%s
+    ORDER BY b.booking_date ASC, b.start_time ASC
+""", UserBooking)
+
+_USER_BOOKING = Statement("SELECT * FROM bookings WHERE id=%s AND user_id=%s")
+
+_RANGE = Statement("""
+    SELECT b.id, b.court_id, b.booking_date, b.start_time, b.end_time, c.court_name
+    FROM bookings b
+    JOIN courts c ON b.court_id = c.id
+    WHERE b.booking_date BETWEEN %s AND %s
+    ORDER BY b.booking_date, b.start_time
+""", CalendarBooking)
+
+_RANGE_COURT = Statement("""
+    SELECT b.id, b.court_id, b.booking_date, b.start_time, b.end_time, c.court_name
+    FROM bookings b
+    JOIN courts c ON b.court_id = c.id
+    WHERE b.booking_date BETWEEN %s AND %s AND b.court_id = %s
+    ORDER BY b.booking_date, b.start_time
+""", CalendarBooking)
+
+# Ids start at 1, so exclude_id=0 excludes nothing.
+_CONFLICT = Statement("""
+    SELECT id FROM bookings
+    WHERE court_id=%s AND booking_date=%s
+      AND NOT (end_time <= %s OR start_time >= %s)
+      AND id <> %s
+    LIMIT 1
+""")
+
+_DAY = Statement("SELECT id, start_time, end_time FROM bookings WHERE court_id=%s AND booking_date=%s")
+
+# Served entirely from idx_bookings_date_cover.
+_SLOTS = Statement("""
+    SELECT court_id, booking_date, start_time, end_time FROM bookings
+    WHERE booking_date BETWEEN %s AND %s
+""")
+
+
+def user_bookings(conn, user_id):
+    return fetch_all(conn, _USER_BOOKINGS, (user_id,))
+
+
+def user_booking(conn, booking_id, user_id):
+    """One of the user's bookings as a dict, or None."""
+    row = fetch_one(conn, _USER_BOOKING, (booking_id, user_id))
+    return row._asdict() if row else None
+
+
+def bookings_in_range(conn, start_d, end_d, court_id=None):
+    if court_id is None:
+        return fetch_all(conn, _RANGE, (start_d, end_d))
+    return fetch_all(conn, _RANGE_COURT, (start_d, end_d, court_id))
+
+
+def find_conflict(conn, court_id, booking_date, start, end, exclude_id=None):
+    return fetch_value(conn, _CONFLICT, (court_id, booking_date, start, end, exclude_id or 0))
+
+
+def day_bookings(conn, court_id, booking_date):
+    """(id, start_time, end_time) rows of one court and day."""
+    return fetch_all(conn, _DAY, (court_id, booking_date))
+
+
+def slot_rows(conn, start_d, end_d):
+    """(court_id, booking_date, start_time, end_time) of every booking in [start_d, end_d], unordered."""
+    return fetch_all(conn, _SLOTS, (start_d, end_d))
+
+
+# --- Users --------------------------------------------------------------------------------------
+
+_LOGIN = Statement("SELECT * FROM users WHERE username=%s OR email=%s")
+_ACCESS = Statement("SELECT role, active FROM users WHERE id=%s")
+_ACTIVE_ADMINS = Statement("SELECT COUNT(*) FROM users WHERE role='admin' AND active=1")
+_SET_PASSWORD = Statement("UPDATE users SET password=%s WHERE id=%s")
+
+
+def user_for_login(conn, username, email):
+    """The user matching a username or email, as a dict, or None."""
+    row = fetch_one(conn, _LOGIN, (username, email))
+    return row._asdict() if row else None
+
+
+def user_access(conn, user_id):
+    """(role, active) of a user, or None."""
+    return fetch_one(conn, _ACCESS, (user_id,))
+
+
+def count_active_admins(conn) -> int:
+    return int(fetch_value(conn, _ACTIVE_ADMINS) or 0)
+
+
+def set_password(conn, user_id, password_hash):
+    return execute(conn, _SET_PASSWORD, (password_hash, user_id))
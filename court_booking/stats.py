@@ -0,0 +1,182 @@
+"""
+Admin dashboard statistics, computed together and served from a snapshot.
+
+A background thread recomputes the snapshot every `refresh` seconds while the
+dashboard is being viewed, so page loads only read the cached object. A
+snapshot older than `max_age` is recomputed inline by the reader; if that times
+out, the old snapshot is served anyway (or, when there is none, the queries
+are run again one after another). The queries of one computation run side by
+side (see `fanout`).
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from court_booking import fanout, summary
+
+log = logging.getLogger(__name__)
+
+Snapshot = namedtuple("Snapshot", "stats labels counts latest as_of computed_at")
+
+TREND_DAYS = 14
+
+# Separate statements so the fan-out can run them side by side.
+_USERS_SQL = "SELECT COUNT(*), COALESCE(SUM(active=1), 0) FROM users"
+_BOOKINGS_SQL = "SELECT COUNT(*) FROM bookings"
+_COURTS_SQL = "SELECT COUNT(*) FROM courts"
+
+_TREND_SQL = """
+    SELECT booking_date AS d, COUNT(*) AS c
+    FROM bookings
+    WHERE booking_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+    GROUP BY booking_date
+    ORDER BY booking_date ASC
+"""
+
+_LATEST_SQL = """
+    SELECT b.id, u.username, c.court_name, b.booking_date, b.start_time, b.end_time
+    FROM bookings b
+    JOIN users u ON b.user_id = u.id
+    JOIN courts c ON b.court_id = c.id
+    ORDER BY b.booking_date DESC, b.start_time DESC
+    LIMIT 10
+"""
+
+
+def _trend():
+    trend = summary.daily_counts(TREND_DAYS)
+    if trend is None:
+        trend = [(d, int(c)) for d, c in fanout.rows(_TREND_SQL, (TREND_DAYS,))()]
+    return trend
+
+
+def compute(parallel=True) -> Snapshot:
+    """A fresh snapshot; raises fanout.FanoutTimeout if `parallel` and the queries are too slow."""
+    tasks = {
+        "users": fanout.rows(_USERS_SQL),
+        "bookings": fanout.rows(_BOOKINGS_SQL),
+        "courts": fanout.rows(_COURTS_SQL),
+        "trend": _trend,
+        "latest": fanout.rows(_LATEST_SQL, dictionary=True),
+    }
+    r = fanout.run(tasks) if parallel else {name: fn() for name, fn in tasks.items()}
+    total_users, active_users = (int(x) for x in r["users"][0])
+    total_bookings, total_courts = int(r["bookings"][0][0]), int(r["courts"][0][0])
+    trend, latest = r["trend"], r["latest"]
+
+    stats = {
+        "total_users": total_users,
+        "active_users": active_users,
+        "inactive_users": max(0, total_users - active_users),
+        "total_bookings": total_bookings,
+        "total_courts": total_courts,
+    }
+    return Snapshot(
+        stats=stats,
+        labels=[str(d) for d, _ in trend],
+        counts=[c for _, c in trend],
+        latest=latest,
+        as_of=datetime.now(),
+        computed_at=time.monotonic(),
+    )
+
+
+class DashboardStats:
+    """Cached dashboard snapshot with a staleness bound and an on-demand refresher thread."""
+
+    def __init__(self, max_age=30.0, refresh=10.0, idle=300.0):
+        self.max_age = max_age
+        self.refresh = refresh
+        self.idle = idle
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._last_read = 0.0
+        self.reads = 0
+        self.inline_refreshes = 0
+        self.background_refreshes = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_age=float(os.environ.get("DASHBOARD_STATS_MAX_AGE", "30")),
+            refresh=float(os.environ.get("DASHBOARD_STATS_REFRESH", "10")),
+            idle=float(os.environ.get("DASHBOARD_STATS_IDLE", "300")),
+        )
+
+    def get(self) -> Snapshot:
+        now = time.monotonic()
+        self._last_read = now
+        self.reads += 1
+        snap = self._snapshot
+        if snap is None or now - snap.computed_at > self.max_age:
+            try:
+                snap = self._recompute(min_time=now - self.max_age)
+            except fanout.FanoutTimeout as e:
+                self.errors += 1
+                log.warning("dashboard stats: %s; serving %s", e, "the last snapshot" if snap else "a serial run")
+                snap = snap or self._recompute(parallel=False)
+            self.inline_refreshes += 1
+        self._ensure_thread()
+        return snap
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _recompute(self, min_time=None, parallel=True):
+        with self._compute_lock:
+            snap = self._snapshot
+            # Another reader may have refreshed it while we waited for the lock.
+            if snap is not None and min_time is not None and snap.computed_at >= min_time:
+                return snap
+            snap = compute(parallel)
+            self._snapshot = snap
+            return snap
+
+    def _ensure_thread(self):
+        if self.refresh <= 0:
+            return
+        pid = os.getpid()
+        t = self._thread
+        if t is not None and t.is_alive() and self._thread_pid == pid:
+            return
+        with self._lock:
+            t = self._thread
+            if t is not None and t.is_alive() and self._thread_pid == pid:
+                return
+            self._thread = threading.Thread(target=self._run, name="dashboard-stats", daemon=True)
+            self._thread_pid = pid
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh)
+            if time.monotonic() - self._last_read > self.idle:
+                return  # nobody is looking; the next read restarts the thread
+            try:
+                self._recompute()
+                self.background_refreshes += 1
+            except Exception:
+                self.errors += 1
+                log.exception("dashboard stats refresh failed")
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "age_seconds": round(time.monotonic() - snap.computed_at, 3) if snap else None,
+            "max_age": self.max_age,
+            "refresh": self.refresh,
+            "reads": self.reads,
+            "inline_refreshes": self.inline_refreshes,
+            "background_refreshes": self.background_refreshes,
+            "errors": self.errors,
+        }
+
+
+dashboard_stats = DashboardStats.from_env()
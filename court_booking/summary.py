@@ -0,0 +1,300 @@
+"""
+Per-day, per-court booking summary (`booking_daily_summary`).
+
+Rows are refreshed inside the same transaction as every booking write, so the
+year calendar and the dashboard trend read at most one small row per court and
+day instead of scanning `bookings`. `revision` is bumped on every refresh and
+never goes backwards, and rows are never deleted (a removed court's rows are
+zeroed), which lets readers detect changes to a date range.
+
+    python -m court_booking.summary init
+    python -m court_booking.summary backfill [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+from mysql.connector import errorcode
+from mysql.connector.errors import ProgrammingError
+
+from court_booking import migrate
+from court_booking.config import get_db_connection
+
+log = logging.getLogger(__name__)
+
+_MINUTES = "(TIME_TO_SEC(end_time) - TIME_TO_SEC(start_time) + IF(end_time <= start_time, 86400, 0)) DIV 60"
+
+_UPSERT_TAIL = """
+    ON DUPLICATE KEY UPDATE
+        booking_count=VALUES(booking_count),
+        booked_minutes=VALUES(booked_minutes),
+        first_start=VALUES(first_start),
+        last_start=VALUES(last_start),
+        revision=revision + 1
+"""
+
+_REFRESH_SQL = f"""
+    INSERT INTO booking_daily_summary
+        (booking_date, court_id, booking_count, booked_minutes, first_start, last_start)
+    SELECT %s, %s, COUNT(*), COALESCE(SUM({_MINUTES}), 0), MIN(start_time), MAX(start_time)
+    FROM bookings
+    WHERE court_id=%s AND booking_date=%s
+    {_UPSERT_TAIL}
+"""
+
+_RETRY_AFTER = 60.0
+_missing_since = None
+
+
+def _table_missing(exc) -> bool:
+    global _missing_since
+    if isinstance(exc, ProgrammingError) and exc.errno == errorcode.ER_NO_SUCH_TABLE:
+        if _missing_since is None:
+            log.warning("booking_daily_summary is missing; run `python -m court_booking.summary init`")
+        _missing_since = time.monotonic()
+        return True
+    return False
+
+
+def available() -> bool:
+    return _missing_since is None or time.monotonic() - _missing_since > _RETRY_AFTER
+
+
+def refresh(conn, court_id, booking_date):
+    """Recompute one (court, day) row. Call inside the transaction that changed its bookings."""
+    refresh_many(conn, [(court_id, booking_date)])
+
+
+def refresh_many(conn, keys):
+    """Recompute the rows for an iterable of (court_id, booking_date) pairs."""
+    if not available():
+        return
+    cur = conn.cursor()
+    try:
+        for court_id, booking_date in set(keys):
+            cur.execute(_REFRESH_SQL, (booking_date, court_id, court_id, booking_date))
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+    finally:
+        cur.close()
+
+
+def keys_for_user(conn, user_id):
+    """(court_id, booking_date) pairs a user's bookings occupy, to refresh after deleting the user."""
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT court_id, booking_date FROM bookings WHERE user_id=%s", (user_id,))
+    keys = cur.fetchall()
+    cur.close()
+    return keys
+
+
+def drop_court(conn, court_id):
+    """
+    Zero a deleted court's rows. They are kept, with their revision bumped,
+    rather than deleted: deleting would lower the row count and revision sum
+    that range_version() is built from, and a later write could then bring
+    back a version a client already holds for the old data.
+    """
+    if not available():
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE booking_daily_summary
+            SET booking_count=0, booked_minutes=0, first_start=NULL, last_start=NULL, revision=revision + 1
+            WHERE court_id=%s
+        """, (court_id,))
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+    finally:
+        cur.close()
+
+
+def touch_court(conn, court_id):
+    """Bump every row of a court (e.g. after a rename) so range versions change."""
+    if not available():
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE booking_daily_summary SET revision=revision + 1 WHERE court_id=%s", (court_id,))
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+    finally:
+        cur.close()
+
+
+def range_version(start_d: date, end_d: date, court_id=None):
+    """
+    Opaque version of the bookings in [start_d, end_d] (optionally one court),
+    or None if the summary is unavailable. Any write in the range changes it,
+    and it never repeats: rows are only added, never deleted, and every write
+    bumps a row's revision, so the row count and revision sum only grow.
+    """
+    if not available():
+        return None
+    sql = """
+        SELECT COUNT(*), COALESCE(SUM(revision), 0) FROM booking_daily_summary
+        WHERE booking_date BETWEEN %s AND %s
+    """
+    params = [start_d, end_d]
+    if court_id is not None:
+        sql += " AND court_id=%s"
+        params.append(court_id)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows, revisions = cur.fetchone()
+        return f"{rows}.{revisions}"
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+        return None
+    finally:
+        cur.close(); conn.close()
+
+
+def count_bookings(court_id=None, date_from=None, date_to=None):
+    """Number of bookings matching the filters, or None if the summary is unavailable."""
+    if not available():
+        return None
+    where, params = [], []
+    if court_id:
+        where.append("court_id = %s"); params.append(court_id)
+    if date_from:
+        where.append("booking_date >= %s"); params.append(date_from)
+    if date_to:
+        where.append("booking_date <= %s"); params.append(date_to)
+    where_sql = "WHERE " + " AND ".join(where) if where else ""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT COALESCE(SUM(booking_count), 0) FROM booking_daily_summary {where_sql}", params)
+        return int(cur.fetchone()[0])
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+        return None
+    finally:
+        cur.close(); conn.close()
+
+
+def booked_dates(start_d: date, end_d: date):
+    """Dates in [start_d, end_d] with at least one booking, or None if the summary is unavailable."""
+    if not available():
+        return None
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT DISTINCT booking_date FROM booking_daily_summary
+            WHERE booking_date BETWEEN %s AND %s AND booking_count > 0
+        """, (start_d, end_d))
+        return {r[0] for r in cur.fetchall()}
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+        return None
+    finally:
+        cur.close(); conn.close()
+
+
+def daily_counts(days: int = 14):
+    """[(date, bookings)] for days with bookings over the last `days` days, or None if unavailable."""
+    if not available():
+        return None
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT booking_date, SUM(booking_count) AS c
+            FROM booking_daily_summary
+            WHERE booking_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            GROUP BY booking_date
+            HAVING c > 0
+            ORDER BY booking_date ASC
+        """, (days,))
+        return [(r[0], int(r[1])) for r in cur.fetchall()]
+    except ProgrammingError as exc:
+        if not _table_missing(exc):
+            raise
+        return None
+    finally:
+        cur.close(); conn.close()
+
+
+def init(conn):
+    """Create the table by applying pending schema migrations."""
+    migrate.upgrade(conn)
+
+
+def backfill(conn, start_d: date, end_d: date, step_days: int = 31):
+    """Rebuild the summary for [start_d, end_d] from `bookings`, committing one chunk at a time."""
+    cur = conn.cursor()
+    total = 0
+    lo = start_d
+    while lo <= end_d:
+        hi = min(end_d, lo + timedelta(days=step_days - 1))
+        cur.execute("""
+            UPDATE booking_daily_summary
+            SET booking_count=0, booked_minutes=0, first_start=NULL, last_start=NULL, revision=revision + 1
+            WHERE booking_date BETWEEN %s AND %s
+        """, (lo, hi))
+        cur.execute(f"""
+            INSERT INTO booking_daily_summary
+                (booking_date, court_id, booking_count, booked_minutes, first_start, last_start)
+            SELECT booking_date, court_id, COUNT(*), SUM({_MINUTES}), MIN(start_time), MAX(start_time)
+            FROM bookings
+            WHERE booking_date BETWEEN %s AND %s
+            GROUP BY booking_date, court_id
+            {_UPSERT_TAIL}
+        """, (lo, hi))
+        total += cur.rowcount
+        conn.commit()
+        lo = hi + timedelta(days=1)
+    cur.close()
+    return total
+
+
+def _bounds(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(booking_date), MAX(booking_date) FROM bookings")
+    lo, hi = cur.fetchone()
+    cur.close()
+    return lo, hi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m court_booking.summary")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init", help="create the booking_daily_summary table (applies pending migrations)")
+    bf = sub.add_parser("backfill", help="rebuild summary rows from bookings")
+    bf.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    bf.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        init(conn)
+        if args.cmd == "backfill":
+            lo, hi = _bounds(conn)
+            lo = args.date_from or lo
+            hi = args.date_to or hi
+            if lo is None or hi is None:
+                print("No bookings to summarise.")
+                return
+            t0 = time.perf_counter()
+            rows = backfill(conn, lo, hi)
+            print(f"Backfilled {lo}..{hi}: {rows} row changes in {time.perf_counter() - t0:.1f}s")
+        else:
+            print("booking_daily_summary is ready.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
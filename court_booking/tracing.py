@@ -0,0 +1,113 @@
+"""
+Hooks around database use, for metrics and diagnostics.
+
+Listeners registered with `on_query` see every statement executed on a
+pooled connection: SQL, parameters (the first set for executemany) and
+seconds. `on_acquire` listeners see how long each pool checkout took.
+Connections are only wrapped when a query listener exists at the time they
+are opened, so with no listeners the raw mysql-connector objects are used
+unchanged. Per-request state registered with `carry` follows work handed to
+other threads through `bind`.
+"""
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+_query_listeners = []
+_acquire_listeners = []
+_carried = []
+
+
+def on_query(fn):
+    """Register fn(sql, params, seconds); exceptions in listeners are logged, never raised."""
+    _query_listeners.append(fn)
+    return fn
+
+
+def on_acquire(fn):
+    """Register fn(seconds), called after each pool checkout."""
+    _acquire_listeners.append(fn)
+    return fn
+
+
+def carry(get, put):
+    """Register per-thread request state (a getter and a setter) for `bind` to hand on to worker threads."""
+    _carried.append((get, put))
+
+
+def bind(fn):
+    """`fn` wrapped to run with the calling thread's carried state, so its queries count towards the request."""
+    if not _carried:
+        return fn
+    state = [(put, get()) for get, put in _carried]
+
+    def bound(*args, **kwargs):
+        saved = [(put, get()) for get, put in _carried]
+        for put, value in state:
+            put(value)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            for put, value in saved:
+                put(value)
+    return bound
+
+
+def _emit(listeners, *args):
+    for fn in listeners:
+        try:
+            fn(*args)
+        except Exception:
+            log.exception("tracing listener %r failed", fn)
+
+
+def acquired(seconds: float):
+    if _acquire_listeners:
+        _emit(_acquire_listeners, seconds)
+
+
+class TracedCursor:
+    """Cursor proxy that times execute()/executemany() and reports them to the query listeners."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._cur.execute(operation, params, *args, **kwargs)
+        finally:
+            _emit(_query_listeners, operation, params, time.perf_counter() - t0)
+
+    def executemany(self, operation, seq_params):
+        seq_params = list(seq_params)
+        t0 = time.perf_counter()
+        try:
+            return self._cur.executemany(operation, seq_params)
+        finally:
+            _emit(_query_listeners, operation, seq_params[0] if seq_params else None, time.perf_counter() - t0)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class TracedConnection:
+    """Raw connection proxy whose cursors are TracedCursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def wrap(conn):
+    """`conn` wrapped for tracing if anything is listening, else `conn` itself."""
+    return TracedConnection(conn) if _query_listeners else conn
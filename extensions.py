@@ -1,9 +1,11 @@
 import os
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import court_booking.ratelimit  # registers the sqlite:// storage scheme
 
 limiter = Limiter(
     key_func=get_remote_address,
     storage_uri=os.getenv("RATELIMIT_STORAGE_URI", "memory://"),
+    strategy=os.getenv("RATELIMIT_STRATEGY", "fixed-window"),
     default_limits=["500 per hour"]
 )
\ No newline at end of file
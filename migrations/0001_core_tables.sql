@@ -0,0 +1,29 @@
+-- Core tables, for a new database. Existing installs keep their tables as they are.
+CREATE TABLE IF NOT EXISTS users (
+    id            INT AUTO_INCREMENT PRIMARY KEY,
+    name          VARCHAR(100) NOT NULL,
+    username      VARCHAR(50) NOT NULL,
+    email         VARCHAR(120) NOT NULL,
+    password      VARCHAR(255) NOT NULL,
+    date_of_birth DATE NULL,
+    location      VARCHAR(100) NULL,
+    role          VARCHAR(20) NOT NULL DEFAULT 'user',
+    active        TINYINT(1) NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS courts (
+    id         INT AUTO_INCREMENT PRIMARY KEY,
+    court_name VARCHAR(100) NOT NULL,
+    status     VARCHAR(20) NOT NULL DEFAULT 'Available'
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id           INT AUTO_INCREMENT PRIMARY KEY,
+    court_id     INT NOT NULL,
+    user_id      INT NOT NULL,
+    booking_date DATE NOT NULL,
+    start_time   TIME NOT NULL,
+    end_time     TIME NOT NULL,
+    CONSTRAINT fk_bookings_court FOREIGN KEY (court_id) REFERENCES courts (id) ON DELETE CASCADE,
+    CONSTRAINT fk_bookings_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
@@ -0,0 +1,11 @@
+-- Overlap checks and court-day loads: covering (InnoDB appends the primary key).
+ALTER TABLE bookings ADD INDEX idx_bookings_court_slot (court_id, booking_date, start_time, end_time),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- "My bookings" lists, in display order.
+ALTER TABLE bookings ADD INDEX idx_bookings_user_date (user_id, booking_date, start_time),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Calendar ranges, admin listings and the summary backfill, in display order.
+ALTER TABLE bookings ADD INDEX idx_bookings_date (booking_date, start_time),
+    ALGORITHM=INPLACE, LOCK=NONE;
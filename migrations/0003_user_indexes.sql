@@ -0,0 +1,6 @@
+-- Login looks users up by username OR email; one index each lets MySQL use an index merge.
+ALTER TABLE users ADD INDEX idx_users_username (username), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE users ADD INDEX idx_users_email (email), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Active-user and active-admin counts (dashboard, last-admin guard).
+ALTER TABLE users ADD INDEX idx_users_active_role (active, role), ALGORITHM=INPLACE, LOCK=NONE;
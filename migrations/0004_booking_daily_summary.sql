@@ -0,0 +1,12 @@
+-- Per-day, per-court booking summary (court_booking.summary).
+CREATE TABLE IF NOT EXISTS booking_daily_summary (
+    booking_date   DATE NOT NULL,
+    court_id       INT NOT NULL,
+    booking_count  INT NOT NULL DEFAULT 0,
+    booked_minutes INT NOT NULL DEFAULT 0,
+    first_start    TIME NULL,
+    last_start     TIME NULL,
+    revision       BIGINT UNSIGNED NOT NULL DEFAULT 1,
+    PRIMARY KEY (booking_date, court_id),
+    KEY idx_summary_court_date (court_id, booking_date)
+);
@@ -0,0 +1,10 @@
+-- Cross-process change feed for live calendar updates (court_booking.live).
+CREATE TABLE IF NOT EXISTS booking_changes (
+    id           BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    changed_at   TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    origin       VARCHAR(64) NOT NULL,
+    op           VARCHAR(8) NOT NULL,
+    booking_date DATE NULL,
+    old_date     DATE NULL,
+    KEY idx_changes_changed_at (changed_at)
+);
@@ -0,0 +1,7 @@
+-- Date-range reads (calendar, availability, admin listings) need court_id and end_time too;
+-- with them in the index those reads never touch the table rows.
+ALTER TABLE bookings ADD INDEX idx_bookings_date_cover (booking_date, start_time, court_id, end_time),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Superseded by idx_bookings_date_cover (same leading columns).
+ALTER TABLE bookings DROP INDEX idx_bookings_date, ALGORITHM=INPLACE, LOCK=NONE;
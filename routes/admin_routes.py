@@ -1,14 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, session, flash, request, abort, Response
+from flask import Blueprint, render_template, redirect, url_for, session, flash, request, abort, Response, jsonify, current_app
 from functools import wraps
 from extensions import limiter
-from court_booking.config import get_db_connection
-from security import verify_and_upgrade_password, fresh_admin_required, ensure_not_last_active_admin
-import time, math, csv, io
+from court_booking.config import get_db_connection, pooled_connection
+from court_booking import bulk, fanout, importer, summary, repository
+from court_booking.stats import dashboard_stats
+from court_booking.pagination import CountCache, encode_cursor, decode_cursor, seek_clause, page_rows
+from court_booking.bookings import (commit_booking, commit_recurring, delete_booking, notify, recurrence_from_form,
+                                   BookingConflict, RecurringConflict, SlotBusy)
+from security import verify_and_upgrade_password, fresh_admin_required, ensure_not_last_active_admin, auth_cache
+import os, time, math, csv, io, zlib
 from datetime import date, datetime, timedelta
 import calendar as _cal
 
 admin_bp = Blueprint('admin_bp', __name__, template_folder='templates')
 
+_counts = CountCache()
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "2000"))
+
 
 def _parse_int(val, default, lo=1, hi=1000):
     try:
@@ -52,12 +61,8 @@ def restrict_to_admins():
     if not uid or role != "admin":
         flash("Access denied. Admins only.", "danger")
         return redirect(url_for("auth.login"))
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT id, role, active FROM users WHERE id=%s", (uid,))
-    user = cur.fetchone()
-    cur.close(); conn.close()
-    if not user or user["role"] != "admin" or int(user.get("active", 1)) != 1:
+    access = auth_cache.get(uid)
+    if not access or access[0] != "admin" or access[1] != 1:
         session.clear()
         abort(403)
 
@@ -79,10 +84,8 @@ def login():
         password = request.form.get("password") or ""
 
         conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM users WHERE username=%s OR email=%s", (username_or_email, username_or_email))
-        user = cur.fetchone()
-        cur.close(); conn.close()
+        user = repository.user_for_login(conn, username_or_email, username_or_email)
+        conn.close()
 
         if user and user.get("role") == "admin" and int(user.get("active", 1)) == 1:
             if verify_and_upgrade_password(password, user["password"], user["id"]):
@@ -102,53 +105,24 @@ def login():
 @admin_bp.route("/admin/dashboard")
 @admin_required
 def dashboard():
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-
-    cur.execute("SELECT COUNT(*) AS c FROM users"); total_users = cur.fetchone()["c"]
-    cur.execute("SELECT COUNT(*) AS c FROM users WHERE active=1"); active_users = cur.fetchone()["c"]
-    cur.execute("SELECT COUNT(*) AS c FROM bookings"); total_bookings = cur.fetchone()["c"]
-    cur.execute("SELECT COUNT(*) AS c FROM courts"); total_courts = cur.fetchone()["c"]
-
-    cur.execute("""
-        SELECT booking_date AS d, COUNT(*) AS c
-        FROM bookings
-        WHERE booking_date >= DATE_SUB(CURDATE(), INTERVAL 14 DAY)
-        GROUP BY booking_date
-        ORDER BY booking_date ASC
-    """)
-    trend = cur.fetchall()
-    bookings_labels = [str(r["d"]) for r in trend]
-    bookings_counts = [int(r["c"]) for r in trend]
-
-    cur.execute("""
-        SELECT b.id, u.username, c.court_name, b.booking_date, b.start_time, b.end_time
-        FROM bookings b
-        JOIN users u ON b.user_id = u.id
-        JOIN courts c ON b.court_id = c.id
-        ORDER BY b.booking_date DESC, b.start_time DESC
-        LIMIT 10
-    """)
-    bookings = cur.fetchall()
-
-    cur.close(); conn.close()
-
-    stats = {
-        "total_users": total_users,
-        "active_users": active_users,
-        "inactive_users": max(0, total_users - active_users),
-        "total_bookings": total_bookings,
-        "total_courts": total_courts,
-    }
+    snap = dashboard_stats.get()
     return render_template(
         "admin_dashboard.html",
-        stats=stats,
-        bookings_labels=bookings_labels,
-        bookings_counts=bookings_counts,
-        bookings=bookings,
+        stats=snap.stats,
+        bookings_labels=snap.labels,
+        bookings_counts=snap.counts,
+        bookings=snap.latest,
+        stats_as_of=snap.as_of,
     )
 
 
+def _list_courts():
+    conn = get_db_connection()
+    try:
+        return repository.list_courts(conn)
+    finally:
+        conn.close()
+
 @admin_bp.route("/admin/manage_bookings")
 @admin_required
 def admin_manage_bookings():
@@ -156,7 +130,6 @@ def admin_manage_bookings():
     court_id = (request.args.get("court_id") or "").strip()
     date_from = (request.args.get("from") or "").strip()
     date_to = (request.args.get("to") or "").strip()
-    page = _parse_int(request.args.get("page"), 1, 1, 100000)
     per_page = _parse_int(request.args.get("per_page"), 20, 1, 100)
 
     where, params = [], []
@@ -171,38 +144,65 @@ def admin_manage_bookings():
         where.append("b.booking_date <= %s"); params.append(date_to)
     where_sql = "WHERE " + " AND ".join(where) if where else ""
 
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-
-    cur.execute(f"""
-        SELECT COUNT(*) AS cnt
-        FROM bookings b
-        JOIN users u ON b.user_id = u.id
-        {where_sql}
-    """, params)
-    total = cur.fetchone()["cnt"]
-
-    offset = (page - 1) * per_page
-    cur.execute(f"""
-        SELECT b.id, u.username, c.court_name, b.booking_date, b.start_time, b.end_time
-        FROM bookings b
-        JOIN users u ON b.user_id = u.id
-        JOIN courts c ON b.court_id = c.id
-        {where_sql}
-        ORDER BY b.booking_date DESC, b.start_time DESC
-        LIMIT %s OFFSET %s
-    """, params + [per_page, offset])
-    bookings = cur.fetchall()
-
-    cur2 = conn.cursor(dictionary=True)
-    cur2.execute("SELECT id, court_name FROM courts ORDER BY court_name ASC")
-    courts = cur2.fetchall()
-    cur2.close(); cur.close(); conn.close()
-
-    pages = max(1, math.ceil(total / per_page))
+    cursor = decode_cursor(request.args.get("cursor"), 3)
+    direction, page, key = cursor if cursor else ("n", 1, None)
+
+    def count():
+        if not q:
+            n = summary.count_bookings(court_id, date_from, date_to)
+            if n is not None:
+                return n
+        return fanout.rows(f"""
+            SELECT COUNT(*) AS cnt
+            FROM bookings b
+            JOIN users u ON b.user_id = u.id
+            {where_sql}
+        """, params, dictionary=True)()[0]["cnt"]
+
+    seek_where, seek_params = list(where), list(params)
+    if key:
+        sql, p = seek_clause(["b.booking_date", "b.start_time", "b.id"], key,
+                             descending=True, after=(direction == "n"))
+        seek_where.append(sql); seek_params.extend(p)
+    seek_sql = "WHERE " + " AND ".join(seek_where) if seek_where else ""
+    order = "DESC" if direction == "n" else "ASC"
+
+    # Count, page and court list are independent: run them side by side.
+    tasks = {
+        "total": lambda: _counts.get_or_compute(("bookings", q, court_id, date_from, date_to), count),
+        "page": fanout.rows(f"""
+            SELECT b.id, u.username, c.court_name, b.booking_date, b.start_time, b.end_time
+            FROM bookings b
+            JOIN users u ON b.user_id = u.id
+            JOIN courts c ON b.court_id = c.id
+            {seek_sql}
+            ORDER BY b.booking_date {order}, b.start_time {order}, b.id {order}
+            LIMIT %s
+        """, seek_params + [per_page + 1], dictionary=True),
+        "courts": _list_courts,
+    }
+    try:
+        r = fanout.run(tasks)
+    except fanout.FanoutTimeout as e:
+        # A slow count is dropped rather than waited for again; the page itself is still needed.
+        current_app.logger.warning("admin bookings listing: %s", e)
+        r = fanout.finish(tasks, e, skip=("total",))
+    total, courts = r.get("total"), r["courts"]
+    bookings, has_more = page_rows(r["page"], per_page, direction)
+
+    next_cursor = prev_cursor = None
+    if bookings:
+        first, last = bookings[0], bookings[-1]
+        if has_more or direction == "p":
+            next_cursor = encode_cursor("n", page + 1, [last["booking_date"], last["start_time"], last["id"]])
+        if page > 1 and (has_more or direction == "n"):
+            prev_cursor = encode_cursor("p", page - 1, [first["booking_date"], first["start_time"], first["id"]])
+
+    pages = max(1, math.ceil(total / per_page)) if total is not None else None
     return render_template("admin_bookings.html",
                            bookings=bookings, courts=courts,
                            total=total, page=page, pages=pages, per_page=per_page,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor,
                            q=q, court_id=court_id, date_from=date_from, date_to=date_to)
 
 @admin_bp.route("/admin/export_bookings.csv")
@@ -225,28 +225,142 @@ def export_bookings_csv():
         where.append("b.booking_date <= %s"); params.append(date_to)
     where_sql = "WHERE " + " AND ".join(where) if where else ""
 
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(f"""
+    sql = f"""
         SELECT b.id, u.username, u.email, c.court_name, b.booking_date, b.start_time, b.end_time
         FROM bookings b
         JOIN users u ON b.user_id = u.id
         JOIN courts c ON b.court_id = c.id
         {where_sql}
         ORDER BY b.booking_date DESC, b.start_time DESC
-    """, params)
-    rows = cur.fetchall()
-    cur.close(); conn.close()
+    """
+    gzip_out = request.args.get("gzip") == "1" or request.accept_encodings["gzip"] > 0
+    rows = _export_rows(sql, params)
+    body = _gzip_chunks(rows) if gzip_out else rows
+
+    headers = {
+        "Content-Disposition": "attachment; filename=bookings_export.csv",
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+        "Vary": "Accept-Encoding",
+    }
+    if gzip_out:
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype="text/csv", headers=headers)
+
 
+def _export_rows(sql, params):
+    """
+    CSV text in chunks of EXPORT_CHUNK_ROWS rows, read from an unbuffered cursor
+    on a dedicated connection so memory stays flat however large the export is.
+    """
     out = io.StringIO()
     w = csv.writer(out)
     w.writerow(["ID","Username","Email","Court","Date","Start","End"])
-    for r in rows:
-        w.writerow([r["id"], r["username"], r["email"], r["court_name"], r["booking_date"], r["start_time"], r["end_time"]])
+    yield out.getvalue()  # first byte goes out before MySQL starts sorting
 
-    return Response(out.getvalue(),
-                    mimetype="text/csv",
-                    headers={"Content-Disposition": "attachment; filename=bookings_export.csv"})
+    conn = pooled_connection()
+    done = False
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            out.seek(0); out.truncate()
+            w.writerows(rows)
+            yield out.getvalue()
+        cur.close()
+        done = True
+    finally:
+        # A client that disconnects mid-download leaves unread rows on the wire;
+        # drop that connection rather than hand it back to the pool.
+        conn.close(discard=not done)
+
+
+def _gzip_chunks(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Sync-flush each chunk so the client sees rows as they are read.
+        yield z.compress(chunk.encode("utf-8")) + z.flush(zlib.Z_SYNC_FLUSH)
+    yield z.flush()
+
+def _import_part_bytes() -> int:
+    """Upload part size that stays under MAX_CONTENT_LENGTH."""
+    limit = current_app.config.get("MAX_CONTENT_LENGTH") or 8 * 1024 * 1024
+    return min(4 * 1024 * 1024, limit // 2)
+
+def _import_job(job_id):
+    """The signed-in admin's import job, or 404 (jobs are private to whoever uploaded them)."""
+    job = importer.get(job_id, owner=session["user_id"])
+    if job is None:
+        abort(404)
+    return job
+
+@admin_bp.route("/admin/import_bookings", methods=["GET", "POST"])
+@admin_required
+def import_bookings():
+    """Upload form (a plain multipart POST works for files under MAX_CONTENT_LENGTH) and recent imports."""
+    if request.method == "POST":
+        f = request.files.get("file")
+        if not f or not f.filename:
+            flash("Choose a CSV file to import.", "danger")
+            return redirect(url_for("admin_bp.import_bookings"))
+        job = importer.create(session["user_id"], f.filename)
+        try:
+            job.append(0, f.stream)
+            importer.start(job)
+        except importer.ImportRefused as e:
+            flash(str(e), "danger")
+            return redirect(url_for("admin_bp.import_bookings"))
+        return redirect(url_for("admin_bp.import_status", job_id=job.id))
+    return render_template("admin_import.html", jobs=importer.recent(session["user_id"]), part_bytes=_import_part_bytes(),
+                           columns=importer.COLUMNS)
+
+@admin_bp.route("/admin/import_bookings/uploads", methods=["POST"])
+@admin_required
+@limiter.limit("20/hour")
+def import_upload():
+    """Start a chunked upload; the client then POSTs the file's parts in order and asks to start."""
+    job = importer.create(session["user_id"], request.args.get("filename"))
+    return jsonify(id=job.id, part_bytes=_import_part_bytes(),
+                   parts_url=url_for("admin_bp.import_part", job_id=job.id),
+                   start_url=url_for("admin_bp.import_start", job_id=job.id),
+                   status_url=url_for("admin_bp.import_status", job_id=job.id))
+
+@admin_bp.route("/admin/import_bookings/<job_id>/parts", methods=["POST"])
+@admin_required
+def import_part(job_id):
+    job = _import_job(job_id)
+    try:
+        uploaded = job.append(request.args.get("offset", 0, type=int), request.stream)
+    except importer.ImportRefused as e:
+        return jsonify(error=str(e), uploaded=job.size), 400
+    return jsonify(uploaded=uploaded)
+
+@admin_bp.route("/admin/import_bookings/<job_id>/start", methods=["POST"])
+@admin_required
+def import_start(job_id):
+    job = _import_job(job_id)
+    try:
+        importer.start(job)
+    except importer.ImportRefused as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(job.progress())
+
+@admin_bp.route("/admin/import_bookings/<job_id>")
+@admin_required
+def import_status(job_id):
+    job = _import_job(job_id)
+    return render_template("admin_import_status.html", job=job.progress(),
+                           progress_url=url_for("admin_bp.import_progress", job_id=job.id))
+
+@admin_bp.route("/admin/import_bookings/<job_id>/progress")
+@admin_required
+def import_progress(job_id):
+    resp = jsonify(_import_job(job_id).progress())
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 @admin_bp.route("/admin/edit_booking/<int:booking_id>", methods=["GET", "POST"])
 @admin_required
@@ -258,12 +372,16 @@ def admin_edit_booking(booking_id):
         booking_date = request.form.get("booking_date")
         start_time = request.form.get("start_time")
         end_time = request.form.get("end_time")
-        cur.execute("""
-            UPDATE bookings
-            SET court_id=%s, booking_date=%s, start_time=%s, end_time=%s
-            WHERE id=%s
-        """, (court_id, booking_date, start_time, end_time, booking_id))
-        conn.commit()
+        try:
+            commit_booking(conn, court_id, booking_date, start_time, end_time, booking_id=booking_id)
+        except BookingConflict:
+            flash("This court is already booked during that time slot.", "warning")
+            cur.close(); conn.close()
+            return redirect(url_for("admin_bp.admin_edit_booking", booking_id=booking_id))
+        except SlotBusy:
+            flash("That slot is being booked by someone else right now. Please try again.", "warning")
+            cur.close(); conn.close()
+            return redirect(url_for("admin_bp.admin_edit_booking", booking_id=booking_id))
         flash("Booking updated successfully!", "success")
         cur.close(); conn.close()
         return redirect(url_for("admin_bp.admin_manage_bookings"))
@@ -276,8 +394,7 @@ def admin_edit_booking(booking_id):
         WHERE b.id=%s
     """, (booking_id,))
     booking = cur.fetchone()
-    cur.execute("SELECT id, court_name FROM courts ORDER BY court_name ASC")
-    courts = cur.fetchall()
+    courts = repository.list_courts(conn)
     cur.close(); conn.close()
 
     if not booking:
@@ -290,21 +407,55 @@ def admin_edit_booking(booking_id):
 @limiter.limit("20/hour")
 def admin_delete_booking(booking_id):
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM bookings WHERE id=%s", (booking_id,))
-    conn.commit()
-    cur.close(); conn.close()
+    delete_booking(conn, booking_id)
+    conn.close()
     flash("Booking deleted successfully!", "success")
     return redirect(url_for("admin_bp.admin_manage_bookings"))
 
 
+def _back(default_endpoint):
+    """The listing page the bulk form was posted from (same-site admin paths only)."""
+    back = request.form.get("back") or ""
+    return back if back.startswith("/admin/") else url_for(default_endpoint)
+
+@admin_bp.route("/admin/bookings/bulk", methods=["POST"])
+@admin_required
+@limiter.limit("20/hour")
+def admin_bulk_bookings():
+    action = request.form.get("action")
+    conn = get_db_connection()
+    try:
+        ids = bulk.parse_ids(request.form.getlist("ids"))
+        if action == "delete":
+            n = bulk.delete_bookings(conn, ids)
+            flash(f"Deleted {n} bookings.", "success")
+        elif action == "move":
+            court_id = int(request.form["court_id"]) if request.form.get("court_id") else None
+            target = date.fromisoformat(request.form["booking_date"]) if request.form.get("booking_date") else None
+            n = bulk.move_bookings(conn, ids, court_id, target)
+            flash(f"Moved {n} bookings.", "success")
+        else:
+            flash("Unknown action.", "danger")
+    except bulk.BulkConflict as e:
+        pairs = ", ".join(f"#{m} overlaps #{o}" for m, o in e.conflicts[:10])
+        more = f" and {len(e.conflicts) - 10} more" if len(e.conflicts) > 10 else ""
+        flash(f"Nothing was moved: {pairs}{more}.", "warning")
+    except bulk.BulkRefused as e:
+        flash(str(e), "danger")
+    except ValueError:
+        flash("Invalid court or date.", "danger")
+    except SlotBusy:
+        flash("Some of those court-days are being booked right now. Please try again.", "warning")
+    finally:
+        conn.close()
+    return redirect(_back("admin_bp.admin_manage_bookings"))
+
 @admin_bp.route("/admin/manage_users")
 @admin_required
 def admin_manage_users():
     q = (request.args.get("q") or "").strip()
     role = (request.args.get("role") or "").strip()
     active = request.args.get("active")
-    page = _parse_int(request.args.get("page"), 1, 1, 100000)
     per_page = _parse_int(request.args.get("per_page"), 20, 1, 100)
 
     where, params = [], []
@@ -318,27 +469,72 @@ def admin_manage_users():
         where.append("active = %s"); params.append(int(active))
     where_sql = "WHERE " + " AND ".join(where) if where else ""
 
+    cursor = decode_cursor(request.args.get("cursor"), 1)
+    direction, page, key = cursor if cursor else ("n", 1, None)
+
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
-    cur.execute(f"SELECT COUNT(*) AS cnt FROM users {where_sql}", params)
-    total = cur.fetchone()["cnt"]
 
-    offset = (page - 1) * per_page
+    def count():
+        cur.execute(f"SELECT COUNT(*) AS cnt FROM users {where_sql}", params)
+        return cur.fetchone()["cnt"]
+    total = _counts.get_or_compute(("users", q, role, active), count)
+
+    seek_where, seek_params = list(where), list(params)
+    if key:
+        sql, p = seek_clause(["id"], key, descending=False, after=(direction == "n"))
+        seek_where.append(sql); seek_params.extend(p)
+    seek_sql = "WHERE " + " AND ".join(seek_where) if seek_where else ""
+    order = "ASC" if direction == "n" else "DESC"
     cur.execute(f"""
         SELECT id, name, username, email, role, active
         FROM users
-        {where_sql}
-        ORDER BY id ASC
-        LIMIT %s OFFSET %s
-    """, params + [per_page, offset])
-    users = cur.fetchall()
+        {seek_sql}
+        ORDER BY id {order}
+        LIMIT %s
+    """, seek_params + [per_page + 1])
+    users, has_more = page_rows(cur.fetchall(), per_page, direction)
     cur.close(); conn.close()
 
+    next_cursor = prev_cursor = None
+    if users:
+        if has_more or direction == "p":
+            next_cursor = encode_cursor("n", page + 1, [users[-1]["id"]])
+        if page > 1 and (has_more or direction == "n"):
+            prev_cursor = encode_cursor("p", page - 1, [users[0]["id"]])
+
     pages = max(1, math.ceil(total / per_page))
     return render_template("admin_manage_users.html",
                            users=users, total=total, page=page, pages=pages, per_page=per_page,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor,
                            q=q, role=role, active=active)
 
+@admin_bp.route("/admin/users/bulk", methods=["POST"])
+@admin_required
+@fresh_admin_required(600)
+@limiter.limit("20/hour")
+def admin_bulk_users():
+    action = request.form.get("action")
+    conn = get_db_connection()
+    try:
+        ids = bulk.parse_ids(request.form.getlist("ids"))
+        if action == "delete":
+            n = bulk.delete_users(conn, ids)
+            flash(f"Deleted {n} users.", "success")
+        elif action in ("activate", "deactivate"):
+            n = bulk.set_users_active(conn, ids, action == "activate")
+            flash(f"{action.capitalize()}d {n} users.", "success")
+        else:
+            flash("Unknown action.", "danger")
+            ids = []
+        for uid in ids:
+            auth_cache.invalidate(uid)
+    except bulk.BulkRefused as e:
+        flash(str(e), "danger")
+    finally:
+        conn.close()
+    return redirect(_back("admin_bp.admin_manage_users"))
+
 @admin_bp.route("/admin/edit_user/<int:user_id>", methods=["GET", "POST"])
 @admin_required
 @fresh_admin_required(600)
@@ -362,6 +558,7 @@ def admin_edit_user(user_id):
             WHERE id=%s
         """, (name, username, email, role, active, user_id))
         conn.commit()
+        auth_cache.invalidate(user_id)
         flash("User updated successfully!", "success")
         cur.close(); conn.close()
         return redirect(url_for("admin_bp.admin_manage_users"))
@@ -384,8 +581,12 @@ def admin_delete_user(user_id):
         return redirect(url_for("admin_bp.admin_manage_users"))
     conn = get_db_connection()
     cur = conn.cursor()
+    keys = summary.keys_for_user(conn, user_id)
     cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
+    summary.refresh_many(conn, keys)
     conn.commit()
+    auth_cache.invalidate(user_id)
+    notify("reset")
     cur.close(); conn.close()
     flash("User deleted successfully!", "success")
     return redirect(url_for("admin_bp.admin_manage_users"))
@@ -394,10 +595,9 @@ def admin_delete_user(user_id):
 @admin_bp.route("/admin/courts")
 @admin_required
 def manage_courts():
-    conn = get_db_connection(); cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT id, court_name, status FROM courts ORDER BY court_name ASC")
-    courts = cur.fetchall()
-    cur.close(); conn.close()
+    conn = get_db_connection()
+    courts = repository.list_courts(conn)
+    conn.close()
     return render_template("admin_courts.html", courts=courts)
 
 @admin_bp.route("/admin/edit_court/<int:court_id>", methods=["GET", "POST"])
@@ -412,14 +612,17 @@ def edit_court(court_id):
             cur.execute("INSERT INTO courts (court_name, status) VALUES (%s, %s)", (name, status))
         else:
             cur.execute("UPDATE courts SET court_name=%s, status=%s WHERE id=%s", (name, status, court_id))
+        if court_id != 0:
+            summary.touch_court(conn, court_id)
         conn.commit()
+        if court_id != 0:
+            notify("court", court_id=court_id)
         cur.close(); conn.close()
         flash("Court saved.", "success")
         return redirect(url_for("admin_bp.manage_courts"))
     court = None
     if court_id != 0:
-        cur.execute("SELECT id, court_name, status FROM courts WHERE id=%s", (court_id,))
-        court = cur.fetchone()
+        court = repository.court_by_id(conn, court_id)
     cur.close(); conn.close()
     return render_template("admin_edit_court.html", court=court)
 
@@ -430,7 +633,9 @@ def edit_court(court_id):
 def delete_court(court_id):
     conn = get_db_connection(); cur = conn.cursor()
     cur.execute("DELETE FROM courts WHERE id=%s", (court_id,))
+    summary.drop_court(conn, court_id)
     conn.commit()
+    notify("court", court_id=court_id)
     cur.close(); conn.close()
     flash("Court deleted.", "success")
     return redirect(url_for("admin_bp.manage_courts"))
@@ -564,20 +769,13 @@ def create_booking():
         end_time = request.form.get("end_time")
 
         
-        cur.execute("""
-          SELECT 1 FROM bookings
-          WHERE court_id=%s AND booking_date=%s
-            AND NOT (end_time <= %s OR start_time >= %s)
-        """, (court_id, booking_date, start_time, end_time))
-        conflict = cur.fetchone()
-        if conflict:
+        try:
+            commit_booking(conn, court_id, booking_date, start_time, end_time, user_id=user_id)
+        except BookingConflict:
             flash("This court is already booked during that time slot.", "warning")
+        except SlotBusy:
+            flash("That slot is being booked by someone else right now. Please try again.", "warning")
         else:
-            cur.execute("""
-              INSERT INTO bookings (court_id, user_id, booking_date, start_time, end_time)
-              VALUES (%s, %s, %s, %s, %s)
-            """, (court_id, user_id, booking_date, start_time, end_time))
-            conn.commit()
             flash("Booking created.", "success")
             cur.close(); conn.close()
             return redirect(url_for("admin_bp.upcoming"))
@@ -585,8 +783,7 @@ def create_booking():
     
     cur.execute("SELECT id, username, email FROM users WHERE active=1 ORDER BY username ASC")
     users = cur.fetchall()
-    cur.execute("SELECT id, court_name FROM courts ORDER BY court_name ASC")
-    courts = cur.fetchall()
+    courts = repository.list_courts(conn)
     cur.close(); conn.close()
     return render_template("admin_create_booking.html", users=users, courts=courts)
 
@@ -612,4 +809,42 @@ def create_booking():
                            year=y, month=m, month_name=_cal.month_name[m],
                            weeks=weeks,
                            prev_year=prev_y, prev_month=prev_m,
-                           next_year=next_y, next_month=next_m)
\ No newline at end of file
+                           next_year=next_y, next_month=next_m)
+
+
+@admin_bp.route("/admin/book/recurring", methods=["GET", "POST"])
+@admin_required
+def create_recurring_booking():
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT id, username, email FROM users WHERE active=1 ORDER BY username ASC")
+    users = cur.fetchall()
+    cur.close()
+    conflicts = []
+    if request.method == "POST":
+        try:
+            user_id = request.form.get("user_id", type=int)
+            if user_id not in {u["id"] for u in users}:
+                raise ValueError("Please pick an active user.")
+            rec = recurrence_from_form(request.form)
+            created, conflicts = commit_recurring(conn, rec, user_id,
+                                                  skip_conflicts=bool(request.form.get("skip_conflicts")))
+        except ValueError as e:
+            flash(str(e), "danger")
+        except RecurringConflict as e:
+            conflicts = e.conflicts
+            flash(f"{len(conflicts)} occurrences overlap existing bookings; nothing was created.", "warning")
+        except SlotBusy:
+            flash("Some of those slots are being booked by someone else right now. Please try again.", "warning")
+        else:
+            if not conflicts:
+                conn.close()
+                flash(f"Created {len(created)} bookings.", "success")
+                return redirect(url_for("admin_bp.upcoming"))
+            flash(f"Created {len(created)} bookings; skipped {len(conflicts)} that overlap.", "warning")
+
+    courts = repository.list_courts(conn)
+    conn.close()
+    names = {c.id: c.court_name for c in courts}
+    return render_template("admin_create_recurring.html", users=users, courts=courts,
+                           conflicts=[(names.get(c, c), d, b) for c, d, b in conflicts])
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from extensions import limiter
 from court_booking.config import get_db_connection
+from court_booking import repository
 from security import verify_and_upgrade_password
-from passlib.hash import argon2
+from court_booking.passwords import hash_password
 import re, time
 
 auth_bp = Blueprint('auth', __name__)
@@ -43,7 +44,7 @@ def register():
             return redirect(url_for('auth.register'))
 
        
-        hashed_pw = argon2.hash(password)
+        hashed_pw = hash_password(password)
 
         cursor.execute("""
             INSERT INTO users (name, username, email, password, date_of_birth, location, role, active)
@@ -68,10 +69,8 @@ def login():
 
         email_candidate = username_or_email.lower()
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE username=%s OR email=%s", (username_or_email, email_candidate))
-        user = cursor.fetchone()
-        cursor.close(); conn.close()
+        user = repository.user_for_login(conn, username_or_email, email_candidate)
+        conn.close()
 
         if user and int(user.get("active", 1)) == 1 and verify_and_upgrade_password(password, user['password'], user['id']):
             session.clear()
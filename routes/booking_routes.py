@@ -1,5 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from court_booking.config import get_db_connection
+from court_booking import repository
+from court_booking.intervals import conflict_index
+from court_booking.bookings import (commit_booking, commit_recurring, delete_booking, recurrence_from_form,
+                                   BookingConflict, RecurringConflict, SlotBusy)
 from datetime import datetime, timedelta
 from extensions import limiter
 
@@ -8,6 +12,15 @@ booking_bp = Blueprint('booking', __name__)
 def _login_required() -> bool:
     return 'user_id' in session
 
+_BUSY_MESSAGE = "That slot is being booked by someone else right now. Please try again."
+
+def _conflict_message(conn, court_id, booking_date, start_db, end_db, exclude_id=None) -> str:
+    msg = "This court is already booked during that time slot."
+    gap = conflict_index.suggest(conn, court_id, booking_date, start_db, end_db, exclude_id)
+    if gap:
+        msg += f" Next free slot that day: {gap[0]} - {gap[1]}."
+    return msg
+
 @booking_bp.route('/dashboard')
 def dashboard():
     if not _login_required():
@@ -15,16 +28,8 @@ def dashboard():
         return redirect(url_for('auth.login'))
 
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT b.id, c.court_name, b.booking_date, b.start_time, b.end_time
-        FROM bookings b
-        JOIN courts c ON b.court_id = c.id
-        WHERE b.user_id=%s
-        ORDER BY b.booking_date ASC, b.start_time ASC
-    """, (session['user_id'],))
-    bookings = cursor.fetchall()
-    cursor.close(); conn.close()
+    bookings = repository.user_bookings(conn, session['user_id'])
+    conn.close()
     return render_template('dashboard.html', name=session.get('name'), username=session.get('username'), bookings=bookings)
 
 @booking_bp.route('/book', methods=['GET', 'POST'])
@@ -57,31 +62,59 @@ def book():
             cursor.close(); conn.close()
             return redirect(url_for('booking.book'))
 
-        cursor.execute("""
-            SELECT 1 FROM bookings
-            WHERE court_id=%s AND booking_date=%s
-              AND NOT (end_time <= %s OR start_time >= %s)
-        """, (court_id, booking_date, start_db, end_db))
-        if cursor.fetchone():
-            flash("This court is already booked during that time slot.", "warning")
+        try:
+            commit_booking(conn, court_id, booking_date, start_db, end_db, user_id=session['user_id'])
+        except BookingConflict:
+            flash(_conflict_message(conn, court_id, booking_date, start_db, end_db), "warning")
+            cursor.close(); conn.close()
+            return redirect(url_for('booking.book'))
+        except SlotBusy:
+            flash(_BUSY_MESSAGE, "warning")
             cursor.close(); conn.close()
             return redirect(url_for('booking.book'))
-
-        cursor.execute("""
-            INSERT INTO bookings (court_id, user_id, booking_date, start_time, end_time)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (court_id, session['user_id'], booking_date, start_db, end_db))
-        conn.commit()
         cursor.close(); conn.close()
 
         flash(f"Booking confirmed: {start_display} - {end_display}", "success")
         return redirect(url_for('booking.manage_bookings'))
 
-    cursor.execute("SELECT * FROM courts ORDER BY court_name ASC")
-    courts = cursor.fetchall()
+    courts = repository.list_courts(conn)
     cursor.close(); conn.close()
     return render_template('book.html', courts=courts)
 
+@booking_bp.route('/book/recurring', methods=['GET', 'POST'])
+@limiter.limit("10/hour;30/day")
+def book_recurring():
+    if not _login_required():
+        flash("Please login first.", "warning")
+        return redirect(url_for('auth.login'))
+
+    conn = get_db_connection()
+    conflicts = []
+    if request.method == 'POST':
+        try:
+            rec = recurrence_from_form(request.form)
+            created, conflicts = commit_recurring(conn, rec, session['user_id'],
+                                                  skip_conflicts=bool(request.form.get('skip_conflicts')))
+        except ValueError as e:
+            flash(str(e), "danger")
+        except RecurringConflict as e:
+            conflicts = e.conflicts
+            flash(f"{len(conflicts)} of the requested dates are already booked; nothing was booked.", "warning")
+        except SlotBusy:
+            flash(_BUSY_MESSAGE, "warning")
+        else:
+            if not conflicts:
+                conn.close()
+                flash(f"Booked {len(created)} sessions.", "success")
+                return redirect(url_for('booking.manage_bookings'))
+            flash(f"Booked {len(created)} sessions; {len(conflicts)} were already taken.", "warning")
+
+    courts = repository.list_courts(conn)
+    conn.close()
+    names = {c.id: c.court_name for c in courts}
+    return render_template('book_recurring.html', courts=courts,
+                           conflicts=[(names.get(c, c), d) for c, d, _ in conflicts])
+
 @booking_bp.route('/manage_bookings')
 def manage_bookings():
     if not _login_required():
@@ -89,16 +122,8 @@ def manage_bookings():
         return redirect(url_for('auth.login'))
 
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT b.id, c.court_name, b.booking_date, b.start_time, b.end_time
-        FROM bookings b
-        JOIN courts c ON b.court_id = c.id
-        WHERE b.user_id=%s
-        ORDER BY b.booking_date ASC, b.start_time ASC
-    """, (session['user_id'],))
-    bookings = cursor.fetchall()
-    cursor.close(); conn.close()
+    bookings = repository.user_bookings(conn, session['user_id'])
+    conn.close()
     return render_template('manage_bookings.html', bookings=bookings)
 
 @booking_bp.route('/edit_booking/<int:booking_id>', methods=['GET', 'POST'])
@@ -132,33 +157,25 @@ def edit_booking(booking_id):
             return redirect(url_for('booking.edit_booking', booking_id=booking_id))
 
         
-        cursor.execute("""
-            SELECT 1 FROM bookings
-            WHERE court_id=%s AND booking_date=%s
-              AND NOT (end_time <= %s OR start_time >= %s)
-              AND id <> %s
-        """, (court_id, booking_date, start_db, end_db, booking_id))
-        if cursor.fetchone():
-            flash("This court is already booked during that time slot.", "warning")
+        try:
+            commit_booking(conn, court_id, booking_date, start_db, end_db,
+                           booking_id=booking_id, owner_id=session['user_id'])
+        except BookingConflict:
+            flash(_conflict_message(conn, court_id, booking_date, start_db, end_db, booking_id), "warning")
+            cursor.close(); conn.close()
+            return redirect(url_for('booking.edit_booking', booking_id=booking_id))
+        except SlotBusy:
+            flash(_BUSY_MESSAGE, "warning")
             cursor.close(); conn.close()
             return redirect(url_for('booking.edit_booking', booking_id=booking_id))
-
-        cursor.execute("""
-            UPDATE bookings
-            SET court_id=%s, booking_date=%s, start_time=%s, end_time=%s
-            WHERE id=%s AND user_id=%s
-        """, (court_id, booking_date, start_db, end_db, booking_id, session['user_id']))
-        conn.commit()
         cursor.close(); conn.close()
 
         flash(f"Booking updated: {start_display} - {end_display}", "success")
         return redirect(url_for('booking.manage_bookings'))
 
     
-    cursor.execute("SELECT * FROM bookings WHERE id=%s AND user_id=%s", (booking_id, session['user_id']))
-    booking = cursor.fetchone()
-    cursor.execute("SELECT * FROM courts ORDER BY court_name ASC")
-    courts = cursor.fetchall()
+    booking = repository.user_booking(conn, booking_id, session['user_id'])
+    courts = repository.list_courts(conn)
     cursor.close(); conn.close()
 
     
@@ -186,10 +203,8 @@ def cancel_booking(booking_id):
         return redirect(url_for('auth.login'))
 
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("DELETE FROM bookings WHERE id=%s AND user_id=%s", (booking_id, session['user_id']))
-    conn.commit()
-    cursor.close(); conn.close()
+    delete_booking(conn, booking_id, user_id=session['user_id'])
+    conn.close()
 
     flash("Booking cancelled successfully.", "success")
     return redirect(url_for('booking.manage_bookings'))
\ No newline at end of file
@@ -1,26 +1,50 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request
+from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify, current_app, Response
+import hashlib
+import json
+import os
+import queue
+import time
 from datetime import date, datetime, timedelta
 import calendar as cal
 from court_booking.config import get_db_connection
+from court_booking import availability, summary, repository
+from court_booking.bookings import on_change
+from court_booking.intervals import fmt_minutes, to_minutes
+from court_booking.layout import layout_events
+from court_booking.live import feed
+from court_booking.view_cache import ViewCache
 
 calendar_bp = Blueprint("calendar", __name__)
 
-def _to_minutes(val) -> int:
-    """Convert MySQL TIME (timedelta or 'HH:MM:SS') to minutes after midnight."""
-    if val is None:
-        return 0
-    try:
-        from datetime import timedelta as _td
-        if isinstance(val, _td):
-            return int(val.total_seconds() // 60) % (24 * 60)
-    except Exception:
-        pass
-    s = str(val)
-    try:
-        hh, mm, *_ = s.split(":")
-        return int(hh) * 60 + int(mm)
-    except Exception:
-        return 0
+view_cache = ViewCache.from_env("CALENDAR_CACHE")
+
+COURT_COLORS = {
+    "Court A": "#22c55e",
+    "Court B": "#3b82f6",
+    "Court C": "#f59e0b",
+    "Court D": "#ec4899",
+}
+
+HOURS_START, HOURS_END = 6, 22
+SLOT_MINUTES = 30
+ROW_PX = 22
+
+@on_change
+def _invalidate_views(change):
+    if change.op in ("court", "reset") or change.booking_date is None:
+        view_cache.clear()
+        return
+    view_cache.invalidate_date(change.booking_date)
+    if change.old_date is not None and change.old_date != change.booking_date:
+        view_cache.invalidate_date(change.old_date)
+
+@feed.listen
+def _invalidate_remote_views(evt):
+    if not evt["dates"]:
+        view_cache.clear()
+        return
+    for d in evt["dates"]:
+        view_cache.invalidate_date(date.fromisoformat(d))
 
 def _hour_labels(start_h: int, end_h: int):
     out = []
@@ -31,89 +55,59 @@ def _hour_labels(start_h: int, end_h: int):
         else: out.append(f"{h-12}PM")
     return out
 
-def fetch_bookings(start_d: date, end_d: date):
+def _events(rows, first_day, columns: int):
+    """Positioned event dicts for the week (7 columns) or day (1 column) time grid."""
+    days, row_start, row_end, lane, lanes = layout_events(
+        rows, first_day, HOURS_START, HOURS_END, SLOT_MINUTES)
+    col = 100.0 / columns
+    events = []
+    for i, r in enumerate(rows):
+        events.append({
+            "left": f"calc({(days[i] + lane[i] / lanes[i]) * col:.4f}% + 2px)",
+            "width": f"calc({col / lanes[i]:.4f}% - 4px)",
+            "top": f"{row_start[i] * ROW_PX}px",
+            "height": f"{(row_end[i] - row_start[i]) * ROW_PX}px",
+            "bg": COURT_COLORS.get(r.court_name, "#6366f1"),
+            "title": r.court_name,
+            "time_label": str(r.start_time)[:5],
+        })
+    return events
+
+def fetch_bookings(start_d: date, end_d: date, court_id=None):
     conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT b.booking_date, b.start_time, b.end_time, c.court_name
-        FROM bookings b
-        JOIN courts c ON b.court_id = c.id
-        WHERE b.booking_date BETWEEN %s AND %s
-        ORDER BY b.booking_date, b.start_time
-    """, (start_d, end_d))
-    rows = cur.fetchall()
-    cur.close(); conn.close()
+    rows = repository.bookings_in_range(conn, start_d, end_d, court_id)
+    conn.close()
     return rows
 
-@calendar_bp.route("/tournament_calendar")
-def tournament_calendar():
-    if "user_id" not in session:
-        flash("Please login first.", "warning")
-        return redirect(url_for("auth.login"))
-
-    today = date.today()
-    view = (request.args.get("view") or "month").lower()
-
-    
-    d_param = request.args.get("d")
-    try:
-        focus = datetime.strptime(d_param, "%Y-%m-%d").date() if d_param else today
-    except Exception:
-        focus = today
-
-   
-    try:
-        year = int(request.args.get("year", focus.year))
-    except Exception:
-        year = focus.year
-    try:
-        month = int(request.args.get("month", focus.month))
-    except Exception:
-        month = focus.month
-    month = min(12, max(1, month))
-
-    
-    court_colors = {
-        "Court A": "#22c55e",
-        "Court B": "#3b82f6",
-        "Court C": "#f59e0b",
-        "Court D": "#ec4899",
-    }
-
-   
-    nav_prev_d = focus
-    nav_next_d = focus
-
-    
-    hours_start, hours_end = 6, 22  
-    slot_minutes = 30
-    row_px = 22
-    rows_count = (hours_end - hours_start) * (60 // slot_minutes)
+def _view_range(view: str, focus: date, year: int, month: int):
+    """Date range a view is built from, or None for an unknown view."""
+    if view == "month":
+        first = date(year, month, 1)
+        start = first - timedelta(days=first.weekday())
+        return start, start + timedelta(days=41)
+    if view == "week":
+        start = focus - timedelta(days=focus.weekday())
+        return start, start + timedelta(days=6)
+    if view == "day":
+        return focus, focus
+    if view == "year":
+        return date(year, 1, 1), date(year, 12, 31)
+    return None
+
+def _build_view(view: str, focus: date, year: int, month: int, today: date) -> dict:
+    """Booking-dependent part of the calendar context for one view (cacheable, user-independent)."""
+    start, end = _view_range(view, focus, year, month)
+    rows_count = (HOURS_END - HOURS_START) * (60 // SLOT_MINUTES)
     rows_iter = list(range(rows_count))
-
-    context = {
-        "name": session.get("name"),
-        "username": session.get("username"),
-        "today": today.isoformat(),
-        "view": view,
-        "focus": focus.isoformat(),
-        "year": year,
-        "month": month,
-        "month_name": cal.month_name[month],
-    }
+    payload = {}
 
     if view == "month":
-        first = date(year, month, 1)
-        start = first - timedelta(days=first.weekday())  
-        end = start + timedelta(days=41)                 
         rows = fetch_bookings(start, end)
 
-        
         bookings_by_day = {}
         for r in rows:
-            bookings_by_day.setdefault(r["booking_date"], []).append(r)
+            bookings_by_day.setdefault(r.booking_date, []).append(r)
 
-        
         days = []
         dptr = start
         while dptr <= end:
@@ -126,7 +120,6 @@ def tournament_calendar():
             })
             dptr += timedelta(days=1)
 
-        
         prev_month = 12 if month == 1 else month - 1
         prev_year = year - 1 if month == 1 else year
         next_month = 1 if month == 12 else month + 1
@@ -134,49 +127,23 @@ def tournament_calendar():
         nav_prev_d = date(prev_year, prev_month, 15)
         nav_next_d = date(next_year, next_month, 15)
 
-        context.update({
+        payload.update({
             "days": days,
         })
 
     elif view == "week":
-        start = focus - timedelta(days=focus.weekday())  
-        end = start + timedelta(days=6)
         rows = fetch_bookings(start, end)
 
         week_days = [start + timedelta(days=i) for i in range(7)]
         week_day_labels = [d.strftime('%a ') + str(d.day) for d in week_days]
-        week_hour_labels = _hour_labels(hours_start, hours_end)
+        week_hour_labels = _hour_labels(HOURS_START, HOURS_END)
 
-        week_events = []
-        for r in rows:
-            day_idx0 = (r["booking_date"] - start).days  
-            smin = _to_minutes(r["start_time"])
-            emin = _to_minutes(r["end_time"])
-            if emin <= smin:
-                emin = smin + slot_minutes
-            
-            smin = max(smin, hours_start * 60)
-            emin = max(emin, smin + slot_minutes)
-            row_start = int((smin - hours_start * 60) / slot_minutes)
-            row_end = int((emin - hours_start * 60) / slot_minutes)
-            row_end = max(row_end, row_start + 1)
-            color = court_colors.get(r["court_name"], "#6366f1")
-            top = f"{row_start * row_px}px"
-            height = f"{(row_end - row_start) * row_px}px"
-            left = f"calc(({day_idx0}) * (100% / 7) + 2px)"
-            week_events.append({
-                "left": left,
-                "top": top,
-                "height": height,
-                "bg": color,
-                "title": r["court_name"],
-                "time_label": str(r["start_time"])[:5],
-            })
+        week_events = _events(rows, start, 7)
 
         nav_prev_d = start - timedelta(days=7)
         nav_next_d = start + timedelta(days=7)
 
-        context.update({
+        payload.update({
             "week_title": f"{week_days[0].strftime('%b %d')} – {week_days[-1].strftime('%b %d, %Y')}",
             "week_day_labels": week_day_labels,
             "week_hour_labels": week_hour_labels,
@@ -186,31 +153,10 @@ def tournament_calendar():
 
     elif view == "day":
         rows = fetch_bookings(focus, focus)
-        day_hour_labels = _hour_labels(hours_start, hours_end)
+        day_hour_labels = _hour_labels(HOURS_START, HOURS_END)
 
-        day_events = []
-        for r in rows:
-            smin = _to_minutes(r["start_time"])
-            emin = _to_minutes(r["end_time"])
-            if emin <= smin:
-                emin = smin + slot_minutes
-            smin = max(smin, hours_start * 60)
-            emin = max(emin, smin + slot_minutes)
-            row_start = int((smin - hours_start * 60) / slot_minutes)
-            row_end = int((emin - hours_start * 60) / slot_minutes)
-            row_end = max(row_end, row_start + 1)
-            color = court_colors.get(r["court_name"], "#6366f1")
-            top = f"{row_start * row_px}px"
-            height = f"{(row_end - row_start) * row_px}px"
-            day_events.append({
-                "top": top,
-                "height": height,
-                "bg": color,
-                "title": r["court_name"],
-                "time_label": str(r["start_time"])[:5],
-            })
+        day_events = _events(rows, None, 1)
 
-       
         first = date(focus.year, focus.month, 1)
         grid_start = first - timedelta(days=first.weekday())
         grid_end = grid_start + timedelta(days=41)
@@ -228,7 +174,7 @@ def tournament_calendar():
         nav_prev_d = focus - timedelta(days=1)
         nav_next_d = focus + timedelta(days=1)
 
-        context.update({
+        payload.update({
             "day_title": focus.strftime("%B %d, %Y"),
             "day_hour_labels": day_hour_labels,
             "rows_iter": rows_iter,
@@ -238,11 +184,13 @@ def tournament_calendar():
             "year": focus.year,
         })
 
-    elif view == "year":
+    else:
         y = year
-       
-        rows = fetch_bookings(date(y, 1, 1), date(y, 12, 31))
-        booked_dates = {r["booking_date"] for r in rows}
+
+        booked_dates = summary.booked_dates(date(y, 1, 1), date(y, 12, 31))
+        if booked_dates is None:
+            rows = fetch_bookings(date(y, 1, 1), date(y, 12, 31))
+            booked_dates = {r.booking_date for r in rows}
 
         year_months = []
         for m in range(1, 13):
@@ -267,15 +215,249 @@ def tournament_calendar():
         nav_prev_d = date(y - 1, 6, 15)
         nav_next_d = date(y + 1, 6, 15)
 
-        context.update({"year_months": year_months})
-
-    else:
-        return redirect(url_for("calendar.tournament_calendar", view="month", year=year, month=month))
+        payload.update({"year_months": year_months})
 
-   
-    context.update({
+    payload.update({
         "nav_prev_d": nav_prev_d.isoformat(),
         "nav_next_d": nav_next_d.isoformat(),
     })
+    return payload
+
+def get_view(view: str, focus: date, year: int, month: int, today: date):
+    """Cached `_build_view`; None for an unknown view."""
+    rng = _view_range(view, focus, year, month)
+    if rng is None:
+        return None
+    key = (view, rng[0], rng[1], today)
+    payload = view_cache.get(key)
+    if payload is None:
+        payload = _build_view(view, focus, year, month, today)
+        view_cache.put(key, rng[0], rng[1], payload)
+    return payload
+
+def warm_calendar_cache(app):
+    """Pre-build the month views for the current and next month."""
+    if not view_cache.enabled:
+        return
+    today = date.today()
+    nxt = date(today.year + (today.month == 12), today.month % 12 + 1, 1)
+    with app.app_context():
+        for d in (today, nxt):
+            get_view("month", d, d.year, d.month, today)
+
+def _calendar_context():
+    """Template context for the calendar view selected by the query string, or None for an unknown view."""
+    today = date.today()
+    view = (request.args.get("view") or "month").lower()
+
+    
+    d_param = request.args.get("d")
+    try:
+        focus = datetime.strptime(d_param, "%Y-%m-%d").date() if d_param else today
+    except Exception:
+        focus = today
 
-    return render_template("tournament_calendar.html", **context)
\ No newline at end of file
+   
+    try:
+        year = int(request.args.get("year", focus.year))
+    except Exception:
+        year = focus.year
+    try:
+        month = int(request.args.get("month", focus.month))
+    except Exception:
+        month = focus.month
+    month = min(12, max(1, month))
+
+    payload = get_view(view, focus, year, month, today)
+    if payload is None:
+        return None, url_for("calendar.tournament_calendar", view="month", year=year, month=month)
+
+    range_from, range_to = _view_range(view, focus, year, month)
+    context = {
+        "name": session.get("name"),
+        "username": session.get("username"),
+        "today": today.isoformat(),
+        "view": view,
+        "focus": focus.isoformat(),
+        "year": year,
+        "month": month,
+        "month_name": cal.month_name[month],
+        "range_from": range_from.isoformat(),
+        "range_to": range_to.isoformat(),
+    }
+    context.update(payload)
+    return context, None
+
+@calendar_bp.route("/tournament_calendar")
+def tournament_calendar():
+    if "user_id" not in session:
+        flash("Please login first.", "warning")
+        return redirect(url_for("auth.login"))
+
+    context, fallback = _calendar_context()
+    if context is None:
+        return redirect(fallback)
+    return render_template("tournament_calendar.html", **context)
+
+@calendar_bp.route("/tournament_calendar/grid")
+def calendar_grid():
+    """Just the grid of a calendar view, for live updates to swap in place."""
+    if "user_id" not in session:
+        return "", 401
+    context, _ = _calendar_context()
+    if context is None:
+        return "", 404
+    resp = current_app.response_class(render_template("calendar_grid.html", **context), mimetype="text/html")
+    resp.set_etag(hashlib.sha1(resp.get_data()).hexdigest())
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+LIVE_HEARTBEAT = float(os.environ.get("LIVE_HEARTBEAT", "25"))
+LIVE_STREAM_MAX_AGE = float(os.environ.get("LIVE_STREAM_MAX_AGE", "300"))
+
+@calendar_bp.route("/api/calendar/stream")
+def calendar_stream():
+    """Server-sent events: one `change` event per booking write, with the dates it touched."""
+    if "user_id" not in session:
+        return jsonify(error="login required"), 401
+    if not feed.enabled:
+        return jsonify(error="live updates are disabled"), 404
+    q = feed.subscribe()
+    if q is None:
+        resp = jsonify(error="too many live connections")
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "30"
+        return resp
+
+    def stream():
+        # Streams are closed after LIVE_STREAM_MAX_AGE so the browser reconnects
+        # (and lands on a possibly less busy worker); it re-syncs on reconnect.
+        deadline = time.monotonic() + LIVE_STREAM_MAX_AGE
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    evt = q.get(timeout=min(LIVE_HEARTBEAT, remaining))
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: change\ndata: {json.dumps(evt, separators=(',', ':'))}\n\n"
+        finally:
+            feed.unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+API_MAX_DAYS = 366
+EVENT_FIELDS = ["id", "court_id", "court", "date", "start", "end"]
+
+def _parse_range(args):
+    """(from, to, court_id) from query args, defaulting to the current month grid; None if invalid."""
+    today = date.today()
+    try:
+        start = date.fromisoformat(args["from"]) if args.get("from") else None
+        end = date.fromisoformat(args["to"]) if args.get("to") else None
+        court_id = int(args["court"]) if args.get("court") else None
+    except ValueError:
+        return None
+    if start is None:
+        start = _view_range("month", today, today.year, today.month)[0]
+    if end is None:
+        end = start + timedelta(days=41)
+    if end < start or (end - start).days >= API_MAX_DAYS:
+        return None
+    return start, end, court_id
+
+def _events_etag(start: date, end: date, court_id, version: str) -> str:
+    raw = f"{start}|{end}|{court_id}|{version}"
+    return "v1-" + hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+@calendar_bp.route("/api/calendar/events")
+def api_events():
+    if "user_id" not in session:
+        return jsonify(error="login required"), 401
+    parsed = _parse_range(request.args)
+    if parsed is None:
+        return jsonify(error=f"invalid range (from/to must be YYYY-MM-DD, at most {API_MAX_DAYS} days)"), 400
+    start, end, court_id = parsed
+
+    version = summary.range_version(start, end, court_id)
+    if version is not None:
+        etag = _events_etag(start, end, court_id, version)
+        if request.if_none_match.contains(etag):
+            resp = current_app.response_class(status=304)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+
+    rows = fetch_bookings(start, end, court_id)
+    events = [
+        [r.id, r.court_id, r.court_name, r.booking_date.isoformat(),
+         fmt_minutes(to_minutes(r.start_time)), fmt_minutes(to_minutes(r.end_time))]
+        for r in rows
+    ]
+    resp = jsonify({"from": start.isoformat(), "to": end.isoformat(), "court": court_id,
+                    "fields": EVENT_FIELDS, "events": events})
+    if version is None:
+        resp.set_etag(hashlib.sha1(resp.get_data()).hexdigest())
+    else:
+        resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+AVAILABILITY_FIELDS = ["court_id", "date", "start", "end"]
+
+def _parse_courts(spec: str):
+    """"1,2,5-8" -> {1, 2, 5, 6, 7, 8}; raises ValueError."""
+    ids = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lo, _, hi = part.partition("-")
+        lo, hi = int(lo), int(hi or lo)
+        if hi < lo or hi - lo > 1000:
+            raise ValueError(part)
+        ids.update(range(lo, hi + 1))
+    return ids
+
+def _parse_availability(args):
+    """Search parameters from query args, or an error message."""
+    try:
+        start = date.fromisoformat(args["from"]) if args.get("from") else date.today()
+        end = date.fromisoformat(args["to"]) if args.get("to") else start + timedelta(days=30)
+        min_minutes = int(args.get("min", "60"))
+        court_ids = _parse_courts(args["courts"]) if args.get("courts") else None
+        open_min = to_minutes(args["open"]) if args.get("open") else availability.OPEN_MINUTES
+        close_min = to_minutes(args["close"]) if args.get("close") else availability.CLOSE_MINUTES
+    except ValueError:
+        return "invalid parameters (from/to YYYY-MM-DD, min minutes, courts like 1,2,5-8, open/close HH:MM)"
+    if end < start or (end - start).days >= availability.AVAILABILITY_MAX_DAYS:
+        return f"invalid range (at most {availability.AVAILABILITY_MAX_DAYS} days)"
+    if not 0 < min_minutes <= 24 * 60 or not 0 <= open_min < close_min <= 24 * 60:
+        return "invalid min or opening hours"
+    return start, end, min_minutes, court_ids, open_min, close_min
+
+@calendar_bp.route("/api/availability")
+def api_availability():
+    """Free windows of at least `min` minutes per court and day."""
+    if "user_id" not in session:
+        return jsonify(error="login required"), 401
+    parsed = _parse_availability(request.args)
+    if isinstance(parsed, str):
+        return jsonify(error=parsed), 400
+    start, end, min_minutes, court_ids, open_min, close_min = parsed
+
+    courts, windows = availability.search(start, end, min_minutes, court_ids, open_min, close_min)
+    resp = jsonify({
+        "from": start.isoformat(), "to": end.isoformat(),
+        "min_minutes": min_minutes, "slot_minutes": availability.SLOT_MINUTES,
+        "courts": [{"id": c.id, "name": c.court_name} for c in courts],
+        "fields": AVAILABILITY_FIELDS,
+        "windows": [[cid, d.isoformat(), fmt_minutes(s), fmt_minutes(e)] for cid, d, s, e in windows],
+    })
+    resp.set_etag(hashlib.sha1(resp.get_data()).hexdigest())
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
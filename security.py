@@ -1,34 +1,76 @@
+import logging
+import os
+import threading
 import time
 from typing import Optional
 from flask import session, redirect, url_for, flash
 from functools import wraps
-from passlib.hash import argon2
-from werkzeug.security import check_password_hash
 from court_booking.config import get_db_connection
+from court_booking import repository
+from court_booking.passwords import HasherBusy, hash_password, verify_password
+
+log = logging.getLogger(__name__)
 
 def verify_and_upgrade_password(plain: str, stored_hash: str, user_id: int) -> bool:
     """
     Supports old Werkzeug PBKDF2 hashes and Argon2.
-    If PBKDF2 verifies, rehash with Argon2 and persist.
+    If the hash is PBKDF2 or uses outdated Argon2 parameters, rehash and persist.
+    Raises HasherBusy when the password pool is saturated while verifying; if
+    it is saturated for the rehash, the upgrade is left to a later login.
     """
-    if not stored_hash:
-        return False
+    ok, needs_rehash = verify_password(plain, stored_hash)
+    if ok and needs_rehash:
+        try:
+            new_hash = hash_password(plain)
+        except HasherBusy:
+            log.info("password upgrade for user %s skipped: hasher busy", user_id)
+            return ok
+        conn = get_db_connection()
+        repository.set_password(conn, user_id, new_hash)
+        conn.commit()
+        conn.close()
+    return ok
 
-    if stored_hash.startswith("pbkdf2:"):
-        if check_password_hash(stored_hash, plain):
-            new_hash = argon2.hash(plain)
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("UPDATE users SET password=%s WHERE id=%s", (new_hash, user_id))
-            conn.commit()
-            cur.close(); conn.close()
-            return True
-        return False
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "15"))
 
-    try:
-        return argon2.verify(plain, stored_hash)
-    except Exception:
-        return False
+class AuthCache:
+    """
+    Per-process cache of user_id -> (role, active) for per-request authorization.
+    Entries live `ttl` seconds; writes to a user's role or status must call invalidate().
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        """(role, active) for a user, or None if the user does not exist."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(user_id)
+            if hit and now - hit[1] <= self.ttl:
+                return hit[0]
+        conn = get_db_connection()
+        row = repository.user_access(conn, user_id)
+        conn.close()
+        access = (row[0], int(row[1] if row[1] is not None else 1)) if row else None
+        if self.ttl > 0:
+            with self._lock:
+                if len(self._data) >= self.max_entries:
+                    self._data.clear()
+                self._data[user_id] = (access, now)
+        return access
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._data.clear()
+            else:
+                self._data.pop(user_id, None)
+
+auth_cache = AuthCache()
 
 def fresh_admin_required(max_age_seconds: int = 600):
     """
@@ -53,22 +95,18 @@ def ensure_not_last_active_admin(target_user_id: int, new_role: Optional[str] =
     Prevent removing/demoting the last active admin.
     """
     conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT id, role, active FROM users WHERE id=%s", (target_user_id,))
-    target = cur.fetchone()
-
-    cur.execute("SELECT COUNT(*) AS cnt FROM users WHERE role='admin' AND active=1")
-    cnt = cur.fetchone()["cnt"]
-    cur.close(); conn.close()
+    target = repository.user_access(conn, target_user_id)
+    cnt = repository.count_active_admins(conn)
+    conn.close()
 
     if not target:
         return True
 
-    if deleting and target["role"] == "admin" and int(target.get("active", 0)) == 1 and cnt <= 1:
+    if deleting and target.role == "admin" and int(target.active or 0) == 1 and cnt <= 1:
         return False
 
-    if (new_role is not None and target["role"] == "admin"
-            and new_role != "admin" and int(target.get("active", 0)) == 1 and cnt <= 1):
+    if (new_role is not None and target.role == "admin"
+            and new_role != "admin" and int(target.active or 0) == 1 and cnt <= 1):
         return False
 
     return True
\ No newline at end of file
@@ -0,0 +1,47 @@
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.getElementById("import-form");
+  if (form) {
+    // Send the file in parts that each fit under the request size limit.
+    form.addEventListener("submit", async (e) => {
+      const file = form.querySelector("input[type=file]").files[0];
+      if (!file || !window.fetch) return;
+      e.preventDefault();
+      const status = document.getElementById("import-upload-status");
+      const headers = { "X-CSRFToken": form.querySelector("[name=csrf_token]").value };
+      const post = async (url, body) => {
+        const r = await fetch(url, { method: "POST", headers, body, credentials: "same-origin" });
+        const data = await r.json().catch(() => ({ error: `HTTP ${r.status}` }));
+        if (!r.ok) throw new Error(data.error || `HTTP ${r.status}`);
+        return data;
+      };
+      try {
+        const job = await post(`${form.dataset.uploadUrl}?filename=${encodeURIComponent(file.name)}`);
+        for (let offset = 0; offset < file.size; offset += job.part_bytes) {
+          status.textContent = `Uploading… ${Math.floor(100 * offset / file.size)}%`;
+          await post(`${job.parts_url}?offset=${offset}`, file.slice(offset, offset + job.part_bytes));
+        }
+        await post(job.start_url);
+        window.location = job.status_url;
+      } catch (err) {
+        status.textContent = `Upload failed: ${err.message}`;
+      }
+    });
+  }
+
+  const box = document.getElementById("import-progress");
+  if (box) {
+    const field = (name) => box.querySelector(`[data-field="${name}"]`);
+    const cell = (text) => { const td = document.createElement("td"); td.className = "p-2"; td.textContent = text; return td; };
+    const poll = async () => {
+      const r = await fetch(box.dataset.progressUrl, { credentials: "same-origin" });
+      if (!r.ok) return;
+      const p = await r.json();
+      for (const k of ["state", "percent", "rows", "imported", "conflicts", "invalid", "message"]) field(k).textContent = p[k];
+      field("bar").style.width = `${p.percent}%`;
+      const rows = field("errors");
+      rows.replaceChildren(...p.errors.map(([row, msg]) => { const tr = document.createElement("tr"); tr.append(cell(row), cell(msg)); return tr; }));
+      if (p.state !== "done" && p.state !== "failed") setTimeout(poll, 1000);
+    };
+    poll();
+  }
+});
@@ -23,6 +23,13 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  document.querySelectorAll("[data-select-all]").forEach(box => {
+    box.addEventListener("change", () => {
+      const form = box.getAttribute("data-select-all");
+      document.querySelectorAll(`input[name="ids"][form="${form}"]`).forEach(c => { c.checked = box.checked; });
+    });
+  });
+
   document.addEventListener("click", (e) => {
     const toggle = e.target.closest("[data-menu-toggle]");
     if (toggle) {
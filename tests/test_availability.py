@@ -0,0 +1,89 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from court_booking import availability
+from court_booking.availability import SLOTS_PER_DAY, free_windows, hours_mask, runs, slot_mask
+
+
+def bits(mask):
+    return [i for i in range(SLOTS_PER_DAY + 2) if mask >> i & 1]
+
+
+def naive_runs(mask):
+    out, slots = [], bits(mask)
+    for s in slots:
+        if out and out[-1][0] + out[-1][1] == s:
+            out[-1] = (out[-1][0], out[-1][1] + 1)
+        else:
+            out.append((s, 1))
+    return out
+
+
+def naive_windows(busy, min_slots, allowed):
+    free = [(allowed >> i & 1) and not (busy >> i & 1) for i in range(SLOTS_PER_DAY)]
+    return [(s, n) for s, n in naive_runs(sum(1 << i for i, f in enumerate(free) if f)) if n >= min_slots]
+
+
+@pytest.mark.parametrize("mask, expected", [
+    (0, []),
+    (0b1, [(0, 1)]),
+    (0b1011, [(0, 2), (3, 1)]),
+    ((1 << SLOTS_PER_DAY) - 1, [(0, SLOTS_PER_DAY)]),
+    (0b111 << 40, [(40, 3)]),
+])
+def test_runs(mask, expected):
+    assert runs(mask) == expected
+
+
+def test_runs_matches_naive_scan():
+    rnd = random.Random(21)
+    for _ in range(2000):
+        mask = rnd.getrandbits(SLOTS_PER_DAY)
+        assert runs(mask) == naive_runs(mask)
+
+
+def test_free_windows_matches_naive_scan():
+    rnd = random.Random(7)
+    for _ in range(2000):
+        busy = rnd.getrandbits(SLOTS_PER_DAY) & rnd.getrandbits(SLOTS_PER_DAY)
+        allowed = hours_mask(rnd.randrange(0, 720, 30), rnd.randrange(720, 1441, 30))
+        k = rnd.randint(1, 8)
+        assert free_windows(busy, k, allowed) == naive_windows(busy, k, allowed)
+
+
+def test_free_windows_respects_busy_and_hours():
+    busy = slot_mask(10 * 60, 11 * 60)
+    allowed = hours_mask(9 * 60, 13 * 60)
+    assert free_windows(busy, 1, allowed) == [(18, 2), (22, 4)]
+    assert free_windows(busy, 3, allowed) == [(22, 4)]
+    assert free_windows(busy, 5, allowed) == []
+
+
+@pytest.mark.parametrize("open_min, close_min, expected", [
+    (6 * 60, 22 * 60, list(range(12, 44))),
+    (6 * 60 + 10, 7 * 60 + 50, [13, 14]),  # only slots wholly inside
+    (0, 24 * 60, list(range(SLOTS_PER_DAY))),
+    (9 * 60, 9 * 60, []),
+    (22 * 60, 6 * 60, []),
+])
+def test_hours_mask(open_min, close_min, expected):
+    assert bits(hours_mask(open_min, close_min)) == expected
+
+
+def test_slot_mask_rounds_out_to_whole_slots():
+    assert bits(slot_mask(10 * 60 + 15, 11 * 60 + 5)) == [20, 21, 22]
+    assert bits(slot_mask(23 * 60, 60)) == [46, 47]  # overnight: runs to midnight
+
+
+def test_overnight_booking_spills_into_next_day(monkeypatch):
+    day = date(2030, 3, 1)
+    rows = [(1, day - timedelta(days=1), "23:00:00", "01:00:00"), (1, day, "23:30:00", "00:30:00")]
+    monkeypatch.setattr(availability, "get_db_connection", lambda: type("C", (), {"close": lambda self: None})())
+    monkeypatch.setattr(availability.repository, "list_courts", lambda conn: [])
+    monkeypatch.setattr(availability.repository, "slot_rows", lambda conn, start_d, end_d: rows)
+    _, busy = availability._load(day, day + timedelta(days=1))
+    assert bits(busy[(1, day)]) == [0, 1, 47]
+    assert bits(busy[(1, day + timedelta(days=1))]) == [0]
+    assert (1, day - timedelta(days=1)) not in busy
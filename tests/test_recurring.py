@@ -0,0 +1,67 @@
+from datetime import date
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from court_booking import bookings
+from court_booking.bookings import recurrence_from_form
+
+FORM = {"court_ids": ["2", "1", "2"], "date": "2030-03-04", "until": "2030-03-25", "every": "weekly",
+        "start_time": "18:00", "end_time": "19:30"}
+
+
+def form(**changes):
+    data = dict(FORM, **changes)
+    courts = data.pop("court_ids")
+    return MultiDict(list(data.items()) + [("court_ids", c) for c in courts])
+
+
+def test_weekly_series():
+    rec = recurrence_from_form(form())
+    assert rec.court_ids == [1, 2]
+    assert rec.dates == [date(2030, 3, 4), date(2030, 3, 11), date(2030, 3, 18), date(2030, 3, 25)]
+    assert (rec.start, rec.end) == ("18:00:00", "19:30:00")
+
+
+def test_biweekly_series():
+    assert recurrence_from_form(form(every="biweekly")).dates == [date(2030, 3, 4), date(2030, 3, 18)]
+
+
+@pytest.mark.parametrize("changes", [
+    {"date": "2030-02-30"},
+    {"until": ""},
+    {"start_time": "6pm"},
+    {"end_time": "25:00"},
+    {"court_ids": ["x"]},
+])
+def test_malformed_input(changes):
+    with pytest.raises(ValueError, match="valid dates"):
+        recurrence_from_form(form(**changes))
+
+
+@pytest.mark.parametrize("changes", [{"court_ids": []}, {"every": "daily"}])
+def test_courts_and_interval_required(changes):
+    with pytest.raises(ValueError, match="how often"):
+        recurrence_from_form(form(**changes))
+
+
+def test_until_before_first():
+    with pytest.raises(ValueError, match="end date"):
+        recurrence_from_form(form(until="2030-03-03"))
+
+
+def test_single_day_series():
+    assert recurrence_from_form(form(until="2030-03-04")).dates == [date(2030, 3, 4)]
+
+
+@pytest.mark.parametrize("start, end", [("22:00", "01:00"), ("18:00", "18:00")])
+def test_end_must_follow_start(start, end):
+    with pytest.raises(ValueError, match="end time"):
+        recurrence_from_form(form(start_time=start, end_time=end))
+
+
+def test_occurrence_cap(monkeypatch):
+    monkeypatch.setattr(bookings, "RECURRING_MAX_OCCURRENCES", 8)
+    assert len(recurrence_from_form(form()).dates) * 2 == 8
+    with pytest.raises(ValueError, match="more than 8 bookings"):
+        recurrence_from_form(form(until="2030-04-01"))